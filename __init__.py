@@ -12,9 +12,15 @@ __plugin_author__ = "XiSoul"
 __plugin_type__ = "application"
 
 # 导入必要的模块
+import time
+
+_load_start = time.perf_counter()
+
 from nonebot import on_command, on_message, logger, get_driver
-from nonebot.adapters.onebot.v11 import Bot, Event
+from nonebot.adapters.onebot.v11 import Bot, Event, Message
+from nonebot.params import CommandArg
 from nonebot.rule import Rule
+from nonebot.typing import T_State
 
 # 打印插件加载信息
 print(f"[XiSoul] 开始加载插件: {__plugin_name__} v{__plugin_version__}")
@@ -23,33 +29,43 @@ logger.info(f"[XiSoul] 开始加载插件: {__plugin_name__} v{__plugin_version_
 # 获取驱动实例
 _driver = get_driver()
 
+# 功能开关，1-启用，0-禁用
+XISOUL_ENABLE_NEWS = getattr(_driver.config, "xisoul_enable_news", 1)
+XISOUL_ENABLE_LUNAR_TEXT = getattr(_driver.config, "xisoul_enable_lunar_text", 1)
+XISOUL_ENABLE_LUNAR_IMAGE = getattr(_driver.config, "xisoul_enable_lunar_image", 1)
+XISOUL_ENABLE_RANDOM_IMAGES = getattr(_driver.config, "xisoul_enable_random_images", 1)
+XISOUL_ENABLE_OLLAMA = getattr(_driver.config, "xisoul_enable_ollama", 1)
+XISOUL_ENABLE_CRAWLER = getattr(_driver.config, "xisoul_enable_crawler", 1)
+
 # 导入功能模块
-from .lunar_text import handle_lunar_calendar, is_text_lunar_command
-from .lunar_image import handle_image_lunar, is_image_lunar_command
-from .lunar_calendar_by_date import lunar_calendar_by_date, hl_command
-from .lunar_news import clear_news_cache, get_news_image
-from .random_images import handle_image_request, IMAGE_TYPES
-
-# 注册帮助命令
-help_cmd = on_command("帮助", priority=1, block=True)
-help_cmd_prefix = on_command("/帮助", priority=1, block=True)
-help_cmd_xi = on_command("xihelp", priority=1, block=True)
-help_cmd_plugin = on_command("插件帮助", priority=1, block=True)
-
-# 定义命令规则
-async def is_help_command(event: Event) -> bool:
-    message = str(event.message).strip()
-    return message in ["帮助", "插件帮助", "xihelp"]
-
-# 直接消息规则的帮助命令
-help_cmd_direct = on_message(rule=is_help_command, priority=1, block=True)
+# 新闻和随机图片模块只依赖httpx，加载时直接导入；
+# 黄历截图（htmlrender/Playwright）、文本黄历和Ollama（ollama客户端）在首次调用时才导入
+from .command_router import CommandRouter
+from .feature_loader import FeatureLoader
+from .http_client import init_http_client, close_http_client
+from .file_io import shutdown_file_io, run_io
+from .parse_pool import parse_pool_summary, shutdown_parse_pool, start_parse_pool
+from .circuit_breaker import breakers
+from .quota import quota_ledger
+from .single_flight import single_flight
+
+loader = FeatureLoader(__name__)
+
+# 进程池模式下在驱动启动（创建其他线程）之前fork出解析子进程
+start_parse_pool()
+
+# 命令路由配置：超过该长度的消息不参与路由
+XISOUL_ROUTER_MAX_LENGTH = int(getattr(_driver.config, "xisoul_router_max_length", 2000))
+
+# 所有直接发送（及带命令前缀发送）的命令都由同一个路由器分发，
+# 每条消息只规范化一次，不再为每个命令单独注册on_message规则
+router = CommandRouter(
+    command_start=getattr(_driver.config, "command_start", []),
+    max_length=XISOUL_ROUTER_MAX_LENGTH,
+)
+ROUTE_STATE_KEY = "_xisoul_route"
 
 # 帮助命令处理函数
-@help_cmd.handle()
-@help_cmd_prefix.handle()
-@help_cmd_xi.handle()
-@help_cmd_plugin.handle()
-@help_cmd_direct.handle()
 async def handle_help(bot: Bot, event: Event):
     """处理帮助命令"""
     user_id = event.get_user_id()
@@ -66,6 +82,8 @@ async def handle_help(bot: Bot, event: Event):
         "📅 1. 黄历功能",
         "• 文字黄历/文本黄历 - 获取文本版黄历",
         "• hl - 获取图片版黄历",
+        "• 文字黄历/hl/黄历 + 日期或范围 - 如 2025-01-01~2025-01-07、本周，多天合并为一条转发消息",
+        "• 择日 + 事项 [+ 月份或范围] - 如 择日 嫁娶 2025-06、择日 忌动土 下月、择日 冲猴 本月",
         "",
         "📰 2. 新闻功能",
         "• 新闻图片 - 获取今日热榜新闻图片",
@@ -90,60 +108,112 @@ async def handle_help(bot: Bot, event: Event):
     
     await bot.send(event, "\n".join(help_message))
 
-# 注册随机图片命令 - 白丝命令
-sjbs_cmd = on_command("sjbs", priority=10, block=True)
-sjbs_cmd_prefix = on_command("/sjbs", priority=10, block=True)
+router.add_exact(["帮助", "插件帮助", "xihelp"], handle_help, name="帮助", priority=1)
 
-@sjbs_cmd.handle()
-@sjbs_cmd_prefix.handle()
-async def handle_sjbs(bot: Bot, event: Event):
-    """处理白丝图片命令"""
-    await handle_image_request(bot, event, "sjbs")
+# 插件运行状态命令（仅超级用户）
+async def handle_status(bot: Bot, event: Event):
+    """显示模块加载耗时和上游请求合并统计"""
+    if event.get_user_id() not in _driver.config.superusers:
+        return
+    
+    status_message = ["📊 XiSoul 插件运行状态", "", "📦 模块导入耗时"]
+    status_message.extend(loader.report())
+    
+    status_message.append("")
+    status_message.append("🔗 上游请求合并")
+    flight_stats = single_flight.stats()
+    if not flight_stats:
+        status_message.append("  暂无上游请求")
+    for name, stats in flight_stats.items():
+        status_message.append(
+            f"  {name}: 调用 {stats['calls']} 次，实际请求 {stats['executions']} 次，合并 {stats['coalesced']} 次"
+        )
+    
+    status_message.append("")
+    status_message.append("🔌 上游熔断器")
+    breaker_lines = breakers.summary()
+    if not breaker_lines:
+        status_message.append("  暂无上游请求记录")
+    for line in breaker_lines:
+        status_message.append(f"  {line}")
+    
+    status_message.append("")
+    status_message.append("🎫 接口额度")
+    quota_lines = quota_ledger.summary()
+    if not quota_lines:
+        status_message.append("  今日暂无调用")
+    for line in quota_lines:
+        status_message.append(f"  {line}")
+    
+    status_message.append("")
+    status_message.append("🧊 上游缓存策略")
+    for policy in cache_policies():
+        status_message.append(f"  {policy.summary()}")
+    
+    if "lunar_text" in loader.import_times:
+        almanac_counts = await run_io(loader.import_module("lunar_text").almanac_store.counts)
+        status_message.append("")
+        status_message.append("📚 黄历索引")
+        status_message.append(f"  {almanac_counts['days']} 天，其中 {almanac_counts['yi_ji']} 天有宜忌数据")
+    
+    if huangli_crawler is not None:
+        status_message.append("")
+        status_message.append("🕸️ 黄历网页预抓取")
+        status_message.append(f"  {huangli_crawler.crawler.summary()}")
+        for summary in huangli_crawler.page_summaries():
+            status_message.append(f"  {summary}")
+    
+    parse_summary = parse_pool_summary()
+    if parse_summary:
+        status_message.append("")
+        status_message.append("🧮 网页解析")
+        status_message.append(f"  {parse_summary}")
+    
+    if XISOUL_ENABLE_NEWS:
+        manifest = lunar_news.cache_manifest
+        status_message.append("")
+        status_message.append("🗂️ 新闻缓存")
+        status_message.append(
+            f"  {len(manifest.files())} 个文件（新闻图片 {len(manifest.files('news'))} 个），"
+            f"共 {manifest.total_size() / 1024 / 1024:.2f}MB"
+        )
+    
+    if XISOUL_ENABLE_NEWS and lunar_news.last_broadcast_report:
+        status_message.append("")
+        status_message.append("📨 最近一次新闻群发")
+        status_message.append(f"  {lunar_news.last_broadcast_report.summary()}")
+    
+    await bot.send(event, "\n".join(status_message))
 
-# 直接消息规则的白丝命令
-async def is_sjbs_command(event: Event) -> bool:
-    message = str(event.message).strip()
-    return message == "sjbs"
+def cache_policies():
+    """已加载模块的上游缓存策略"""
+    policies = []
+    if XISOUL_ENABLE_NEWS:
+        policies.append(lunar_news.news_policy)
+    if "lunar_text" in loader.import_times:
+        policies.append(loader.import_module("lunar_text").lunar_policy)
+    return policies
 
-sjbs_cmd_direct = on_message(rule=is_sjbs_command, priority=10, block=True)
+router.add_exact(["xisoul状态"], handle_status)
 
-@sjbs_cmd_direct.handle()
-async def handle_sjbs_direct(bot: Bot, event: Event):
-    """处理直接发送的白丝图片命令"""
-    await handle_image_request(bot, event, "sjbs")
-
-# 注册其他随机图片命令
-def register_other_image_commands():
-    """注册其他随机图片相关命令"""
-    other_types = ["sjhs", "sjmt", "sjecy", "sjsk"]
+# 注册随机图片命令
+def register_image_commands():
+    """注册随机图片相关命令"""
+    random_images = loader.import_module("random_images", eager=True)
     
     # 使用辅助函数创建处理函数，避免闭包问题
     def create_handler(image_type):
         async def handler(bot: Bot, event: Event):
-            await handle_image_request(bot, event, image_type)
+            await random_images.handle_image_request(bot, event, image_type)
         return handler
     
-    for cmd_type in other_types:
-        if cmd_type in IMAGE_TYPES:
-            # 不带前缀的命令
-            cmd = on_command(cmd_type, priority=10, block=True)
-            cmd.handle()(create_handler(cmd_type))
-            
-            # 带前缀的命令
-            cmd_prefix = on_command(f"/{cmd_type}", priority=10, block=True)
-            cmd_prefix.handle()(create_handler(cmd_type))
-            
-            # 直接消息规则的命令 - 使用辅助函数捕获cmd_type值
-            def create_image_rule(image_type):
-                async def _image_rule(event: Event) -> bool:
-                    message = str(event.message).strip()
-                    return message == image_type
-                return _image_rule
-            cmd_direct = on_message(rule=create_image_rule(cmd_type), priority=10, block=True)
-            cmd_direct.handle()(create_handler(cmd_type))
-            
-            print(f"[XiSoul] 已注册随机图片命令: {cmd_type} 和 /{cmd_type}")
-            logger.info(f"[XiSoul] 已注册随机图片命令: {cmd_type} 和 /{cmd_type}")
+    for cmd_type in random_images.IMAGE_TYPES:
+        router.add_exact([cmd_type], create_handler(cmd_type))
+        print(f"[XiSoul] 已注册随机图片命令: {cmd_type} 和 /{cmd_type}")
+        logger.info(f"[XiSoul] 已注册随机图片命令: {cmd_type} 和 /{cmd_type}")
+
+if XISOUL_ENABLE_RANDOM_IMAGES:
+    register_image_commands()
 
 # 注册新闻图片命令
 async def handle_news_command(bot: Bot, event: Event):
@@ -153,237 +223,125 @@ async def handle_news_command(bot: Bot, event: Event):
     logger.info(f"[XiSoul] 新闻图片命令被触发! 用户: {user_id}")
     
     try:
-        # 获取新闻图片
-        image_data = await get_news_image()
-        if image_data:
+        # 获取新闻图片，群聊中使用该群配置的版式变体
+        layout = lunar_news.get_group_layout(getattr(event, "group_id", None))
+        result = await lunar_news.get_news_image_result(layout)
+        if result.value:
             from nonebot.adapters.onebot.v11 import MessageSegment
-            await bot.send(event, MessageSegment.image(image_data))
+            message = MessageSegment.image(result.value)
+            if result.stale:
+                # 接口暂不可用或较慢时返回的是之前的图片，提示用户
+                message = MessageSegment.text(f"⚠️ 今日新闻暂未获取到，以下是{result.describe_age()}的新闻图片\n") + message
+            await bot.send(event, message)
         else:
             await bot.send(event, "获取新闻图片失败，请稍后再试")
     except Exception as e:
         logger.error(f"处理新闻图片命令时出错: {str(e)}")
         await bot.send(event, f"处理新闻图片时出错: {str(e)}")
 
-# 注册新闻图片命令
-news_cmd = on_command("新闻图片", priority=10, block=True)
-news_cmd_prefix = on_command("/新闻图片", priority=10, block=True)
+if XISOUL_ENABLE_NEWS:
+    # 新闻模块需要在启动阶段注册定时任务，因此直接导入
+    lunar_news = loader.import_module("lunar_news", eager=True)
+    router.add_exact(["新闻图片"], handle_news_command)
 
-@news_cmd.handle()
-@news_cmd_prefix.handle()
-async def handle_news(bot: Bot, event: Event):
-    """处理新闻图片命令"""
-    await handle_news_command(bot, event)
-    
-# 添加直接消息规则的新闻图片命令
-async def is_news_command(event: Event) -> bool:
-    """检测消息是否为新闻图片命令"""
-    message = str(event.message).strip()
-    return message == "新闻图片"
-
-news_cmd_direct = on_message(rule=is_news_command, priority=10, block=True)
-
-@news_cmd_direct.handle()
-async def handle_news_direct(bot: Bot, event: Event):
-    """处理直接发送的新闻图片命令"""
-    await handle_news_command(bot, event)
-
-# 尝试导入并注册Ollama命令
-try:
-    from .ollama_chat import handle_ollama_chat, is_ai_prefix, handle_show_current_model, \
-                           handle_switch_qwen, handle_switch_gpt, handle_switch_deepseek, \
-                           handle_reset_model, handle_ollama_help, handle_clear_history
-
-    # Ollama命令处理
-    ollama_cmd = on_command("ollama", priority=10, block=True)
-    ollama_cmd_prefix = on_command("/ollama", priority=10, block=True)
-
-    @ollama_cmd.handle()
-    @ollama_cmd_prefix.handle()
-    async def handle_ollama(bot: Bot, event: Event):
-        """处理Ollama对话命令"""
-        await handle_ollama_chat(bot, event)
-    
-    # 添加当前模型命令
-    current_model_cmd = on_command("当前模型", priority=10, block=True)
-    current_model_cmd_prefix = on_command("/当前模型", priority=10, block=True)
-    
-    @current_model_cmd.handle()
-    @current_model_cmd_prefix.handle()
-    async def handle_current_model(bot: Bot, event: Event):
-        """处理当前模型命令"""
-        await handle_show_current_model(bot, event)
-    
-    # 添加当前模型直接消息规则支持
-    async def is_current_model_command(event: Event) -> bool:
-        """检测消息是否为当前模型命令"""
-        message = str(event.message).strip()
-        return message == "当前模型"
-    
-    # 注册基于消息内容的监听器
-    current_model_listener = on_message(rule=is_current_model_command, priority=10, block=True)
-    
-    @current_model_listener.handle()
-    async def handle_current_model_direct(bot: Bot, event: Event):
-        """处理直接发送的当前模型命令"""
-        await handle_show_current_model(bot, event)
-    
-    # 添加切换模型命令 - 千问
-    switch_qwen_cmd = on_command("切换千问", priority=10, block=True)
-    switch_qwen_cmd_prefix = on_command("/切换千问", priority=10, block=True)
-    
-    @switch_qwen_cmd.handle()
-    @switch_qwen_cmd_prefix.handle()
-    async def handle_switch_to_qwen(bot: Bot, event: Event):
-        """处理切换到千问模型命令"""
-        await handle_switch_qwen(bot, event)
-    
-    # 添加切换千问直接消息规则支持
-    async def is_switch_qwen_command(event: Event) -> bool:
-        """检测消息是否为切换千问命令"""
-        message = str(event.message).strip()
-        return message == "切换千问"
-    
-    switch_qwen_listener = on_message(rule=is_switch_qwen_command, priority=10, block=True)
-    
-    @switch_qwen_listener.handle()
-    async def handle_switch_qwen_direct(bot: Bot, event: Event):
-        """处理直接发送的切换千问命令"""
-        await handle_switch_qwen(bot, event)
-    
-    # 添加切换模型命令 - GPT
-    switch_gpt_cmd = on_command("切换gpt", priority=10, block=True)
-    switch_gpt_cmd_prefix = on_command("/切换gpt", priority=10, block=True)
-    
-    @switch_gpt_cmd.handle()
-    @switch_gpt_cmd_prefix.handle()
-    async def handle_switch_to_gpt(bot: Bot, event: Event):
-        """处理切换到GPT模型命令"""
-        await handle_switch_gpt(bot, event)
-    
-    # 添加切换gpt直接消息规则支持
-    async def is_switch_gpt_command(event: Event) -> bool:
-        """检测消息是否为切换gpt命令"""
-        message = str(event.message).strip()
-        return message == "切换gpt"
-    
-    switch_gpt_listener = on_message(rule=is_switch_gpt_command, priority=10, block=True)
-    
-    @switch_gpt_listener.handle()
-    async def handle_switch_gpt_direct(bot: Bot, event: Event):
-        """处理直接发送的切换gpt命令"""
-        await handle_switch_gpt(bot, event)
-    
-    # 添加切换模型命令 - DeepSeek
-    switch_deepseek_cmd = on_command("切换deepseek", priority=10, block=True)
-    switch_deepseek_cmd_prefix = on_command("/切换deepseek", priority=10, block=True)
-    
-    @switch_deepseek_cmd.handle()
-    @switch_deepseek_cmd_prefix.handle()
-    async def handle_switch_to_deepseek(bot: Bot, event: Event):
-        """处理切换到DeepSeek模型命令"""
-        await handle_switch_deepseek(bot, event)
-    
-    # 添加切换deepseek直接消息规则支持
-    async def is_switch_deepseek_command(event: Event) -> bool:
-        """检测消息是否为切换deepseek命令"""
-        message = str(event.message).strip()
-        return message == "切换deepseek"
-    
-    switch_deepseek_listener = on_message(rule=is_switch_deepseek_command, priority=10, block=True)
-    
-    @switch_deepseek_listener.handle()
-    async def handle_switch_deepseek_direct(bot: Bot, event: Event):
-        """处理直接发送的切换deepseek命令"""
-        await handle_switch_deepseek(bot, event)
-    
-    # 添加重置模型命令
-    reset_model_cmd = on_command("重置模型", priority=10, block=True)
-    reset_model_cmd_prefix = on_command("/重置模型", priority=10, block=True)
-    
-    @reset_model_cmd.handle()
-    @reset_model_cmd_prefix.handle()
-    async def handle_reset_current_model(bot: Bot, event: Event):
-        """处理重置模型命令"""
-        await handle_reset_model(bot, event)
-    
-    # 添加重置模型直接消息规则支持
-    async def is_reset_model_command(event: Event) -> bool:
-        """检测消息是否为重置模型命令"""
-        message = str(event.message).strip()
-        return message == "重置模型"
-    
-    reset_model_listener = on_message(rule=is_reset_model_command, priority=10, block=True)
-    
-    @reset_model_listener.handle()
-    async def handle_reset_model_direct(bot: Bot, event: Event):
-        """处理直接发送的重置模型命令"""
-        await handle_reset_model(bot, event)
-    
-    # 添加清理历史命令
-    clear_history_cmd = on_command("清理历史", priority=10, block=True)
-    clear_history_cmd_prefix = on_command("/清理历史", priority=10, block=True)
-    
-    @clear_history_cmd.handle()
-    @clear_history_cmd_prefix.handle()
-    async def handle_clear_chat_history(bot: Bot, event: Event):
-        """处理清理对话历史命令"""
-        await handle_clear_history(bot, event)
-    
-    # 添加清理历史直接消息规则支持
-    async def is_clear_history_command(event: Event) -> bool:
-        """检测消息是否为清理历史命令"""
-        message = str(event.message).strip()
-        return message == "清理历史"
-    
-    clear_history_listener = on_message(rule=is_clear_history_command, priority=10, block=True)
-    
-    @clear_history_listener.handle()
-    async def handle_clear_history_direct(bot: Bot, event: Event):
-        """处理直接发送的清理历史命令"""
-        await handle_clear_history(bot, event)
-    
-    # 添加Ollama帮助命令
-    ollama_help_cmd = on_command("ollama帮助", priority=10, block=True)
-    ollama_help_cmd_prefix = on_command("/ollama帮助", priority=10, block=True)
-    
-    @ollama_help_cmd.handle()
-    @ollama_help_cmd_prefix.handle()
-    async def handle_ollama_help_cmd(bot: Bot, event: Event):
-        """处理Ollama帮助命令"""
-        await handle_ollama_help(bot, event)
-    
-    # 添加ollama帮助直接消息规则支持
-    async def is_ollama_help_command(event: Event) -> bool:
-        """检测消息是否为ollama帮助命令"""
-        message = str(event.message).strip()
-        return message == "ollama帮助"
-    
-    ollama_help_listener = on_message(rule=is_ollama_help_command, priority=10, block=True)
-    
-    @ollama_help_listener.handle()
-    async def handle_ollama_help_direct(bot: Bot, event: Event):
-        """处理直接发送的ollama帮助命令"""
-        await handle_ollama_help(bot, event)
-    
-    # 添加AI前缀消息监听
-    async def is_ai_message(event: Event) -> bool:
-        """检测消息是否以"ai "开头"""
-        message = str(event.message).strip()
-        return is_ai_prefix(message)
-    
-    # 注册基于消息内容的监听器
-    ai_chat_listener = on_message(rule=is_ai_message, priority=10, block=True)
-    
-    @ai_chat_listener.handle()
-    async def handle_ai_message(bot: Bot, event: Event):
-        """处理以"ai "开头的消息"""
-        await handle_ollama_chat(bot, event)
+# 注册文本黄历命令
+if XISOUL_ENABLE_LUNAR_TEXT:
+    router.add_exact(
+        ["文字黄历", "文本黄历"],
+        loader.lazy("lunar_text", "handle_lunar_calendar"),
+        name="文本黄历",
+    )
+    _handle_lunar_text_args = loader.lazy("lunar_text", "handle_lunar_calendar_args")
+    router.add_prefix("文字黄历 ", _handle_lunar_text_args, name="文本黄历")
+    router.add_prefix("文本黄历 ", _handle_lunar_text_args, name="文本黄历")
+    router.add_prefix("择日 ", loader.lazy("lunar_text", "handle_choose_date"), name="择日")
+
+# 注册图片黄历命令：纯"hl"截图、带日期参数的"hl "消息以及黄历/hl命令
+if XISOUL_ENABLE_LUNAR_IMAGE:
+    _missing_htmlrender = "❌ 黄历图片功能不可用，请安装 nonebot-plugin-htmlrender"
+    router.add_exact(["hl"], loader.lazy("lunar_image", "handle_image_lunar", _missing_htmlrender), priority=15)
+    router.add_prefix("hl ", loader.lazy("lunar_calendar_by_date", "handle_hl_message", _missing_htmlrender), priority=3)
+
+    _handle_lunar_calendar_by_date = loader.lazy(
+        "lunar_calendar_by_date", "handle_lunar_calendar", _missing_htmlrender
+    )
+
+    lunar_calendar_by_date = on_command("黄历", aliases={"老黄历", "黄历查询", "农历"}, priority=5)
+    # 专门添加hl命令的处理器，确保能处理带参数的hl命令
+    hl_command = on_command("hl", priority=3, block=True)
+
+    @lunar_calendar_by_date.handle()
+    @hl_command.handle()
+    async def handle_lunar_calendar_by_date(bot: Bot, event: Event, state: T_State, args: Message = CommandArg()):
+        """处理黄历查询命令，转发给lunar_calendar_by_date.handle_lunar_calendar"""
+        logger.info(f"[黄历] 收到黄历命令，消息内容: {event.message}")
+        await _handle_lunar_calendar_by_date(bot, event, state, args)
+
+    logger.info("[黄历] 已注册hl命令处理器")
+
+# 黄历网页预抓取：需要在启动阶段注册定时任务，因此直接导入；网页抓取和解析模块在第一次抓取时才导入
+huangli_crawler = None
+if XISOUL_ENABLE_CRAWLER:
+    try:
+        huangli_crawler = loader.import_module("huangli_crawler", eager=True)
+    except Exception as e:
+        logger.warning(f"[XiSoul] 黄历网页预抓取未启用: {type(e).__name__}: {str(e)}")
+
+# 注册Ollama命令
+if XISOUL_ENABLE_OLLAMA:
+    def _ollama(attr):
+        return loader.lazy("ollama_chat", attr, "❌ AI聊天功能未启用（缺少依赖）")
+
+    router.add_exact(["当前模型"], _ollama("handle_show_current_model"))
+    router.add_exact(["切换千问"], _ollama("handle_switch_qwen"))
+    router.add_exact(["切换gpt"], _ollama("handle_switch_gpt"))
+    router.add_exact(["切换deepseek"], _ollama("handle_switch_deepseek"))
+    router.add_exact(["重置模型"], _ollama("handle_reset_model"))
+    router.add_exact(["清理历史"], _ollama("handle_clear_history"))
+    router.add_exact(["ollama帮助"], _ollama("handle_ollama_help"))
+
+    # "ai "前缀不区分大小写，与is_ai_prefix保持一致；处理函数收到去掉前缀后的问题
+    router.add_prefix("ai ", _ollama("handle_ollama_chat"), ignore_case=True, name="ai")
 
     print("[XiSoul] 已注册所有Ollama相关命令和AI前缀消息监听")
     logger.info("[XiSoul] 已注册所有Ollama相关命令和AI前缀消息监听")
-except ImportError:
-    print("[XiSoul] Ollama功能未启用（缺少依赖）")
-    logger.warning("[XiSoul] Ollama功能未启用（缺少依赖）")
+else:
+    print("[XiSoul] Ollama功能未启用")
+    logger.info("[XiSoul] Ollama功能未启用")
+
+# 最近一次路由匹配的事件和结果：各优先级的分发器检查同一事件时只匹配一次
+_last_route = (None, None)
+
+def match_route(event: Event):
+    global _last_route
+    last_event, route = _last_route
+    if last_event is not event:
+        route = router.match(getattr(event, "message", None))
+        _last_route = (event, route)
+    return route
+
+def routed_command_rule(priority: int) -> Rule:
+    """命令路由规则：只匹配该优先级的命令，匹配结果写入state，未匹配的消息不会进入处理器"""
+    async def is_routed_command(event: Event, state: T_State) -> bool:
+        route = match_route(event)
+        if route is None or route.priority != priority:
+            return False
+        state[ROUTE_STATE_KEY] = route
+        return True
+    return Rule(is_routed_command)
+
+async def handle_routed_command(bot: Bot, event: Event, state: T_State):
+    """执行命令路由匹配到的处理函数"""
+    route = state[ROUTE_STATE_KEY]
+    logger.debug(f"[XiSoul] 命令路由命中: {route}")
+    await route.run(bot, event)
+
+# 每个用到的优先级一个分发器，各命令的优先级与拆分路由之前相同：帮助为1、带参数的hl为3、纯hl为15、其他为10
+command_dispatchers = []
+for _priority in router.priorities():
+    _dispatcher = on_message(rule=routed_command_rule(_priority), priority=_priority, block=True)
+    _dispatcher.handle()(handle_routed_command)
+    command_dispatchers.append(_dispatcher)
 
 # 插件启动事件
 @_driver.on_startup
@@ -396,8 +354,20 @@ async def plugin_startup():
     print(f"[XiSoul] 命令前缀配置: {command_start}")
     logger.info(f"[XiSoul] 命令前缀配置: {command_start}")
     
-    # 注册其他图片命令
-    register_other_image_commands()
+    print(f"[XiSoul] 命令路由已注册 {len(router.commands())} 个命令")
+    logger.info(f"[XiSoul] 命令路由已注册 {len(router.commands())} 个命令")
+    
+    # 恢复上次运行时的上游熔断状态和当天的接口调用次数
+    await run_io(breakers.load)
+    await run_io(quota_ledger.load)
+    
+    # 创建共享的HTTP客户端并预热到上游的连接
+    await init_http_client()
+    
+    # 启动报告：插件加载耗时及各模块导入耗时
+    report = "\n".join(loader.report())
+    logger.info(f"[XiSoul] 插件加载耗时 {_load_elapsed * 1000:.1f}ms，模块导入耗时:\n{report}")
+    loader.started = True
     
     print("[XiSoul] 插件启动完成!")
     logger.info("[XiSoul] 插件启动完成!")
@@ -407,8 +377,15 @@ async def plugin_startup():
 async def plugin_shutdown():
     print("[XiSoul] 插件正在关闭...")
     logger.info("[XiSoul] 插件正在关闭...")
+    await close_http_client()
+    shutdown_parse_pool()
+    shutdown_file_io()
+    for name, stats in single_flight.stats().items():
+        logger.info(f"[XiSoul] 请求合并统计 {name}: {stats}")
     print("[XiSoul] 插件已关闭")
     logger.info("[XiSoul] 插件已关闭")
 
+_load_elapsed = time.perf_counter() - _load_start
+
 print("[XiSoul] 插件加载完成，所有命令已注册")
 logger.info("[XiSoul] 插件加载完成，所有命令已注册")
\ No newline at end of file
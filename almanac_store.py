@@ -0,0 +1,213 @@
+"""黄历索引 - 使用SQLite按日期保存黄历数据，并为宜忌、冲煞、节气等建立倒排索引，择日查询直接走索引"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from .lunar_engine import SHANGHAI_TZ, compute_almanac
+
+STORE_FILE = os.path.join(os.path.dirname(__file__), "cache", "almanac.db")
+
+# days表中可写入的字段 -> 倒排索引中的类别（None表示只保存不索引）
+FIELDS = {
+    "lunar": None,
+    "week": None,
+    "gan_zhi": None,
+    "chong": "chong",
+    "sha": "sha",
+    "jie_qi": "jieqi",
+    "zhi_xing": "zhixing",
+    "yi": "yi",
+    "ji": "ji",
+}
+# 宜忌等多值字段的分隔符
+TERM_SEPARATORS = re.compile(r"[\s,，、.。;；|/]+")
+
+
+def split_terms(value: Any) -> List[str]:
+    """将宜忌等字段拆分为词条列表，已是列表时去掉空项"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = TERM_SEPARATORS.split(value)
+    return [str(term).strip() for term in value if str(term).strip()]
+
+
+def _index_terms(column: str, value: Any) -> List[str]:
+    """字段值 -> 倒排索引中的词条：冲煞只索引生肖和方位，宜忌逐项索引"""
+    if column == "chong":
+        match = re.search(r"冲(.)", str(value))
+        return [match.group(1)] if match else []
+    if column == "sha":
+        match = re.search(r"煞(.)", str(value))
+        return [match.group(1)] if match else []
+    return split_terms(value)
+
+
+def engine_fields(day: date) -> Dict[str, Any]:
+    """本地计算一天的黄历字段（按当天正午计算）"""
+    data = compute_almanac(datetime(day.year, day.month, day.day, 12, tzinfo=SHANGHAI_TZ))
+    term = data["JieQi1"]
+    return {
+        "lunar": data["Lunar"],
+        "week": data["Week"],
+        "gan_zhi": data["GanZhiDay"],
+        "chong": data["ChongDay"],
+        "sha": data["ShaDay"],
+        # 只有交节当天才记为该节气
+        "jie_qi": "" if "（" in term else term,
+        "zhi_xing": data["ZhiXing"],
+    }
+
+
+def payload_fields(payload: dict) -> Dict[str, Any]:
+    """从lunarpro接口返回的原始数据中提取宜忌"""
+    data = payload.get("data", {}) if isinstance(payload, dict) else {}
+    fields = {}
+    if data.get("YiDay"):
+        fields["yi"] = split_terms(data["YiDay"])
+    if data.get("JiDay"):
+        fields["ji"] = split_terms(data["JiDay"])
+    return fields
+
+
+class AlmanacStore:
+    """
+    黄历索引
+
+    days 表每个日期一行，保存农历、干支、冲煞、节气、值星和宜忌；
+    terms 表为倒排索引 (类别, 词条, 日期)，择日时按 (类别, 词条) 加日期范围查询。
+    所有方法都是同步的，在事件循环中通过文件读写线程池调用
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        # 连接在文件读写线程池的多个线程间共用，同一时间只允许一个线程使用
+        self._lock = threading.RLock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS days (
+                    date TEXT PRIMARY KEY,
+                    lunar TEXT,
+                    week TEXT,
+                    gan_zhi TEXT,
+                    chong TEXT,
+                    sha TEXT,
+                    jie_qi TEXT,
+                    zhi_xing TEXT,
+                    yi TEXT,
+                    ji TEXT,
+                    yi_ji_source TEXT,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS terms (
+                    kind TEXT NOT NULL,
+                    term TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    PRIMARY KEY (kind, term, date)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS terms_by_date ON terms (date, kind);
+                """
+            )
+        return self._conn
+
+    def record(self, day: str, source: str, fields: Dict[str, Any]):
+        """
+        写入一天的数据并更新倒排索引，只覆盖fields中给出的字段
+
+        Args:
+            day: 日期字符串，格式为YYYY-MM-DD
+            source: 数据来源（lunarpro、scraper、engine）
+            fields: 字段 -> 值，宜忌可以是列表或分隔的字符串
+        """
+        with self._lock, self.conn:
+            self._record(day, source, fields)
+
+    def _record(self, day: str, source: str, fields: Dict[str, Any]):
+        """在调用方的事务中写入一天的数据"""
+        fields = {column: value for column, value in fields.items() if column in FIELDS}
+        if not fields:
+            return
+        now = time.time()
+        self.conn.execute("INSERT OR IGNORE INTO days (date, updated_at) VALUES (?, ?)", (day, now))
+        for column, value in fields.items():
+            stored = " ".join(split_terms(value)) if column in ("yi", "ji") else (value or None)
+            self.conn.execute(f"UPDATE days SET {column} = ?, updated_at = ? WHERE date = ?", (stored, now, day))
+            kind = FIELDS[column]
+            if kind is None:
+                continue
+            self.conn.execute("DELETE FROM terms WHERE kind = ? AND date = ?", (kind, day))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO terms (kind, term, date) VALUES (?, ?, ?)",
+                [(kind, term, day) for term in _index_terms(column, value)],
+            )
+        if "yi" in fields or "ji" in fields:
+            self.conn.execute("UPDATE days SET yi_ji_source = ? WHERE date = ?", (source, day))
+
+    def record_payload(self, day: str, payload: dict):
+        """写入lunarpro接口数据中的宜忌"""
+        fields = payload_fields(payload)
+        if fields:
+            self.record(day, "lunarpro", fields)
+
+    def missing(self, days: Iterable[str], column: str) -> List[str]:
+        """返回days中column字段还没有数据的日期，column为yi_ji_source时表示还没有宜忌数据"""
+        if column not in FIELDS and column != "yi_ji_source":
+            raise ValueError(f"未知的字段: {column}")
+        days = sorted(days)
+        if not days:
+            return []
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT date FROM days WHERE date BETWEEN ? AND ? AND {column} IS NOT NULL",
+                (days[0], days[-1]),
+            ).fetchall()
+        present = {row["date"] for row in rows}
+        return [day for day in days if day not in present]
+
+    def ensure_engine_fields(self, days: Iterable[str]) -> int:
+        """为还没有历法字段的日期补充本地计算的数据，返回补充的天数"""
+        missing = self.missing(days, "gan_zhi")
+        if missing:
+            # 一次事务写入所有日期，整年也只需提交一次
+            with self._lock, self.conn:
+                for day in missing:
+                    self._record(day, "engine", engine_fields(date.fromisoformat(day)))
+        return len(missing)
+
+    def search(self, kind: str, term: str, start: str, end: str) -> List[Dict[str, Any]]:
+        """在日期范围内按倒排索引查找，返回按日期排列的当天数据"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT days.* FROM terms JOIN days ON days.date = terms.date "
+                "WHERE terms.kind = ? AND terms.term = ? AND terms.date BETWEEN ? AND ? ORDER BY terms.date",
+                (kind, term, start, end),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        """已保存的天数和有宜忌数据的天数"""
+        with self._lock:
+            row = self.conn.execute("SELECT COUNT(*), COUNT(yi) FROM days").fetchone()
+        return {"days": row[0], "yi_ji": row[1]}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+almanac_store = AlmanacStore(STORE_FILE)
@@ -0,0 +1,92 @@
+"""批量查询核心功能 - 按日期范围查询时，命中缓存的日期直接返回，其余在有界并发下获取，结果合并为一条转发消息发送"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+
+from nonebot import get_driver, logger
+from nonebot.adapters.onebot.v11 import Message, MessageSegment
+
+config = get_driver().config
+
+# 一次最多查询的天数
+XISOUL_RANGE_MAX_DAYS = int(getattr(config, "xisoul_range_max_days", 31))
+# 按日期范围查询时同时请求上游的最大数量（文本黄历接口、黄历网页）
+XISOUL_RANGE_CONCURRENCY = int(getattr(config, "xisoul_range_concurrency", 4))
+# 按日期范围截图时同时打开的最大页面数，截图占用浏览器资源，单独限制
+XISOUL_RANGE_SCREENSHOT_CONCURRENCY = int(getattr(config, "xisoul_range_screenshot_concurrency", 2))
+
+
+async def gather_bounded(
+    keys: Iterable[Any],
+    fetch: Callable[[Any], Awaitable[Any]],
+    concurrency: int,
+    cached: Optional[Callable[[Any], Awaitable[Any]]] = None,
+) -> Dict[Any, Any]:
+    """
+    对每个key调用fetch，同时进行的调用不超过concurrency个
+
+    Args:
+        keys: 要查询的key（通常为日期），重复的key只查询一次
+        fetch: 获取单个key的协程函数
+        concurrency: 同时进行的fetch数量上限
+        cached: 查询缓存的协程函数，返回非None时直接使用，不占用并发名额
+
+    Returns:
+        key -> 结果；单个key失败不影响其他key，失败的key对应的值为异常对象
+    """
+    results: Dict[Any, Any] = {}
+    misses: List[Any] = []
+    for key in dict.fromkeys(keys):
+        value = None
+        if cached is not None:
+            try:
+                value = await cached(key)
+            except Exception as e:
+                logger.warning(f"[批量查询] 读取缓存失败 {key}: {str(e)}")
+        if value is None:
+            misses.append(key)
+        else:
+            results[key] = value
+
+    if misses:
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(key):
+            async with semaphore:
+                try:
+                    results[key] = await fetch(key)
+                except Exception as e:
+                    logger.warning(f"[批量查询] 获取失败 {key}: {str(e)}")
+                    results[key] = e
+
+        await asyncio.gather(*(run(key) for key in misses))
+    logger.info(f"[批量查询] 共 {len(results)} 项，缓存命中 {len(results) - len(misses)} 项，获取 {len(misses)} 项")
+    return results
+
+
+async def send_forward_message(bot, event, contents: List[Union[str, Message]], nickname: str = "XiSoul"):
+    """
+    将多条内容合并为一条转发消息发送，群聊和私聊均可
+
+    协议端不支持合并转发时，改为把所有内容拼接成一条普通消息发送
+    """
+    nodes = Message(
+        MessageSegment.node_custom(user_id=int(bot.self_id), nickname=nickname, content=content)
+        for content in contents
+    )
+    group_id = getattr(event, "group_id", None)
+    try:
+        if group_id is not None:
+            await bot.call_api("send_group_forward_msg", group_id=group_id, messages=nodes)
+        else:
+            await bot.call_api("send_private_forward_msg", user_id=int(event.get_user_id()), messages=nodes)
+        return
+    except Exception as e:
+        logger.warning(f"[批量查询] 发送合并转发消息失败，改为发送普通消息: {str(e)}")
+
+    merged = Message()
+    for index, content in enumerate(contents):
+        if index:
+            merged += "\n\n"
+        merged += content
+    await bot.send(event, merged)
@@ -0,0 +1,246 @@
+"""
+黄历网页离线语料库：解析结果和格式化输出的回归检查与基准测试
+
+benchmarks/huangli_corpus/ 中每个日期有一个黄历网页（日期.html）和一份期望输出快照（日期.json）。
+快照中的解析结果由参照解析器生成，而不是由被测的解析器生成：参照解析器是插件原来的 HuangLiScraper.parse_html_content
+（bench_huangli_parse.legacy_parse，html.parser建树后逐项搜索，修正了星宿、月令、物候的正则，另加后来增加的宜忌规则）；
+快照中还保存了用这个解析结果生成的 HuangLiScraper.format_huangli_data 文本，以及 HuangLiFormatter 的文本和截图HTML。检查内容：
+  - 每个已安装的解析后端（huangli_extractor.parse_page）的结果都与快照一致；
+  - 参照解析器的结果仍与快照一致（参照实现没有被改动）；
+  - 流式读取（SectionWatcher）提前结束时，已读部分的解析结果与快照一致；
+  - 格式化输出与快照一致。
+检查通过后统计每个页面在每个后端上的解析耗时、Python内存峰值和解析完成时仍占用的内存块数
+（tracemalloc 只统计Python分配的内存，lxml在C中保存的文档树不计入）。检查和统计离线运行，需要安装 nonebot2 和 beautifulsoup4:
+
+    python benchmarks/bench_huangli_corpus.py                  # 检查快照并统计
+    python benchmarks/bench_huangli_corpus.py --update         # 参照解析器或格式有意变化后，重新生成所有快照
+    python benchmarks/bench_huangli_corpus.py --fetch 2025-06-15 ...   # 联网保存网站上的网页，并生成快照
+
+快照的 source 记录网页的来源："fetched" 为用 --fetch 从网站按原样保存的网页；"reconstructed" 为整理语料库时
+网站无法访问，按网站版式重建的网页，干支、纳音、冲煞、星宿、节气等取自 lunar_engine 的计算结果。
+重建的网页覆盖不同月份、闰月（2023年闰二月、2025年闰六月）、春节、除夕、端午、七夕、中秋、冬至、清明和普通日，
+以及表格排版、栏目缺失、CRLF换行、脚本和注释中出现栏目关键词等情况；对同一日期运行 --fetch 会用真实网页替换。
+"""
+
+import argparse
+import copy
+import gc
+import importlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+import types
+
+import nonebot
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "huangli_corpus")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+nonebot.init(driver="~none")
+
+# 只加载黄历相关的模块，不加载整个插件
+package = types.ModuleType("xisoul_bench")
+package.__path__ = [ROOT]
+sys.modules[package.__name__] = package
+huangli_extractor = importlib.import_module("xisoul_bench.huangli_extractor")
+html_backend = importlib.import_module("xisoul_bench.html_backend")
+HuangLiScraper = importlib.import_module("xisoul_bench.huangli_scraper").HuangLiScraper
+HuangLiFormatter = importlib.import_module("xisoul_bench.huangli_formatter").HuangLiFormatter
+
+from bench_huangli_parse import legacy_parse
+
+ROUNDS = 10
+# 模拟流式读取时每次收到的字符数
+STREAM_CHUNK = 4096
+# 快照中的格式化输出
+FORMATTERS = {
+    "format_huangli_data": HuangLiScraper.format_huangli_data,
+    "format_text": HuangLiFormatter.format_text,
+    "create_html_for_image": HuangLiFormatter.create_html_for_image,
+}
+
+def corpus_files():
+    """语料库中的 (日期, 网页路径, 快照路径)，按日期排序"""
+    if not os.path.isdir(CORPUS_DIR):
+        return []
+    dates = sorted(name[:-5] for name in os.listdir(CORPUS_DIR) if name.endswith(".html"))
+    return [(d, os.path.join(CORPUS_DIR, f"{d}.html"), os.path.join(CORPUS_DIR, f"{d}.json")) for d in dates]
+
+
+def reference_parse(html: str, date: str):
+    """参照解析器的结果：插件原来的解析实现（统一换行符后解析，与当前实现的输入相同）"""
+    return legacy_parse(html_backend.normalize_newlines(html), date)
+
+
+def render(data):
+    """解析结果的各种格式化输出"""
+    return {name: formatter(copy.deepcopy(data)) for name, formatter in FORMATTERS.items()}
+
+
+def read_page(path: str) -> str:
+    # 保留原始换行符，解析前统一换行符是被测代码的一部分
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def stream_prefix(html: str):
+    """模拟流式读取，返回读到所有栏目时已读的内容，没有提前结束时返回None"""
+    watcher = huangli_extractor.SectionWatcher()
+    for start in range(0, len(html), STREAM_CHUNK):
+        if watcher.feed(html[start:start + STREAM_CHUNK]):
+            return html[:start + STREAM_CHUNK]
+    return None
+
+
+def check(date: str, html: str, expected) -> list:
+    """返回与快照不一致之处的说明"""
+    problems = []
+    data = expected["parse_html_content"]
+    if reference_parse(html, date) != data:
+        problems.append("参照解析器的结果与快照不一致，参照实现有变化时请运行 --update")
+    for backend in html_backend.available_backends():
+        result, _ = huangli_extractor.parse_page(html, date, backend)
+        if result != data:
+            fields = [key for key in data if result.get(key) != data[key]]
+            problems.append(f"{backend} 的解析结果不一致: {', '.join(fields)}")
+    if huangli_extractor.stream_supported():
+        prefix = stream_prefix(html)
+        if prefix is not None:
+            result, _ = huangli_extractor.parse_page(prefix, date, huangli_extractor.LxmlTree.name)
+            if result != data:
+                problems.append(f"流式读取在 {len(prefix)}/{len(html)} 字符处提前结束，解析结果不一致")
+    for name, output in render(data).items():
+        if name not in expected:
+            problems.append(f"快照中没有 {name}，请运行 --update")
+        elif output != expected[name]:
+            problems.append(f"{name} 的输出与快照不一致")
+    return problems
+
+
+def measure(backend: str, html: str, date: str):
+    """(平均耗时ms, Python内存峰值KB, 解析完成时仍占用的内存块数)"""
+    parse = huangli_extractor.parse_page
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        parse(html, date, backend)
+    elapsed = (time.perf_counter() - start) / ROUNDS * 1000
+
+    gc.collect()
+    tracemalloc.start()
+    parse(html, date, backend)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # 持有文档树和结果时比解析前多出的内存块：文档树和抽取结果占用的Python对象
+    gc.collect()
+    before = sys.getallocatedblocks()
+    tree = html_backend.BACKENDS[backend](html_backend.normalize_newlines(html))
+    result = huangli_extractor.extract(tree, date)
+    blocks = sys.getallocatedblocks() - before
+    del tree, result
+    return elapsed, peak / 1024, blocks
+
+
+def read_snapshot(path: str):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_snapshot(date: str, html: str, snapshot: str, info):
+    """info: 网页的 url、source（fetched/reconstructed）和说明 note"""
+    data = reference_parse(html, date)
+    with open(snapshot, "w", encoding="utf-8") as f:
+        json.dump({**info, "parse_html_content": data, **render(data)}, f, ensure_ascii=False, indent=1)
+        f.write("\n")
+    fields = sum(len(value) for value in data.values() if isinstance(value, dict))
+    print(f"已生成 {date} 的快照：参照解析器读到 {fields} 个字段")
+
+
+def fetch(dates):
+    import httpx
+
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"}
+    for date in dates:
+        url = HuangLiScraper.BASE_URL.format(date=date)
+        response = httpx.get(url, headers=headers, timeout=30, follow_redirects=True)
+        response.raise_for_status()
+        page = os.path.join(CORPUS_DIR, f"{date}.html")
+        # 按原样保存（不转换换行符）
+        with open(page, "w", encoding="utf-8", newline="") as f:
+            f.write(response.text)
+        print(f"已保存 {date}（{len(response.content) // 1024}KB）")
+        snapshot = os.path.join(CORPUS_DIR, f"{date}.json")
+        note = read_snapshot(snapshot).get("note", "")
+        write_snapshot(date, read_page(page), snapshot, {"url": url, "source": "fetched", "note": note})
+
+
+def update():
+    for date, page, snapshot in corpus_files():
+        previous = read_snapshot(snapshot)
+        info = {
+            "url": previous.get("url", HuangLiScraper.BASE_URL.format(date=date)),
+            "source": previous.get("source", "fetched"),
+            "note": previous.get("note", ""),
+        }
+        write_snapshot(date, read_page(page), snapshot, info)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="黄历网页离线语料库：解析结果回归检查与基准测试")
+    parser.add_argument("--update", action="store_true", help="用参照解析器重新生成所有快照")
+    parser.add_argument("--fetch", nargs="+", metavar="DATE", help="联网保存网站上指定日期的网页并生成快照")
+    args = parser.parse_args()
+    if args.fetch:
+        return fetch(args.fetch)
+    if args.update:
+        return update()
+
+    files = corpus_files()
+    if not files:
+        print(f"语料库为空: {CORPUS_DIR}")
+        print("请先联网保存网页，例如: python benchmarks/bench_huangli_corpus.py --fetch 2025-01-29 2025-04-04 2025-07-25 2025-11-15")
+        return
+    backends = html_backend.available_backends()
+    print(f"已安装的解析后端: {', '.join(backends)}；{len(files)} 个页面，每个页面解析 {ROUNDS} 次取平均")
+    failed = 0
+    totals = {backend: [0.0, 0.0, 0] for backend in backends}
+    for date, page, snapshot in files:
+        html = read_page(page)
+        expected = read_snapshot(snapshot)
+        if not expected:
+            failed += 1
+            print(f"失败  {date}: 没有快照，请运行 --update")
+            continue
+        note = f"{expected.get('note', '')} {expected.get('source', '')}".strip()
+        problems = check(date, html, expected)
+        if problems:
+            failed += 1
+            print(f"失败  {date} {note}")
+            for problem in problems:
+                print(f"      {problem}")
+            continue
+        print(f"通过  {date} {note}（{len(html.encode('utf-8')) // 1024}KB）")
+        for backend in backends:
+            elapsed, peak, blocks = measure(backend, html, date)
+            totals[backend][0] += elapsed
+            totals[backend][1] = max(totals[backend][1], peak)
+            totals[backend][2] += blocks
+            print(f"      {backend:<12} {elapsed:7.2f}ms  内存峰值 {peak:8.0f}KB  文档树内存块 {blocks:7d}")
+
+    passed = len(files) - failed
+    if passed:
+        print("平均每个页面:")
+        for backend, (elapsed, peak, blocks) in totals.items():
+            print(f"  {backend:<12} {elapsed / passed:7.2f}ms  内存峰值最大 {peak:8.0f}KB  文档树内存块 {blocks // passed:7d}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
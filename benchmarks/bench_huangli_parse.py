@@ -0,0 +1,284 @@
+"""
+黄历网页解析基准测试
+
+对比旧版逐项搜索文档树的解析（html.parser建树，每个字段各扫描一次整棵树）与 huangli_extractor
+在各个已安装的解析后端（html_backend）上的单次遍历抽取。先核对所有后端的解析结果与旧版完全一致，再统计耗时。
+默认使用合成的黄历页面，也可以传入保存的网页文件:
+
+    python benchmarks/bench_huangli_parse.py [page.html ...]
+"""
+
+import importlib
+import os
+import re
+import sys
+import time
+import types
+import warnings
+
+from bs4 import BeautifulSoup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 只加载解析相关的模块，不初始化NoneBot
+package = types.ModuleType("xisoul_bench")
+package.__path__ = [ROOT]
+sys.modules[package.__name__] = package
+huangli_extractor = importlib.import_module("xisoul_bench.huangli_extractor")
+html_backend = importlib.import_module("xisoul_bench.html_backend")
+split_terms = importlib.import_module("xisoul_bench.almanac_store").split_terms
+
+ROUNDS = 20
+
+# 旧版使用已弃用的 find(text=...)
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+
+def legacy_extract(soup, date):
+    """
+    旧版 HuangLiScraper.parse_html_content 中建树之后的部分，用于核对解析结果
+
+    与原样相比修正了星宿、月令、物候正则中多余的反斜杠（原来匹配冒号后的字面反斜杠，这三项在网站的网页中解析不到），
+    并增加了后来加入的宜忌规则
+    """
+    result = {
+        'date': date,
+        'basic_info': {},
+        'wu_xing': {},
+        'chong_he': {},
+        'san_sha': {},
+        'qi_sha': {},
+        'ji_xiong': {},
+        'gua_xiang': {},
+        'yue_ling': {},
+        'tian_shen': {},
+        'er_shi_ba_xiu': {},
+        'di_mu_jing': {},
+        'yi_ji': {},
+        'errors': []
+    }
+
+    try:
+        xiu_element = soup.find(text=re.compile('今日星宿'))
+        if xiu_element and xiu_element.parent:
+            xiu_text = xiu_element.parent.get_text()
+            xiu_match = re.search(r'今日星宿：\s*([^的]+)', xiu_text)
+            if xiu_match:
+                result['basic_info']['star'] = xiu_match.group(1).strip()
+
+        page_text = soup.get_text('\n')
+        for key, label in (('yi', '宜'), ('ji', '忌')):
+            match = re.search(rf'(?:^|\n)\s*(?:今日)?{label}\s*[:：]?\s*\n?\s*([^\n]+)', page_text)
+            if match:
+                result['yi_ji'][key] = split_terms(match.group(1))
+
+        wu_xing_elements = soup.find_all(text=re.compile('[年月日]五行'))
+        for element in wu_xing_elements:
+            if element.parent:
+                wu_xing_text = element.parent.get_text()
+                if '年五行' in wu_xing_text:
+                    match = re.search(r'年五行：([^\s]+)', wu_xing_text)
+                    if match:
+                        result['wu_xing']['year'] = match.group(1).strip()
+                elif '月五行' in wu_xing_text:
+                    match = re.search(r'月五行：([^\s]+)', wu_xing_text)
+                    if match:
+                        result['wu_xing']['month'] = match.group(1).strip()
+                elif '日五行' in wu_xing_text:
+                    match = re.search(r'日五行：([^\s]+)', wu_xing_text)
+                    if match:
+                        result['wu_xing']['day'] = match.group(1).strip()
+
+        chong_he_element = soup.find(text=re.compile('今日冲合'))
+        if chong_he_element and chong_he_element.parent:
+            chong_he_text = chong_he_element.parent.get_text()
+            result['chong_he']['info'] = chong_he_text.replace('今日冲合', '').strip()
+
+        san_sha_elements = soup.find_all(text=re.compile('三煞'))
+        for element in san_sha_elements:
+            if element.parent:
+                san_sha_text = element.parent.get_text()
+                if '本年三煞' in san_sha_text:
+                    match = re.search(r'本年三煞：([^;]+)', san_sha_text)
+                    if match:
+                        result['san_sha']['year'] = match.group(1).strip()
+                elif '本月三煞' in san_sha_text:
+                    match = re.search(r'本月三煞：([^;]+)', san_sha_text)
+                    if match:
+                        result['san_sha']['month'] = match.group(1).strip()
+                elif '今日三煞' in san_sha_text:
+                    match = re.search(r'今日三煞：([^;]+)', san_sha_text)
+                    if match:
+                        result['san_sha']['day'] = match.group(1).strip()
+
+        qi_sha_elements = soup.find_all(text=re.compile('七煞'))
+        for element in qi_sha_elements:
+            if element.parent:
+                qi_sha_text = element.parent.get_text()
+                if '年七煞' in qi_sha_text:
+                    match = re.search(r'年七煞：([^\s]+)', qi_sha_text)
+                    if match:
+                        result['qi_sha']['year'] = match.group(1).strip()
+                elif '月七煞' in qi_sha_text:
+                    match = re.search(r'月七煞：([^\s]+)', qi_sha_text)
+                    if match:
+                        result['qi_sha']['month'] = match.group(1).strip()
+                elif '日七煞' in qi_sha_text:
+                    match = re.search(r'日七煞：([^\s]+)', qi_sha_text)
+                    if match:
+                        result['qi_sha']['day'] = match.group(1).strip()
+
+        jiu_xing_element = soup.find(text=re.compile('今日河图洛书九星吉凶'))
+        if jiu_xing_element:
+            jiu_xing_div = jiu_xing_element.find_parent(['div', 'p'])
+            if jiu_xing_div:
+                result['ji_xiong']['nine_star'] = jiu_xing_div.get_text().replace('今日河图洛书九星吉凶', '').strip()
+
+        gua_xiang_element = soup.find(text=re.compile('今日卦象'))
+        if gua_xiang_element and gua_xiang_element.parent:
+            gua_xiang_div = gua_xiang_element.find_parent(['div', 'p'])
+            if gua_xiang_div:
+                result['gua_xiang']['info'] = gua_xiang_div.get_text().replace('今日卦象：', '').strip()
+
+                next_element = gua_xiang_div.find_next(['div', 'p'])
+                if next_element:
+                    gua_desc = []
+                    current = next_element
+                    while current and not any(keyword in current.get_text() for keyword in ['月令', '物候', '今日十二神', '二十八星宿']):
+                        gua_desc.append(current.get_text().strip())
+                        current = current.find_next(['div', 'p'])
+                    result['gua_xiang']['description'] = '\n'.join(gua_desc)
+
+        yue_ling_element = soup.find(text=re.compile('月令'))
+        if yue_ling_element and yue_ling_element.parent:
+            yue_ling_text = yue_ling_element.parent.get_text()
+            match = re.search(r'月令：\s*([^\s]+)', yue_ling_text)
+            if match:
+                result['yue_ling']['month'] = match.group(1).strip()
+
+        wu_hou_element = soup.find(text=re.compile('物候'))
+        if wu_hou_element and wu_hou_element.parent:
+            wu_hou_text = wu_hou_element.parent.get_text()
+            match = re.search(r'物候：\s*([^\s]+)', wu_hou_text)
+            if match:
+                result['yue_ling']['phenology'] = match.group(1).strip()
+
+        er_shi_shen_element = soup.find(text=re.compile('今日十二神吉凶所主'))
+        if er_shi_shen_element and er_shi_shen_element.parent:
+            er_shi_shen_div = er_shi_shen_element.find_parent(['div', 'p'])
+            if er_shi_shen_div:
+                result['tian_shen']['twelve_gods'] = er_shi_shen_div.get_text().replace('今日十二神吉凶所主', '').strip()
+
+        er_shi_ba_xiu_element = soup.find(text=re.compile('今日二十八星宿吉凶'))
+        if er_shi_ba_xiu_element and er_shi_ba_xiu_element.parent:
+            er_shi_ba_xiu_div = er_shi_ba_xiu_element.find_parent(['div', 'p'])
+            if er_shi_ba_xiu_div:
+                result['er_shi_ba_xiu']['info'] = er_shi_ba_xiu_div.get_text().replace('今日二十八星宿吉凶', '').strip()
+
+        di_mu_jing_element = soup.find(text=re.compile('地母经卜曰'))
+        if di_mu_jing_element:
+            div_element = di_mu_jing_element.find_parent(['div', 'p'])
+            if div_element:
+                result['di_mu_jing']['divination'] = div_element.get_text().replace('地母经卜曰', '').strip()
+
+                shi_yue_element = soup.find(text=re.compile('地母经诗曰'))
+                if shi_yue_element and shi_yue_element.parent:
+                    result['di_mu_jing']['poem'] = shi_yue_element.parent.get_text().replace('地母经诗曰', '').strip()
+
+    except Exception as e:
+        result['errors'].append(str(e))
+
+    return result
+
+
+def legacy_parse(html_content, date):
+    """旧版 HuangLiScraper.parse_html_content"""
+    return legacy_extract(BeautifulSoup(html_content, 'html.parser'), date)
+
+
+def backend_parse(backend, html_content, date):
+    """当前 HuangLiScraper.parse_html_content 在指定后端上的实现"""
+    return huangli_extractor.extract(html_backend.BACKENDS[backend](html_content), date)
+
+
+def synthesize_page(filler=200):
+    """合成一个结构与黄历网站相近的页面：导航、脚本、注释和大量无关区块中夹着各个黄历栏目"""
+    noise = "".join(
+        f'<div class="item"><a href="/news/{i}.html">资讯标题{i}</a><span>2025-06-{i % 28 + 1:02d}</span></div>'
+        for i in range(filler)
+    )
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>2025年6月15日黄历</title>
+<style>.item{{color:red}}</style></head>
+<body>
+<div class="nav"><a href="/">首页</a><a href="/huangli/">黄历</a><a href="/jieri/">节日</a></div>
+<div class="main">
+  <div class="box"><h2>基本信息</h2><p>今日星宿：心月狐的日子</p></div>
+  <div class="yiji"><div class="yi">宜</div><div>祭祀 祈福 求嗣 出行 解除</div>
+  <div class="ji">忌</div><div>动土 破土 安葬</div></div>
+  <ul class="wx"><li>年五行：覆灯火 </li><li>月五行：杨柳木 </li><li>日五行：大溪水 </li></ul>
+  <p>今日冲合 冲鸡（己酉）煞西 六合：辰 三合：申子</p>
+  <ul class="sha"><li>本年三煞：东;</li><li>本月三煞：北;</li><li>今日三煞：西;</li></ul>
+  <ul class="qs"><li>年七煞：东北 </li><li>月七煞：正南 </li><li>日七煞：西北 </li></ul>
+  <div class="nine"><h3>今日河图洛书九星吉凶</h3><span>二黑巨门星 吉</span></div>
+  <div class="gua"><b>今日卦象：</b>地天泰</div>
+  <div class="desc">泰卦，小往大来，吉亨。</div>
+  <p>象曰：天地交，泰。</p>
+  <div class="yl"><span>月令：仲夏</span></div>
+  <div class="wh"><span>物候：螳螂生</span></div>
+  <div class="ts"><h3>今日十二神吉凶所主</h3><p>青龙 明堂 吉</p></div>
+  <div class="xiu"><h3>今日二十八星宿吉凶</h3><p>心月狐 凶</p></div>
+  <div class="dmj"><h3>地母经卜曰</h3><p>太岁乙巳年，高下好桑麻。</p></div>
+  <div class="poem">地母经诗曰 春夏多雨水，秋冬得丰收。</div>
+</div>
+<div class="list">{noise}</div>
+<div class="footer">版权所有 <!-- 今日冲合 地母经诗曰 --></div>
+<script>var config = {{"today": "今日卦象"}};</script>
+</body></html>"""
+
+
+def bench(func, *args):
+    """平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(*args)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def main():
+    page = synthesize_page()
+    pages = [("合成页面", page), ("合成页面(CRLF)", page.replace("\n", "\r\n"))]
+    for path in sys.argv[1:]:
+        with open(path, "r", encoding="utf-8") as f:
+            pages.append((os.path.basename(path), f.read()))
+    backends = html_backend.available_backends()
+    print(f"已安装的解析后端: {', '.join(backends)}")
+
+    failed = 0
+    date = "2025-06-15"
+    for name, html in pages:
+        # parse_html_content 先统一换行符，旧版解析同样的内容
+        html = html_backend.normalize_newlines(html)
+        expected = legacy_parse(html, date)
+        fields = sum(len(value) for value in expected.values() if isinstance(value, dict))
+        legacy = bench(legacy_parse, html, date)
+        print(f"{name}（{len(html) // 1024}KB，{fields} 个字段）: 旧版 {legacy:.2f}ms")
+        for backend in backends:
+            actual = backend_parse(backend, html, date)
+            if actual != expected:
+                failed += 1
+                print(f"  失败  {backend}: 解析结果不一致")
+                for key in expected:
+                    if expected[key] != actual.get(key):
+                        print(f"      {key}: 旧版 {expected[key]!r} / {backend} {actual.get(key)!r}")
+                continue
+            build = bench(html_backend.BACKENDS[backend], html)
+            total = bench(backend_parse, backend, html, date)
+            print(f"  通过  {backend}: 建树 {build:.2f}ms，建树+抽取 {total:.2f}ms，{legacy / total:.1f}x")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+网页解析工作池基准测试
+
+同时解析一批黄历页面，对比直接在事件循环中解析与放到线程池、进程池中解析时，
+事件循环的最大卡顿（心跳协程的最大延迟）和总耗时。需要安装 nonebot2 和 lxml 或 beautifulsoup4:
+
+    python benchmarks/bench_parse_pool.py [页面数]
+"""
+
+import asyncio
+import importlib
+import os
+import sys
+import time
+import types
+
+import nonebot
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+nonebot.init(driver="~none")
+
+# 只加载解析相关的模块，不加载整个插件
+package = types.ModuleType("xisoul_bench")
+package.__path__ = [ROOT]
+sys.modules[package.__name__] = package
+parse_pool = importlib.import_module("xisoul_bench.parse_pool")
+huangli_extractor = importlib.import_module("xisoul_bench.huangli_extractor")
+
+from bench_huangli_parse import synthesize_page
+
+HEARTBEAT = 0.005
+
+
+async def heartbeat(stop: asyncio.Event) -> float:
+    """每5ms醒来一次，返回实际间隔超出的最大值（秒），即事件循环的最大卡顿"""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT)
+        worst = max(worst, time.perf_counter() - start - HEARTBEAT)
+    return worst
+
+
+async def run(mode: str, pages, backend: str):
+    async def parse_inline(html, date):
+        return huangli_extractor.parse_page(html, date, backend)
+
+    async def parse_pooled(html, date):
+        return await parse_pool.run_parse(huangli_extractor.parse_page, html, date, backend)
+
+    if mode != "inline":
+        parse_pool.shutdown_parse_pool()
+        parse_pool.XISOUL_PARSE_MODE = mode
+        # 先创建工作池（进程池的fork不计入；已有其他线程时改用线程池）
+        parse_pool.start_parse_pool()
+        await parse_pool.run_parse(len, "")
+    parse = parse_inline if mode == "inline" else parse_pooled
+
+    stop = asyncio.Event()
+    beat = asyncio.ensure_future(heartbeat(stop))
+    start = time.perf_counter()
+    results = await asyncio.gather(*(parse(html, f"2025-06-{i % 28 + 1:02d}") for i, html in enumerate(pages)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    worst = await beat
+    assert all(consistent and not result["errors"] for result, consistent in results)
+    print(f"  {mode:<8} 总耗时 {elapsed * 1000:8.1f}ms，事件循环最大卡顿 {worst * 1000:7.1f}ms")
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    pages = [synthesize_page() for _ in range(count)]
+    print(f"工作线程/进程数 {parse_pool.XISOUL_PARSE_WORKERS}，最大排队 {parse_pool.XISOUL_PARSE_MAX_PENDING}，{count} 个页面")
+    for backend in huangli_extractor.available_backends():
+        print(f"解析后端 {backend}:")
+        for mode in ("inline", "thread", "process"):
+            await run(mode, pages, backend)
+    parse_pool.shutdown_parse_pool()
+    print(parse_pool.parse_pool_summary())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+"""
+命令路由基准测试
+
+对比旧版"每个命令一个on_message规则"与单一命令路由器的单条消息分发耗时。
+不依赖NoneBot，可直接运行:
+
+    python benchmarks/bench_router.py
+"""
+
+import asyncio
+import importlib.util
+import os
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+spec = importlib.util.spec_from_file_location("command_router", os.path.join(ROOT, "command_router.py"))
+command_router = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(command_router)
+
+
+class Segment:
+    """模拟OneBot消息段"""
+
+    def __init__(self, type_, data):
+        self.type = type_
+        self.data = data
+
+    def __str__(self):
+        if self.type == "text":
+            return self.data["text"].replace("&", "&amp;").replace("[", "&#91;").replace("]", "&#93;")
+        params = ",".join(f"{k}={v}" for k, v in self.data.items())
+        return f"[CQ:{self.type},{params}]"
+
+
+class Message(list):
+    """模拟OneBot消息，str()时与真实Message一样逐段序列化"""
+
+    def __str__(self):
+        return "".join(str(seg) for seg in self)
+
+
+class Event:
+    def __init__(self, message):
+        self.message = message
+
+
+def text(s):
+    return Message([Segment("text", {"text": s})])
+
+
+# 群聊中的典型消息：绝大部分都不是命令
+SAMPLES = [
+    text("哈哈哈哈"),
+    text("今天晚上吃什么"),
+    text("有人一起打游戏吗？" * 3),
+    Message([Segment("image", {"file": "abcdef0123456789.image", "url": "https://example.com/x.jpg"})]),
+    Message([Segment("face", {"id": "178"})]),
+    Message([Segment("reply", {"id": "12345"}), Segment("text", {"text": "收到"})]),
+    text("长消息" * 400),
+    text("sjbs"),
+    text("ai 帮我写一首诗"),
+    text("hl 2025-01-01"),
+]
+
+EXACT = ["帮助", "插件帮助", "xihelp", "sjbs", "sjhs", "sjmt", "sjecy", "sjsk", "新闻图片",
+         "当前模型", "切换千问", "切换gpt", "切换deepseek", "重置模型", "清理历史", "ollama帮助",
+         "文字黄历", "文本黄历", "hl"]
+
+
+def build_legacy_rules():
+    """还原旧版的on_message规则集合：每个规则都各自序列化一次消息"""
+    rules = []
+
+    def exact_rule(names):
+        async def rule(event):
+            message = str(event.message).strip()
+            return message in names
+        return rule
+
+    rules.append(exact_rule(["帮助", "插件帮助", "xihelp"]))
+    for name in EXACT[3:]:
+        rules.append(exact_rule([name]))
+
+    async def ai_rule(event):
+        message = str(event.message).strip()
+        return message.strip().lower().startswith("ai ")
+
+    async def hl_rule(event):
+        return str(event.message).strip().startswith("hl ")
+
+    rules.append(ai_rule)
+    rules.append(hl_rule)
+    return rules
+
+
+def build_router():
+    async def handler(*args):
+        return None
+
+    router = command_router.CommandRouter(command_start=["/"])
+    router.add_exact(EXACT, handler)
+    router.add_prefix("hl ", handler)
+    router.add_prefix("ai ", handler, ignore_case=True)
+    return router
+
+
+async def run_legacy(events, rules, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for event in events:
+            for rule in rules:
+                if await rule(event):
+                    break
+    return time.perf_counter() - start
+
+
+async def run_router(events, router, rounds):
+    async def rule(event):
+        return router.match(event.message) is not None
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for event in events:
+            await rule(event)
+    return time.perf_counter() - start
+
+
+def main(rounds=5000):
+    events = [Event(m) for m in SAMPLES]
+    rules = build_legacy_rules()
+    router = build_router()
+    total = rounds * len(events)
+
+    legacy = asyncio.run(run_legacy(events, rules, rounds))
+    routed = asyncio.run(run_router(events, router, rounds))
+
+    print(f"消息数: {total}，旧版规则数: {len(rules)}")
+    print(f"旧版on_message规则: {legacy / total * 1e6:8.2f} us/消息")
+    print(f"单一命令路由器:     {routed / total * 1e6:8.2f} us/消息")
+    print(f"加速比: {legacy / routed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
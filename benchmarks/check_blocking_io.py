@@ -0,0 +1,221 @@
+"""
+事件循环阻塞检查
+
+在 forbid_blocking_io() 下执行各个会读写文件的命令，以及新闻图片的定时群发和测试群发，执行过程中一旦在事件循环线程里同步访问磁盘就会失败：
+打开文件、查询文件状态（os.path.exists/isfile/getsize 等）、列出目录、创建/删除/重命名文件，
+以及检查期间新建的SQLite连接上的查询和提交。检查开始前已建立的SQLite连接不在检查范围内。
+上游接口使用 httpx.MockTransport 模拟，缓存写入临时目录，不会访问网络。需要安装插件依赖后运行:
+
+    python benchmarks/check_blocking_io.py
+"""
+
+import asyncio
+import builtins
+import importlib.util
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+from importlib import import_module
+
+import httpx
+import nonebot
+from nonebot.adapters.onebot.v11 import Adapter, Bot, Message
+
+nonebot.init(driver="~none", shwgij_api_key="check", shwgij_cron_enable=0, xisoul_http_warmup=0,
+             command_start=["/", ""])
+nonebot.get_driver().register_adapter(Adapter)
+plugin = nonebot.load_plugin(os.path.basename(ROOT))
+xisoul = plugin.module
+
+file_io = import_module(f"{xisoul.__name__}.file_io")
+http_client = import_module(f"{xisoul.__name__}.http_client")
+cache_manifest = import_module(f"{xisoul.__name__}.cache_manifest")
+
+# 检查期间替换的 os 模块中访问磁盘的函数（os.path 中的查询函数都通过 os.stat 实现）
+GUARDED_OS_FUNCTIONS = ("stat", "lstat", "scandir", "listdir", "mkdir", "makedirs", "remove", "unlink", "rename", "replace")
+# SQLite连接上访问磁盘的方法
+GUARDED_SQLITE_METHODS = ("execute", "executemany", "executescript", "commit")
+
+
+class BlockingIOInLoopError(RuntimeError):
+    """在事件循环线程中执行了同步磁盘操作"""
+
+
+@contextmanager
+def forbid_blocking_io():
+    """
+    检查期间禁止在当前（事件循环）线程中同步访问磁盘
+
+    违规的调用会抛出BlockingIOInLoopError，同时记录到yield出的列表中（调用方可能捕获了异常）；
+    线程池中的文件操作不受影响
+    """
+    loop_thread = threading.get_ident()
+    violations: List[str] = []
+
+    def check(name, target):
+        if threading.get_ident() == loop_thread:
+            violations.append(f"{name}({target})")
+            raise BlockingIOInLoopError(f"在事件循环线程中同步调用 {name}: {target}")
+
+    def guard(name, func):
+        def guarded(*args, **kwargs):
+            check(name, args[0] if args else "")
+            return func(*args, **kwargs)
+        return guarded
+
+    class GuardedConnection(sqlite3.Connection):
+        pass
+
+    for method in GUARDED_SQLITE_METHODS:
+        def make(method):
+            original = getattr(sqlite3.Connection, method)
+
+            def guarded(self, *args, **kwargs):
+                check(f"sqlite3.Connection.{method}", args[0] if args else "")
+                return original(self, *args, **kwargs)
+            return guarded
+        setattr(GuardedConnection, method, make(method))
+
+    original_connect = sqlite3.connect
+
+    def guarded_connect(database, *args, **kwargs):
+        check("sqlite3.connect", database)
+        kwargs.setdefault("factory", GuardedConnection)
+        return original_connect(database, *args, **kwargs)
+
+    originals = {name: getattr(os, name) for name in GUARDED_OS_FUNCTIONS}
+    original_open = builtins.open
+    guarded_open = guard("open", original_open)
+    builtins.open = guarded_open
+    io.open = guarded_open
+    sqlite3.connect = guarded_connect
+    for name, func in originals.items():
+        setattr(os, name, guard(f"os.{name}", func))
+    try:
+        yield violations
+    finally:
+        builtins.open = original_open
+        io.open = original_open
+        sqlite3.connect = original_connect
+        for name, func in originals.items():
+            setattr(os, name, func)
+
+
+# 约3MB的假图片
+FAKE_IMAGE = b"\xff\xd8\xff" + os.urandom(3 * 1024 * 1024)
+
+
+def mock_upstream(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, headers={"content-type": "image/jpeg"}, content=FAKE_IMAGE)
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, event, message):
+        self.sent.append(message)
+
+
+class FakeEvent:
+    def __init__(self, text):
+        self.message = Message(text)
+
+    def get_user_id(self):
+        return "10000"
+
+
+class FakeGroupBot(Bot):
+    """群发时使用的bot，只记录发送的群"""
+
+    async def get_group_list(self):
+        return [{"group_id": 10001}, {"group_id": 10002}]
+
+    async def send_group_msg(self, group_id, message):
+        self.sent.append(group_id)
+
+
+async def run_command(text):
+    route = xisoul.router.match(Message(text))
+    bot = FakeBot()
+    await route.run(bot, FakeEvent(text))
+    return bot.sent
+
+
+async def main():
+    http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(mock_upstream))
+
+    # 新闻缓存写入临时目录
+    lunar_news = xisoul.lunar_news
+    cache_dir = tempfile.mkdtemp(prefix="xisoul_check_")
+    lunar_news.CACHE_DIR = cache_dir
+    lunar_news.TEMP_IMAGE_FILE = os.path.join(cache_dir, "temp_news_image.jpg")
+    lunar_news.cache_manifest = cache_manifest.CacheManifest(cache_dir)
+    await file_io.run_io(lunar_news.cache_manifest.load)
+
+    # 群发发送到两个群，群发日志写入临时目录（缓存目录在检查中由群发流程创建）
+    group_bot = FakeGroupBot(nonebot.get_driver()._adapters[Adapter.get_name()], "20000")
+    group_bot.sent = []
+    lunar_news.get_bots = lambda: {group_bot.self_id: group_bot}
+    lunar_news.SHWGIJ_SEND_GROUPS = "10001,10002"
+    lunar_news.CACHE_DIR = os.path.join(cache_dir, "news")
+    lunar_news.broadcast_journal = lunar_news.BroadcastJournal(os.path.join(cache_dir, "broadcast_journal.db"))
+
+    async def broadcast(send):
+        group_bot.sent = []
+        await send()
+        return group_bot.sent
+
+    cases = [
+        ("新闻图片（请求接口并写入缓存）", "新闻图片", None),
+        ("新闻图片（内存缓存）", "新闻图片", None),
+        ("新闻图片（读取磁盘缓存）", "新闻图片", lunar_news.clear_news_cache),
+        ("随机图片（下载、写入并读取临时文件）", "sjbs", None),
+        ("新闻图片定时群发（写入群发日志）", lambda: broadcast(lunar_news.send_news_image_to_groups), None),
+        ("新闻图片测试群发", lambda: broadcast(lunar_news.test_news_image_sending), None),
+    ]
+    if importlib.util.find_spec("nonebot_plugin_htmlrender") is not None:
+        lunar_image = import_module(f"{xisoul.__name__}.lunar_image")
+
+        async def fake_screenshot():
+            return FAKE_IMAGE
+
+        lunar_image.capture_today_screenshot = fake_screenshot
+        cases.append(("图片黄历（写入并读取截图文件）", "hl", None))
+    else:
+        print("跳过图片黄历: 未安装 nonebot-plugin-htmlrender")
+
+    failed = 0
+    for name, action, prepare in cases:
+        if prepare is not None:
+            await prepare()
+        violations = []
+        try:
+            with forbid_blocking_io() as violations:
+                sent = await (run_command(action) if isinstance(action, str) else action())
+        except BlockingIOInLoopError:
+            sent = []
+        if violations:
+            failed += 1
+            print(f"失败  {name}: 在事件循环线程中同步访问了磁盘 {', '.join(violations)}")
+        else:
+            print(f"通过  {name}: 发送了 {len(sent)} 条消息")
+
+    # 等待后台写入的缓存清单
+    await asyncio.sleep(0.1)
+    await http_client.close_http_client()
+    file_io.shutdown_file_io()
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)
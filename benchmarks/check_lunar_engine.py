@@ -0,0 +1,176 @@
+"""
+本地黄历计算校验
+
+用已知的春节日期和闰月核对 lunar_engine 的农历推算；再与 lunar_python（寿星天文历算法）逐个核对
+1899-2101年的每个节气日期，以及1900-2100年每一天的农历日期、月干支、建除十二值星和月九星，最后统计计算耗时。
+lunar_engine 不依赖NoneBot，核对需要安装 lunar_python（只用于校验，插件运行时不需要），逐日核对约需两分钟:
+
+    python benchmarks/check_lunar_engine.py
+    python benchmarks/check_lunar_engine.py --tables   # 用 lunar_python 重新生成 lunar_engine 中的节气表和朔日表
+"""
+
+import importlib.util
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+spec = importlib.util.spec_from_file_location("lunar_engine", os.path.join(ROOT, "lunar_engine.py"))
+lunar_engine = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(lunar_engine)
+
+# 春节（正月初一）
+SPRING_FESTIVALS = [
+    "1900-01-31", "1912-02-18", "1949-01-29", "1950-02-17", "1976-01-31", "1984-02-02", "1990-01-27",
+    "2000-02-05", "2004-01-22", "2008-02-07", "2012-01-23", "2017-01-28", "2020-01-25", "2021-02-12",
+    "2022-02-01", "2023-01-22", "2024-02-10", "2025-01-29", "2026-02-17", "2027-02-06", "2030-02-03",
+]
+# 农历年 -> 闰月
+LEAP_MONTHS = {
+    1984: 10, 1987: 6, 1990: 5, 1995: 8, 2001: 4, 2004: 2, 2006: 7, 2009: 5, 2012: 4, 2014: 9,
+    2017: 6, 2020: 4, 2023: 2, 2025: 6, 2028: 5, 2031: 3, 2033: 11, 2036: 6, 2039: 5, 2042: 2,
+}
+# 公历日期 -> (农历, 日干支)
+KNOWN_DAYS = {
+    "1949-10-01": ("八月初十", "甲子"),
+    "2024-02-10": ("正月初一", "甲辰"),
+    "2023-03-22": ("闰二月初一", "己卯"),
+}
+
+
+def find_leap_month(lunar_year):
+    for year in (lunar_year, lunar_year + 1):
+        for _, month, leap, owner in lunar_engine.lunar_months(year)[:-1]:
+            if leap and owner == lunar_year:
+                return month
+    return None
+
+
+def reference_terms(year):
+    """lunar_python 计算的year年二十四节气（从小寒开始）所在日期的儒略日数"""
+    from lunar_python import Solar
+
+    table = Solar.fromYmd(year, 6, 1).getLunar().getJieQiTable()
+    # 农历年的节气表中，本年的冬至以拼音为键（汉字的冬至为上一年的）
+    names = lunar_engine.JIE_QI[:23] + ["DONG_ZHI"]
+    return [
+        date(table[name].getYear(), table[name].getMonth(), table[name].getDay()).toordinal() + lunar_engine.JDN_OFFSET
+        for name in names
+    ]
+
+
+def reference_new_moons():
+    """lunar_python 计算的朔日表覆盖范围内每个朔所在日期的儒略日数"""
+    from lunar_python import LunarYear
+
+    first = lunar_engine._mean_new_moon(lunar_engine.NEW_MOON_K0) - 1
+    starts = set()
+    for year in range(lunar_engine.TABLE_MIN_YEAR - 1, lunar_engine.TABLE_MAX_YEAR + 2):
+        for month in LunarYear.fromYear(year).getMonths():
+            starts.add(int(round(month.getFirstJulianDay())))
+    count = len(lunar_engine._NEW_MOONS)
+    return sorted(start for start in starts if start >= first)[:count]
+
+
+def print_tables():
+    """按 lunar_engine 中的格式输出节气表和朔日表"""
+    terms = "".join(
+        str(jdn - lunar_engine._mean_solar_term(year, index) + 2)
+        for year in range(lunar_engine.TABLE_MIN_YEAR, lunar_engine.TABLE_MAX_YEAR + 1)
+        for index, jdn in enumerate(reference_terms(year))
+    )
+    moons = "".join(
+        str(jdn - lunar_engine._mean_new_moon(lunar_engine.NEW_MOON_K0 + i) + 1)
+        for i, jdn in enumerate(reference_new_moons())
+    )
+    print("_SOLAR_TERM_TABLE = (")
+    for i in range(0, len(terms), 96):
+        print(f'    "{terms[i:i + 96]}"')
+    print(")")
+    print("_NEW_MOON_TABLE = (")
+    for i in range(0, len(moons), 100):
+        print(f'    "{moons[i:i + 100]}"')
+    print(")")
+
+
+def check_reference():
+    """与 lunar_python 逐个核对节气日期和每一天的历法信息，返回失败数"""
+    from lunar_python import Solar
+
+    failed = 0
+    checked_terms = 0
+    for year in range(lunar_engine.TABLE_MIN_YEAR, lunar_engine.TABLE_MAX_YEAR + 1):
+        for name, actual, expected in zip(lunar_engine.JIE_QI, lunar_engine.solar_terms(year), reference_terms(year)):
+            checked_terms += 1
+            if actual != expected:
+                failed += 1
+                print(f"失败  {year}年{name}: 应为 {lunar_engine._from_jdn(expected)}，推算为 {lunar_engine._from_jdn(actual)}")
+
+    checked_days = 0
+    day = date(lunar_engine.MIN_YEAR, 1, 1)
+    while day.year <= lunar_engine.MAX_YEAR:
+        lunar = Solar.fromYmd(day.year, day.month, day.day).getLunar()
+        expected = (
+            (lunar.getYear(), abs(lunar.getMonth()), lunar.getDay(), lunar.getMonth() < 0),
+            lunar.getMonthInGanZhi(), lunar.getZhiXing(), lunar.getMonthNineStar().getNumber(),
+        )
+        almanac = lunar_engine.compute_almanac(datetime(day.year, day.month, day.day, 12))
+        actual = (
+            tuple(lunar_engine.solar_to_lunar(day)),
+            almanac["GanZhiMonth"], almanac["ZhiXing"], almanac["JiuXingMonth"][0],
+        )
+        checked_days += 1
+        if actual != expected:
+            failed += 1
+            if failed <= 20:
+                print(f"失败  {day}: 应为 {expected}，推算为 {actual}")
+        day += timedelta(days=1)
+    print(f"与 lunar_python 核对 {checked_terms} 个节气、{checked_days} 天的农历日期和月干支、值星、月九星，失败 {failed} 个")
+    return failed
+
+
+def main():
+    failed = 0
+    for text in SPRING_FESTIVALS:
+        day = date.fromisoformat(text)
+        lunar = lunar_engine.solar_to_lunar(day)
+        if (lunar.month, lunar.day, lunar.leap, lunar.year) != (1, 1, False, day.year):
+            failed += 1
+            print(f"失败  春节 {text}: 推算为 {lunar}")
+    for lunar_year, month in LEAP_MONTHS.items():
+        found = find_leap_month(lunar_year)
+        if found != month:
+            failed += 1
+            print(f"失败  {lunar_year}年闰月: 应为闰{month}月，推算为 {found}")
+    for text, (lunar_text, gan_zhi) in KNOWN_DAYS.items():
+        almanac = lunar_engine.compute_almanac(datetime.fromisoformat(f"{text}T12:00:00"))
+        if (almanac["Lunar"], almanac["GanZhiDay"]) != (lunar_text, gan_zhi):
+            failed += 1
+            print(f"失败  {text}: 应为 {lunar_text} {gan_zhi}日，推算为 {almanac['Lunar']} {almanac['GanZhiDay']}日")
+    print(f"校验 {len(SPRING_FESTIVALS)} 个春节、{len(LEAP_MONTHS)} 个闰月、{len(KNOWN_DAYS)} 个日期，失败 {failed} 个")
+    failed += check_reference()
+
+    # 核对时已缓存，清空后再计时
+    lunar_engine.solar_terms.cache_clear()
+    lunar_engine.lunar_months.cache_clear()
+    start = time.perf_counter()
+    for year in range(lunar_engine.MIN_YEAR, lunar_engine.MAX_YEAR + 1):
+        lunar_engine.lunar_months(year)
+    print(f"生成{lunar_engine.MIN_YEAR}-{lunar_engine.MAX_YEAR}年农历月表: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    moment = datetime.now(lunar_engine.SHANGHAI_TZ)
+    rounds = 10000
+    start = time.perf_counter()
+    for i in range(rounds):
+        lunar_engine.compute_almanac(moment + timedelta(hours=i % 24))
+    print(f"计算一天的黄历: 平均 {(time.perf_counter() - start) / rounds * 1e6:.1f}μs")
+    return failed
+
+
+if __name__ == "__main__":
+    if "--tables" in sys.argv[1:]:
+        print_tables()
+    else:
+        sys.exit(1 if main() else 0)
@@ -0,0 +1,152 @@
+"""群发日志 - 使用SQLite记录每次群发中各群的投递状态，重启后只补发剩余的群"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from nonebot import logger
+
+# 投递状态
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+
+class BroadcastJournal:
+    """
+    群发日志
+
+    runs 表记录每次群发及其使用的图片文件，deliveries 表记录每个群的投递状态。
+    读写数据库的方法都是同步的，需要通过 file_io.run_io 在文件读写线程池中调用；
+    queue_mark 只写入内存缓冲，可以在事件循环中直接调用，由 flush 批量写入
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        # 连接在文件读写线程池的多个线程间共用，同一时间只允许一个线程使用
+        self._lock = threading.RLock()
+        # 尚未写入数据库的投递结果，及只在追加、取出缓冲时持有的锁（事件循环不会因其他线程写库而等待）
+        self._marks_lock = threading.Lock()
+        self._marks: List[Tuple[str, Optional[str], float, str, int]] = []
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    image_path TEXT,
+                    created_at REAL NOT NULL,
+                    finished_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS deliveries (
+                    run_id TEXT NOT NULL,
+                    group_id INTEGER NOT NULL,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (run_id, group_id)
+                );
+                """
+            )
+        return self._conn
+
+    def start_run(self, run_id: str, image_path: Optional[str], groups: Iterable[int]):
+        """开始（或继续）一次群发，新加入的群记为待发送，已有记录保持不变"""
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, image_path, created_at) VALUES (?, ?, ?)",
+                (run_id, image_path, now),
+            )
+            if image_path:
+                self.conn.execute("UPDATE runs SET image_path = ? WHERE run_id = ?", (image_path, run_id))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO deliveries (run_id, group_id, state, updated_at) VALUES (?, ?, ?, ?)",
+                [(run_id, int(group_id), PENDING, now) for group_id in groups],
+            )
+
+    def pending_groups(self, run_id: str) -> List[int]:
+        """返回尚未投递的群（先写入缓冲的投递结果）"""
+        with self._lock:
+            self.flush()
+            rows = self.conn.execute(
+                "SELECT group_id FROM deliveries WHERE run_id = ? AND state = ? ORDER BY group_id",
+                (run_id, PENDING),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def queue_mark(self, run_id: str, group_id: int, state: str, error: Optional[str] = None):
+        """记录单个群的投递结果到内存缓冲，不读写磁盘"""
+        with self._marks_lock:
+            self._marks.append((state, error, time.time(), run_id, int(group_id)))
+
+    def flush(self) -> int:
+        """把缓冲的投递结果在一个事务中写入数据库，返回写入的条数"""
+        with self._lock:
+            with self._marks_lock:
+                marks, self._marks = self._marks, []
+            if marks:
+                with self.conn:
+                    self.conn.executemany(
+                        "UPDATE deliveries SET state = ?, error = ?, attempts = attempts + 1, updated_at = ? "
+                        "WHERE run_id = ? AND group_id = ?",
+                        marks,
+                    )
+        return len(marks)
+
+    def mark(self, run_id: str, group_id: int, state: str, error: Optional[str] = None):
+        """记录单个群的投递结果并立即写入"""
+        with self._lock:
+            self.queue_mark(run_id, group_id, state, error)
+            self.flush()
+
+    def finish_run(self, run_id: str):
+        """标记群发结束"""
+        with self._lock:
+            self.flush()
+            with self.conn:
+                self.conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), run_id))
+
+    def unfinished_runs(self) -> List[Tuple[str, Optional[str]]]:
+        """返回所有未结束的群发 (run_id, image_path)"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT run_id, image_path FROM runs WHERE finished_at IS NULL ORDER BY created_at"
+            ).fetchall()
+
+    def counts(self, run_id: str) -> dict:
+        """各投递状态的群数"""
+        with self._lock:
+            self.flush()
+            rows = self.conn.execute(
+                "SELECT state, COUNT(*) FROM deliveries WHERE run_id = ? GROUP BY state", (run_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def prune(self, keep_days: int = 30):
+        """删除过旧的群发记录"""
+        cutoff = time.time() - keep_days * 24 * 60 * 60
+        with self._lock, self.conn:
+            old_runs = [row[0] for row in self.conn.execute(
+                "SELECT run_id FROM runs WHERE created_at < ?", (cutoff,)
+            ).fetchall()]
+            for run_id in old_runs:
+                self.conn.execute("DELETE FROM deliveries WHERE run_id = ?", (run_id,))
+                self.conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+        if old_runs:
+            logger.info(f"[群发日志] 已清理 {len(old_runs)} 条过期群发记录")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self.flush()
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,307 @@
+"""群发核心功能 - 有界并发、根据发送结果自适应调整节奏，并生成每次群发的报告"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from nonebot import logger
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    """判断是否为限流类错误（超时或OneBot retcode 1200），这类错误需要降速并重试"""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    info = getattr(error, "info", None)
+    retcode = getattr(error, "retcode", None)
+    if retcode is None and isinstance(info, dict):
+        retcode = info.get("retcode")
+    if retcode == 1200:
+        return True
+    error_msg = str(error)
+    return "timeout" in error_msg.lower() or "1200" in error_msg
+
+
+class AdaptivePacer:
+    """
+    发送节奏控制器
+
+    - 限制同时进行的发送数量，并保证相邻两次发送的开始时间间隔不小于当前间隔
+    - 发送成功时逐步缩短间隔、恢复并发；遇到限流时间隔翻倍、并发减半
+    """
+
+    def __init__(self, concurrency: int, interval: float, min_interval: float, max_interval: float):
+        self.max_concurrency = max(1, concurrency)
+        self.limit = self.max_concurrency
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._active = 0
+        self._next_start = 0.0
+        self._healthy_streak = 0
+        self._cond = asyncio.Condition()
+        self._start_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._active < self.limit)
+            self._active += 1
+
+        # 控制相邻两次发送的开始时间间隔
+        async with self._start_lock:
+            loop = asyncio.get_running_loop()
+            wait = self._next_start - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_start = loop.time() + self.interval
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        """发送成功：缩短间隔，连续成功后恢复一个并发"""
+        self.interval = max(self.min_interval, self.interval * 0.8)
+        self._healthy_streak += 1
+        if self._healthy_streak >= self.limit and self.limit < self.max_concurrency:
+            self.limit += 1
+            self._healthy_streak = 0
+
+    def on_throttle(self):
+        """遇到限流：间隔翻倍，并发减半"""
+        self.interval = min(self.max_interval, max(self.interval, self.min_interval) * 2)
+        self.limit = max(1, self.limit // 2)
+        self._healthy_streak = 0
+
+
+class BroadcastReport:
+    """单次群发的统计报告"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.succeeded: List[Any] = []
+        self.failed: Dict[Any, str] = {}
+        self.attempts = 0
+        self.throttled = 0
+        self.started_at = time.time()
+        self.elapsed = 0.0
+        self.final_interval = 0.0
+        self.final_concurrency = 0
+        # 多账号群发时各bot的统计: bot_id -> {"sent", "failed", "failover", "concurrency", "interval"}
+        self.per_bot: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def success_count(self) -> int:
+        return len(self.succeeded)
+
+    @property
+    def throughput(self) -> float:
+        """每秒成功发送的群数"""
+        return self.success_count / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        text = (
+            f"群发完成: 成功 {self.success_count}/{self.total}，失败 {len(self.failed)}，"
+            f"发送尝试 {self.attempts} 次，限流 {self.throttled} 次，"
+            f"耗时 {self.elapsed:.1f}s，吞吐 {self.throughput:.2f} 群/秒，"
+            f"结束时并发 {self.final_concurrency}、间隔 {self.final_interval:.2f}s"
+        )
+        for bot_id, stats in self.per_bot.items():
+            text += (
+                f"\n  bot {bot_id}: 成功 {stats['sent']}，失败 {stats['failed']}，转交 {stats['failover']}，"
+                f"并发 {stats['concurrency']}、间隔 {stats['interval']:.2f}s"
+            )
+        return text
+
+
+class Broadcaster:
+    """
+    群发引擎
+
+    send_func(target) 负责向单个目标发送消息；引擎负责并发、节奏、超时和重试。
+    on_result(target, error_msg) 在每个目标得到最终结果时调用，成功时error_msg为None
+    """
+
+    def __init__(self, send_func: Callable[[Any], Awaitable[Any]], concurrency: int = 4,
+                 interval: float = 1.0, min_interval: float = 0.2, max_interval: float = 10.0,
+                 timeout: float = 20, max_retries: int = 3,
+                 on_result: Optional[Callable[[Any, Optional[str]], Any]] = None):
+        self.send_func = send_func
+        self.on_result = on_result
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.pacer = AdaptivePacer(concurrency, interval, min_interval, max_interval)
+
+    async def _send_one(self, target, report: BroadcastReport):
+        retries = 0
+        while True:
+            error: Optional[BaseException] = None
+            async with self.pacer:
+                report.attempts += 1
+                try:
+                    await asyncio.wait_for(self.send_func(target), timeout=self.timeout)
+                except Exception as e:
+                    error = e
+
+            if error is None:
+                self.pacer.on_success()
+                report.succeeded.append(target)
+                logger.info(f"[群发] 已成功发送到: {target}")
+                self._notify(target, None)
+                return
+
+            retries += 1
+            error_msg = f"{type(error).__name__}: {str(error)}"
+            logger.warning(f"[群发] 发送到 {target} 失败 (尝试 {retries}/{self.max_retries}): {error_msg}")
+
+            # 只有限流类错误才降速重试，其他错误直接放弃
+            if is_throttle_error(error):
+                report.throttled += 1
+                self.pacer.on_throttle()
+                if retries < self.max_retries:
+                    continue
+            report.failed[target] = error_msg
+            self._notify(target, error_msg)
+            return
+
+    def _notify(self, target, error_msg: Optional[str]):
+        if self.on_result is None:
+            return
+        try:
+            self.on_result(target, error_msg)
+        except Exception as e:
+            logger.warning(f"[群发] 记录 {target} 的发送结果失败: {str(e)}")
+
+    async def run(self, targets: Iterable[Any]) -> BroadcastReport:
+        """向所有目标群发，返回本次群发报告"""
+        targets = list(targets)
+        report = BroadcastReport(len(targets))
+        start = time.perf_counter()
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for target in targets:
+            queue.put_nowait(target)
+
+        async def worker():
+            while not queue.empty():
+                target = queue.get_nowait()
+                await self._send_one(target, report)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.pacer.max_concurrency, len(targets)))))
+
+        report.elapsed = time.perf_counter() - start
+        report.final_interval = self.pacer.interval
+        report.final_concurrency = self.pacer.limit
+        logger.info(f"[群发] {report.summary()}")
+        return report
+
+
+class MultiBotBroadcaster:
+    """
+    多账号群发引擎
+
+    按群成员关系把群分配给所在的bot（优先分配给负载最少的bot），各bot使用独立的节奏控制并行发送；
+    某个bot最终发送失败的群会转交给同样在群里的其他bot重试
+    """
+
+    def __init__(self, bots: Dict[str, Any], send_func: Callable[[Any, Any], Awaitable[Any]],
+                 on_result: Optional[Callable[[Any, Optional[str]], Any]] = None, **broadcaster_kwargs):
+        """
+        Args:
+            bots: bot_id -> bot
+            send_func: send_func(bot, target) 使用指定bot向单个目标发送
+            on_result: 每个目标得到最终结果（成功或所有候选bot均失败）时调用
+            broadcaster_kwargs: 传给每个bot的Broadcaster的参数
+        """
+        self.bots = bots
+        self.on_result = on_result
+        self._candidates: Dict[Any, List[str]] = {}
+        self._tried: Dict[Any, set] = {}
+        self.broadcasters = {
+            bot_id: Broadcaster(
+                self._make_send(send_func, bot),
+                on_result=self._make_result(bot_id),
+                **broadcaster_kwargs,
+            )
+            for bot_id, bot in bots.items()
+        }
+
+    @staticmethod
+    def _make_send(send_func, bot):
+        async def send(target):
+            await send_func(bot, target)
+        return send
+
+    def _make_result(self, bot_id: str):
+        def on_result(target, error_msg):
+            # 失败但还有其他候选bot时不是最终结果，交给下一轮转交
+            if error_msg is not None and self._can_failover(target):
+                return
+            if self.on_result is not None:
+                self.on_result(target, error_msg)
+        return on_result
+
+    def _can_failover(self, target) -> bool:
+        return any(bot_id not in self._tried[target] for bot_id in self._candidates[target])
+
+    async def run(self, targets: Iterable[Any], membership: Dict[str, Optional[set]]) -> BroadcastReport:
+        """
+        向所有目标群发
+
+        Args:
+            membership: bot_id -> 该bot所在的群集合，获取失败时为None；
+                        不在任何已知集合中的群会交给所有bot尝试
+        """
+        # 去重，同一个群只发送一次
+        targets = list(dict.fromkeys(targets))
+        report = BroadcastReport(len(targets))
+        report.per_bot = {
+            bot_id: {"sent": 0, "failed": 0, "failover": 0, "concurrency": 0, "interval": 0.0}
+            for bot_id in self.bots
+        }
+        start = time.perf_counter()
+
+        for target in targets:
+            members = [bot_id for bot_id in self.bots if target in (membership.get(bot_id) or ())]
+            self._candidates[target] = members or list(self.bots)
+            self._tried[target] = set()
+
+        remaining = targets
+        while remaining:
+            # 分配本轮每个群由哪个bot发送
+            assignment: Dict[str, List[Any]] = {}
+            for target in remaining:
+                options = [b for b in self._candidates[target] if b not in self._tried[target]]
+                bot_id = min(options, key=lambda b: len(assignment.get(b, ())))
+                assignment.setdefault(bot_id, []).append(target)
+                self._tried[target].add(bot_id)
+
+            results = await asyncio.gather(
+                *(self.broadcasters[bot_id].run(bot_targets) for bot_id, bot_targets in assignment.items())
+            )
+
+            remaining = []
+            for bot_id, bot_report in zip(assignment, results):
+                stats = report.per_bot[bot_id]
+                report.attempts += bot_report.attempts
+                report.throttled += bot_report.throttled
+                report.succeeded.extend(bot_report.succeeded)
+                stats["sent"] += bot_report.success_count
+                stats["failed"] += len(bot_report.failed)
+                for target, error_msg in bot_report.failed.items():
+                    if self._can_failover(target):
+                        stats["failover"] += 1
+                        logger.info(f"[群发] bot {bot_id} 发送到 {target} 失败，转交给其他bot")
+                        remaining.append(target)
+                    else:
+                        report.failed[target] = error_msg
+
+        report.elapsed = time.perf_counter() - start
+        for bot_id, broadcaster in self.broadcasters.items():
+            report.per_bot[bot_id]["concurrency"] = broadcaster.pacer.limit
+            report.per_bot[bot_id]["interval"] = broadcaster.pacer.interval
+        report.final_concurrency = sum(b.pacer.limit for b in self.broadcasters.values())
+        report.final_interval = min((b.pacer.interval for b in self.broadcasters.values()), default=0.0)
+        logger.info(f"[群发] 多账号{report.summary()}")
+        return report
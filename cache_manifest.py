@@ -0,0 +1,275 @@
+"""缓存清单 - 在内存中索引缓存目录中的文件并持久化为清单文件，查找和清理时不再遍历目录"""
+
+import asyncio
+import bisect
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from nonebot import logger
+
+from .file_io import run_io
+
+# 清单格式版本，格式变化时旧清单会被重建
+MANIFEST_VERSION = 2
+
+
+def classify(filename: str) -> Tuple[str, Optional[str]]:
+    """根据文件名判断缓存类型和日期，例如 news_20240101.jpg -> ("news", "20240101")"""
+    name, _ = os.path.splitext(filename)
+    if name.startswith("blob_"):
+        return "blob", None
+    for kind in ("news", "broadcast"):
+        prefix = f"{kind}_"
+        if name.startswith(prefix):
+            date = name[len(prefix):len(prefix) + 8]
+            return kind, date if date.isdigit() and len(date) == 8 else None
+    if name.startswith("temp_"):
+        return "temp", None
+    return "other", None
+
+
+class CacheManifest:
+    """
+    缓存清单
+
+    entries 按文件名索引缓存条目（类型、日期、大小、修改时间、生成参数），
+    并按类型维护以修改时间排序的列表：查找最新文件为O(1)，按过期时间清理为O(log n)。
+    refs 是内容寻址缓存的引用表：缓存键（如"日期:版式哈希"）指向按内容哈希命名的blob文件，
+    内容相同的图片只保存一份。
+    清单缺失、损坏或与目录内容不一致时自动扫描目录重建。
+    """
+
+    def __init__(self, cache_dir: str, manifest_name: str = "cache_manifest.json", skip: Iterable[str] = ()):
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, manifest_name)
+        # 不纳入清单的文件（清单本身、群发日志等），以文件名前缀匹配，同时排除SQLite的临时文件
+        self.skip = [manifest_name] + [os.path.basename(path) for path in skip]
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        # 类型 -> [(修改时间, 文件名)]，按修改时间升序
+        self._order: Dict[str, List[Tuple[float, str]]] = {}
+        # 缓存键 -> {"file", "date", "params", "mtime"}
+        self.refs: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        # 等待写入清单文件的后台任务，多次修改合并为一次写入
+        self._save_task: Optional[asyncio.Future] = None
+        self._dirty = False
+
+    def _skipped(self, filename: str) -> bool:
+        return any(filename.startswith(name) for name in self.skip)
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.cache_dir, filename)
+
+    def _index(self, filename: str, entry: Dict[str, Any]):
+        self.entries[filename] = entry
+        bisect.insort(self._order.setdefault(entry["kind"], []), (entry["mtime"], filename))
+
+    def _unindex(self, filename: str) -> Optional[Dict[str, Any]]:
+        entry = self.entries.pop(filename, None)
+        if entry is not None:
+            order = self._order.get(entry["kind"], [])
+            i = bisect.bisect_left(order, (entry["mtime"], filename))
+            if i < len(order) and order[i] == (entry["mtime"], filename):
+                del order[i]
+        return entry
+
+    def load(self):
+        """首次使用时加载清单，必要时重建"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION:
+                raise ValueError(f"清单版本 {data.get('version')} 与当前版本 {MANIFEST_VERSION} 不一致")
+            for filename, entry in data.get("entries", {}).items():
+                self._index(filename, entry)
+            self.refs = data.get("refs", {})
+        except FileNotFoundError:
+            logger.info("[缓存清单] 清单文件不存在，扫描缓存目录重建")
+            self.rebuild()
+            return
+        except Exception as e:
+            logger.warning(f"[缓存清单] 清单文件无效，扫描缓存目录重建: {str(e)}")
+            self.rebuild()
+            return
+
+        if not self._is_consistent():
+            logger.info("[缓存清单] 清单与缓存目录不一致，扫描缓存目录重建")
+            self.rebuild()
+
+    def _is_consistent(self) -> bool:
+        """启动时检查一次清单与目录内容（文件名和大小）是否一致"""
+        if not os.path.isdir(self.cache_dir):
+            return not self.entries
+        on_disk = {}
+        with os.scandir(self.cache_dir) as it:
+            for item in it:
+                if item.is_file() and not self._skipped(item.name):
+                    on_disk[item.name] = item.stat().st_size
+        if set(on_disk) != set(self.entries):
+            return False
+        return all(self.entries[name]["size"] == size for name, size in on_disk.items())
+
+    def rebuild(self):
+        """扫描缓存目录重建清单，已有条目中的生成参数和仍指向现存文件的引用会被保留"""
+        old_entries = self.entries
+        self.entries = {}
+        self._order = {}
+        if os.path.isdir(self.cache_dir):
+            with os.scandir(self.cache_dir) as it:
+                for item in it:
+                    if not item.is_file() or self._skipped(item.name):
+                        continue
+                    stat = item.stat()
+                    kind, date = classify(item.name)
+                    entry = {"kind": kind, "date": date, "size": stat.st_size, "mtime": stat.st_mtime}
+                    params = old_entries.get(item.name, {}).get("params")
+                    if params is not None:
+                        entry["params"] = params
+                    self._index(item.name, entry)
+        self.refs = {key: ref for key, ref in self.refs.items() if ref["file"] in self.entries}
+        self._loaded = True
+        self.save()
+        logger.info(f"[缓存清单] 重建完成，共 {len(self.entries)} 个缓存文件")
+
+    def _dump(self) -> str:
+        return json.dumps(
+            {"version": MANIFEST_VERSION, "entries": self.entries, "refs": self.refs}, ensure_ascii=False
+        )
+
+    def _write(self, content: str):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self.manifest_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, self.manifest_path)
+        except Exception as e:
+            logger.warning(f"[缓存清单] 保存清单失败: {str(e)}")
+
+    def save(self):
+        """原子地写入清单文件；在事件循环中调用时放到文件读写线程池中执行"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(self._dump())
+            return
+        self._dirty = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.ensure_future(self._save_async())
+
+    async def _save_async(self):
+        while self._dirty:
+            # 让出一次事件循环，同一轮中的多次修改只写入一次
+            await asyncio.sleep(0)
+            self._dirty = False
+            await run_io(self._write, self._dump())
+
+    def add(self, filename: str, size: int, params: Optional[Dict[str, Any]] = None,
+            mtime: Optional[float] = None):
+        """记录新写入（或覆盖）的缓存文件"""
+        self.load()
+        self._unindex(filename)
+        kind, date = classify(filename)
+        entry = {"kind": kind, "date": date, "size": size, "mtime": mtime if mtime is not None else time.time()}
+        if params is not None:
+            entry["params"] = params
+        self._index(filename, entry)
+        self.save()
+
+    def remove(self, filename: str):
+        """从清单中移除缓存文件（不删除文件本身），指向该文件的引用一并移除"""
+        self.load()
+        if self._unindex(filename) is not None:
+            for key in [key for key, ref in self.refs.items() if ref["file"] == filename]:
+                del self.refs[key]
+            self.save()
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        self.load()
+        return self.entries.get(filename)
+
+    async def latest(self, kind: str) -> Optional[str]:
+        """返回指定类型中修改时间最新的缓存文件路径，文件已被外部删除时顺带清理对应条目"""
+        self.load()
+        order = self._order.get(kind, [])
+        while order:
+            _, filename = order[-1]
+            path = self.path(filename)
+            if await run_io(os.path.isfile, path):
+                return path
+            logger.info(f"[缓存清单] 缓存文件已不存在，移除条目: {filename}")
+            self.remove(filename)
+        return None
+
+    def files(self, kind: Optional[str] = None) -> List[str]:
+        """列出缓存文件名"""
+        self.load()
+        if kind is None:
+            return list(self.entries)
+        return [filename for _, filename in self._order.get(kind, [])]
+
+    def expired(self, cutoff: float) -> List[str]:
+        """返回修改时间早于cutoff的缓存文件名"""
+        self.load()
+        result = []
+        for order in self._order.values():
+            result.extend(filename for _, filename in order[:bisect.bisect_left(order, (cutoff, ""))])
+        return result
+
+    def total_size(self) -> int:
+        self.load()
+        return sum(entry["size"] for entry in self.entries.values())
+
+    def set_ref(self, key: str, filename: str, date: str, params: Optional[Dict[str, Any]] = None):
+        """让缓存键指向已记录的文件"""
+        self.load()
+        self.refs[key] = {"file": filename, "date": date, "params": params, "mtime": time.time()}
+        self.save()
+
+    def remove_ref(self, key: str):
+        self.load()
+        if self.refs.pop(key, None) is not None:
+            self.save()
+
+    async def resolve(self, key: str) -> Optional[str]:
+        """返回缓存键指向的文件路径，文件已被外部删除时顺带清理"""
+        self.load()
+        ref = self.refs.get(key)
+        if ref is None:
+            return None
+        path = self.path(ref["file"])
+        if ref["file"] in self.entries and await run_io(os.path.isfile, path):
+            return path
+        # 检查文件期间引用可能已被修改
+        if self.refs.get(key) is not ref:
+            return await self.resolve(key)
+        logger.info(f"[缓存清单] 缓存键 {key} 指向的文件已不存在，移除引用")
+        if ref["file"] in self.entries:
+            self.remove(ref["file"])
+        else:
+            self.remove_ref(key)
+        return None
+
+    def latest_ref(self, suffix: str = "") -> Optional[str]:
+        """返回以suffix结尾的缓存键中日期最新的一个"""
+        self.load()
+        keys = [key for key in self.refs if key.endswith(suffix)]
+        if not keys:
+            return None
+        return max(keys, key=lambda key: (self.refs[key]["date"], self.refs[key]["mtime"]))
+
+    def expired_refs(self, cutoff: float) -> List[str]:
+        """返回创建时间早于cutoff的缓存键"""
+        self.load()
+        return [key for key, ref in self.refs.items() if ref["mtime"] < cutoff]
+
+    def unreferenced(self, kind: str = "blob") -> List[str]:
+        """返回没有任何缓存键指向的文件"""
+        self.load()
+        referenced = {ref["file"] for ref in self.refs.values()}
+        return [filename for filename in self.files(kind) if filename not in referenced]
@@ -0,0 +1,185 @@
+"""上游缓存策略 - 过期内容先返回、后台刷新（stale-while-revalidate），并在一段时间内记住上游失败（负缓存）"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from nonebot import get_driver, logger
+
+from .quota import QuotaExceededError, in_scheduled_calls
+from .single_flight import single_flight
+
+config = get_driver().config
+
+# 上游失败后多少秒内不再请求该上游（同一个缓存键）
+XISOUL_NEGATIVE_CACHE_TTL = float(getattr(config, "xisoul_negative_cache_ttl", 60))
+# 有旧内容可用时最多等待刷新多少秒，超时先返回旧内容，刷新在后台继续；0表示立即返回旧内容
+XISOUL_STALE_WAIT = float(getattr(config, "xisoul_stale_wait", 3))
+
+
+class FetchResult:
+    """
+    一次按缓存策略获取的结果
+
+    value: 内容，获取失败且没有旧内容时为None
+    stale: 是否为过期的旧内容
+    source: 内容来源，cache（有效缓存）、upstream（刚从上游获取）、stale（旧内容）、negative（上游近期失败，未请求）
+    fetched_at: 内容获取时间（时间戳）
+    error: 上游失败原因
+    """
+
+    __slots__ = ("value", "stale", "source", "fetched_at", "error")
+
+    def __init__(self, value: Any, stale: bool = False, source: str = "upstream",
+                 fetched_at: Optional[float] = None, error: Optional[str] = None):
+        self.value = value
+        self.stale = stale
+        self.source = source
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        self.error = error
+
+    @property
+    def age(self) -> float:
+        """内容已获取的秒数"""
+        return max(0.0, time.time() - self.fetched_at)
+
+    def describe_age(self) -> str:
+        minutes = int(self.age // 60)
+        if minutes < 60:
+            return f"{minutes}分钟前"
+        if minutes < 24 * 60:
+            return f"{minutes // 60}小时前"
+        return f"{minutes // (24 * 60)}天前"
+
+
+class NegativeCache:
+    """记住上游失败，在ttl秒内直接返回上次的失败原因"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        # 缓存键 -> (失效时间, 失败原因)
+        self._failures: Dict[str, Tuple[float, str]] = {}
+
+    def get(self, key: str) -> Optional[str]:
+        failure = self._failures.get(key)
+        if failure is None:
+            return None
+        expires_at, error = failure
+        if time.monotonic() >= expires_at:
+            del self._failures[key]
+            return None
+        return error
+
+    def remaining(self, key: str) -> float:
+        """负缓存剩余的秒数，没有记录时为0"""
+        failure = self._failures.get(key)
+        if failure is None:
+            return 0.0
+        return max(0.0, failure[0] - time.monotonic())
+
+    def record(self, key: str, error: str):
+        if self.ttl > 0:
+            self._failures[key] = (time.monotonic() + self.ttl, error)
+
+    def clear(self, key: str):
+        self._failures.pop(key, None)
+
+    def __len__(self) -> int:
+        now = time.monotonic()
+        return sum(1 for expires_at, _ in self._failures.values() if expires_at > now)
+
+
+class CachePolicy:
+    """
+    上游缓存策略
+
+    调用方先自行检查有效缓存，没有时调用get：
+    - 上游近期失败过（负缓存）：不请求上游，有旧内容返回旧内容，否则返回失败
+    - 有旧内容：发起刷新并最多等待stale_wait秒，超时先返回旧内容，刷新完成后写入缓存供后续使用
+    - 没有旧内容：等待刷新结果
+    同一缓存键的并发刷新通过single_flight合并为一次上游请求；定时任务与命令的刷新分开合并，
+    定时任务不会加入命令发起的刷新而只能使用命令的额度。接口额度不足不记入负缓存，
+    命令因额度不足失败后，定时任务仍可使用预留额度请求同一缓存键
+    """
+
+    def __init__(self, namespace: str, negative_ttl: float = XISOUL_NEGATIVE_CACHE_TTL,
+                 stale_wait: float = XISOUL_STALE_WAIT):
+        self.namespace = namespace
+        self.negative = NegativeCache(negative_ttl)
+        self.stale_wait = stale_wait
+        self.stats: Dict[str, int] = {
+            "refreshed": 0, "refresh_failed": 0, "stale_served": 0, "negative_hits": 0,
+        }
+
+    async def get(self, key: str, refresh: Callable[[], Awaitable[Any]],
+                  stale: Optional[Callable[[], Awaitable[Optional[FetchResult]]]] = None) -> FetchResult:
+        """
+        Args:
+            key: 缓存键
+            refresh: 从上游获取内容，失败时抛出异常或返回None；成功时由refresh自行写入缓存
+            stale: 返回可用的旧内容（FetchResult），没有时返回None；不允许使用旧内容时不传。
+                只在需要旧内容时才调用（负缓存命中、刷新超时或失败），刷新及时成功时不会读取旧内容
+        """
+        error = self.negative.get(key)
+        if error is not None:
+            self.stats["negative_hits"] += 1
+            logger.debug(f"[缓存策略] {self.namespace}:{key} 上游近期失败，不再请求: {error}")
+            stale_result = await stale() if stale is not None else None
+            return self._serve_stale(stale_result, error) or FetchResult(None, source="negative", error=error)
+
+        flight_key = f"{self.namespace}:{key}:scheduled" if in_scheduled_calls() else f"{self.namespace}:{key}"
+        task = asyncio.ensure_future(single_flight.do(flight_key, self._refresh, key, refresh))
+        if stale is None:
+            return await task
+
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task), self.stale_wait)
+        except asyncio.TimeoutError:
+            stale_result = await stale()
+            if stale_result is None:
+                # 没有旧内容可用，继续等待刷新结果
+                return await task
+            logger.info(f"[缓存策略] {self.namespace}:{key} 刷新较慢，先返回旧内容，刷新在后台继续")
+            return self._serve_stale(stale_result, None)
+        if result.value is None:
+            return self._serve_stale(await stale(), result.error) or result
+        return result
+
+    def _serve_stale(self, stale_result: Optional[FetchResult], error: Optional[str]) -> Optional[FetchResult]:
+        if stale_result is None:
+            return None
+        self.stats["stale_served"] += 1
+        stale_result.stale = True
+        stale_result.source = "stale"
+        stale_result.error = error
+        return stale_result
+
+    async def _refresh(self, key: str, refresh: Callable[[], Awaitable[Any]]) -> FetchResult:
+        quota_exceeded = False
+        try:
+            value = await refresh()
+            error = None if value is not None else "上游未返回内容"
+        except Exception as e:
+            value = None
+            error = str(e) or type(e).__name__
+            quota_exceeded = isinstance(e, QuotaExceededError) or isinstance(e.__cause__, QuotaExceededError)
+
+        if value is None:
+            self.stats["refresh_failed"] += 1
+            if quota_exceeded:
+                # 额度是否足够与调用方有关（定时任务有预留额度），不记入负缓存
+                logger.info(f"[缓存策略] {self.namespace}:{key} 接口额度不足，未请求上游: {error}")
+            else:
+                self.negative.record(key, error)
+                logger.warning(f"[缓存策略] {self.namespace}:{key} 刷新失败，{self.negative.ttl:.0f}秒内不再请求: {error}")
+        else:
+            self.stats["refreshed"] += 1
+            self.negative.clear(key)
+        return FetchResult(value, source="upstream", error=error)
+
+    def summary(self) -> str:
+        return (
+            f"{self.namespace}: 刷新 {self.stats['refreshed']} 次，失败 {self.stats['refresh_failed']} 次，"
+            f"返回旧内容 {self.stats['stale_served']} 次，负缓存命中 {self.stats['negative_hits']} 次，"
+            f"当前负缓存 {len(self.negative)} 条"
+        )
@@ -0,0 +1,291 @@
+"""熔断器 - 按上游主机记录健康状态，上游连续失败后暂停请求并按指数退避（带随机抖动）探测恢复，状态在重启后保留"""
+
+import asyncio
+import json
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from nonebot import get_driver, logger
+
+from .file_io import run_io
+
+config = get_driver().config
+
+# 连续失败多少次后熔断
+XISOUL_BREAKER_FAILURE_THRESHOLD = int(getattr(config, "xisoul_breaker_failure_threshold", 3))
+# 首次熔断的等待时间（秒），之后每次探测失败翻倍，最长不超过最大等待时间
+XISOUL_BREAKER_BASE_BACKOFF = float(getattr(config, "xisoul_breaker_base_backoff", 30))
+XISOUL_BREAKER_MAX_BACKOFF = float(getattr(config, "xisoul_breaker_max_backoff", 1800))
+# 等待时间的随机抖动比例，避免多个任务在同一时刻重新请求上游
+XISOUL_BREAKER_JITTER = float(getattr(config, "xisoul_breaker_jitter", 0.2))
+
+# 熔断状态
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+STATE_NAMES = {CLOSED: "正常", OPEN: "熔断", HALF_OPEN: "探测中"}
+
+STATE_FILE = os.path.join(os.path.dirname(__file__), "cache", "circuit_breakers.json")
+
+
+class CircuitOpenError(httpx.RequestError):
+    """上游处于熔断状态，请求未发出"""
+
+
+class CircuitBreaker:
+    """
+    单个上游的熔断器
+
+    - closed: 正常请求，连续失败达到阈值后进入open
+    - open: 不请求上游，等待退避时间结束后进入half_open
+    - half_open: 只放行一个探测请求，成功则恢复closed，失败则以翻倍的退避时间重新进入open
+    """
+
+    def __init__(self, name: str, on_change=None):
+        self.name = name
+        self.state = CLOSED
+        self.failures = 0
+        # 连续熔断次数，决定退避时间
+        self.trips = 0
+        # 熔断结束时间（时间戳），使用墙上时间以便重启后继续生效
+        self.open_until = 0.0
+        self.last_error: Optional[str] = None
+        self._probing = False
+        self._on_change = on_change
+
+    def _changed(self):
+        if self._on_change is not None:
+            self._on_change()
+
+    def backoff(self) -> float:
+        """按连续熔断次数计算带抖动的退避时间"""
+        delay = min(XISOUL_BREAKER_MAX_BACKOFF, XISOUL_BREAKER_BASE_BACKOFF * 2 ** max(0, self.trips - 1))
+        jitter = delay * XISOUL_BREAKER_JITTER
+        return max(0.0, min(XISOUL_BREAKER_MAX_BACKOFF, delay + random.uniform(-jitter, jitter)))
+
+    def retry_after(self) -> float:
+        """距离下一次允许请求的秒数"""
+        if self.state == OPEN:
+            return max(0.0, self.open_until - time.time())
+        return 0.0
+
+    def next_delay(self) -> float:
+        """调用方失败后建议的重试等待时间：熔断中等到可以探测，否则等待一个基础退避时间"""
+        if self.state == OPEN:
+            return self.retry_after()
+        return self.backoff() if self.trips else XISOUL_BREAKER_BASE_BACKOFF
+
+    def allow(self) -> bool:
+        """判断是否可以请求上游"""
+        if self.state == OPEN:
+            if time.time() < self.open_until:
+                return False
+            self.state = HALF_OPEN
+            self._probing = False
+            logger.info(f"[熔断器] {self.name} 退避结束，放行一个探测请求")
+            self._changed()
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self):
+        self._probing = False
+        if self.state == CLOSED and self.failures == 0:
+            return
+        if self.state != CLOSED:
+            logger.info(f"[熔断器] {self.name} 已恢复")
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.last_error = None
+        self._changed()
+
+    def record_failure(self, error: str):
+        self._probing = False
+        self.failures += 1
+        self.last_error = error
+        if self.state == HALF_OPEN or self.failures >= XISOUL_BREAKER_FAILURE_THRESHOLD:
+            self.trips += 1
+            delay = self.backoff()
+            self.state = OPEN
+            self.open_until = time.time() + delay
+            logger.warning(
+                f"[熔断器] {self.name} 连续失败 {self.failures} 次，第 {self.trips} 次熔断，"
+                f"{delay:.0f}秒内不再请求: {error}"
+            )
+        self._changed()
+
+    def release(self):
+        """探测请求被取消（没有结果）时释放探测名额"""
+        self._probing = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state, "failures": self.failures, "trips": self.trips,
+            "open_until": self.open_until, "last_error": self.last_error,
+        }
+
+    def restore(self, data: Dict[str, Any]):
+        self.state = data.get("state", CLOSED)
+        self.failures = int(data.get("failures", 0))
+        self.trips = int(data.get("trips", 0))
+        self.open_until = float(data.get("open_until", 0))
+        self.last_error = data.get("last_error")
+        # 重启时正在进行的探测已经丢失，重新从熔断状态等待探测
+        if self.state == HALF_OPEN:
+            self.state = OPEN
+
+    def summary(self) -> str:
+        text = f"{self.name}: {STATE_NAMES.get(self.state, self.state)}"
+        if self.state == OPEN:
+            text += f"，{self.retry_after():.0f}秒后探测"
+        if self.failures:
+            text += f"，连续失败 {self.failures} 次"
+        if self.last_error and self.state != CLOSED:
+            text += f"，最近错误: {self.last_error[:60]}"
+        return text
+
+
+class BreakerRegistry:
+    """按上游主机管理熔断器，并将状态持久化到JSON文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._saved: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        self._save_task: Optional[asyncio.Future] = None
+        self._dirty = False
+
+    def load(self):
+        """加载保存的熔断状态，启动时在文件读写线程池中调用"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"[熔断器] 状态文件无效，忽略: {str(e)}")
+            return
+        for name, data in self._saved.items():
+            self.get(name).restore(data)
+        opened = [breaker.name for breaker in self.breakers.values() if breaker.state == OPEN]
+        if opened:
+            logger.info(f"[熔断器] 恢复熔断状态: {', '.join(opened)}")
+
+    def get(self, host: str) -> CircuitBreaker:
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker(host, on_change=self.save)
+            if host in self._saved:
+                breaker.restore(self._saved[host])
+        return breaker
+
+    def for_url(self, url) -> CircuitBreaker:
+        return self.get(urlsplit(str(url)).hostname or str(url))
+
+    def _dump(self) -> str:
+        return json.dumps({name: breaker.to_dict() for name, breaker in self.breakers.items()}, ensure_ascii=False)
+
+    def _write(self, content: str):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"[熔断器] 保存状态失败: {str(e)}")
+
+    def save(self):
+        """状态变化时写入文件；在事件循环中调用时放到文件读写线程池中执行，多次变化合并为一次写入"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(self._dump())
+            return
+        self._dirty = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.ensure_future(self._save_async())
+
+    async def _save_async(self):
+        while self._dirty:
+            await asyncio.sleep(0)
+            self._dirty = False
+            await run_io(self._write, self._dump())
+
+    @asynccontextmanager
+    async def guard(self, url: str):
+        """
+        保护不经过共享HTTP客户端的上游访问（如网页截图）
+
+        熔断中直接抛出CircuitOpenError；代码块抛出异常记为失败，正常结束记为成功
+        """
+        breaker = self.for_url(url)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{breaker.name} 暂时不可用，{breaker.retry_after():.0f}秒后重试")
+        try:
+            yield breaker
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            breaker.record_failure(f"{type(e).__name__}: {str(e)}")
+            raise
+        else:
+            breaker.record_success()
+
+    def summary(self):
+        return [breaker.summary() for breaker in self.breakers.values()]
+
+
+class CircuitBreakerTransport(httpx.AsyncBaseTransport):
+    """
+    共享HTTP客户端的传输层：请求前检查目标主机的熔断器，网络错误、5xx和429记为失败
+
+    请求的extensions中设置 {"circuit_breaker": False} 可跳过熔断器（如连接预热）
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, registry: BreakerRegistry):
+        self.transport = transport
+        self.registry = registry
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.extensions.get("circuit_breaker") is False:
+            return await self.transport.handle_async_request(request)
+
+        breaker = self.registry.get(request.url.host)
+        if not breaker.allow():
+            raise CircuitOpenError(
+                f"{breaker.name} 暂时不可用，{breaker.retry_after():.0f}秒后重试", request=request
+            )
+        try:
+            response = await self.transport.handle_async_request(request)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            breaker.record_failure(f"{type(e).__name__}: {str(e)}")
+            raise
+        if response.status_code >= 500 or response.status_code == 429:
+            breaker.record_failure(f"HTTP {response.status_code}")
+        else:
+            breaker.record_success()
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+breakers = BreakerRegistry(STATE_FILE)
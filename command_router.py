@@ -0,0 +1,159 @@
+"""命令路由核心功能 - 每条消息只规范化一次，通过哈希表和前缀树分发到对应的处理函数"""
+
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+# 精确命令处理函数: handler(bot, event)
+ExactHandler = Callable[[Any, Any], Awaitable[Any]]
+# 前缀命令处理函数: handler(bot, event, arg)，arg为去掉前缀后的参数文本
+PrefixHandler = Callable[[Any, Any, str], Awaitable[Any]]
+# 命令的默认响应优先级，与拆分路由之前各命令的 on_command/on_message 优先级一致
+DEFAULT_PRIORITY = 10
+
+
+class Route:
+    """
+    一次匹配的结果，由规则函数写入state，交给分发处理器执行
+    """
+
+    __slots__ = ("name", "handler", "arg", "is_prefix", "priority")
+
+    def __init__(self, name: str, handler: Callable, arg: str = "", is_prefix: bool = False,
+                 priority: int = DEFAULT_PRIORITY):
+        self.name = name
+        self.handler = handler
+        self.arg = arg
+        self.is_prefix = is_prefix
+        self.priority = priority
+
+    async def run(self, bot, event):
+        """执行路由对应的处理函数"""
+        if self.is_prefix:
+            return await self.handler(bot, event, self.arg)
+        return await self.handler(bot, event)
+
+    def __repr__(self) -> str:
+        return f"Route(name={self.name!r}, arg={self.arg!r})"
+
+
+class CommandRouter:
+    """
+    命令路由器
+
+    - 精确命令（如 sjbs、新闻图片）保存在字典中，O(1) 查找
+    - 前缀命令（如 "hl "、"ai "）保存在字符前缀树中，只需遍历前缀长度个字符
+    - 含非文本消息段（图片、表情等）或超长的消息在拼接字符串之前直接拒绝
+    """
+
+    def __init__(self, command_start: Optional[Iterable[str]] = None, max_length: int = 2000):
+        """
+        Args:
+            command_start: NoneBot配置的命令前缀，匹配前会去掉最长的非空前缀
+            max_length: 参与路由的最大消息长度，超过则直接忽略
+        """
+        self.max_length = max_length
+        # 按长度降序排列，优先去掉最长的前缀
+        self.command_start: List[str] = sorted(
+            (s for s in (command_start or []) if s), key=len, reverse=True
+        )
+        self._exact: Dict[str, Tuple[str, ExactHandler, int]] = {}
+        # 前缀树节点: {字符: 子节点}，终结信息保存在 None 键下
+        self._trie: Dict[Any, Any] = {}
+
+    def add_exact(self, names: Iterable[str], handler: ExactHandler, name: Optional[str] = None,
+                  priority: int = DEFAULT_PRIORITY):
+        """注册精确匹配命令，priority为该命令在NoneBot中的响应优先级"""
+        for command in names:
+            self._exact[command] = (name or command, handler, priority)
+
+    def add_prefix(self, prefix: str, handler: PrefixHandler, ignore_case: bool = False,
+                   name: Optional[str] = None, priority: int = DEFAULT_PRIORITY):
+        """
+        注册前缀命令
+
+        Args:
+            prefix: 命令前缀，例如 "hl "
+            handler: 处理函数，会收到去掉前缀并strip后的参数
+            ignore_case: 是否忽略大小写匹配前缀
+            name: 路由名称，用于日志
+            priority: 该命令在NoneBot中的响应优先级
+        """
+        node = self._trie
+        for ch in prefix.lower():
+            node = node.setdefault(ch, {})
+        node[None] = (name or prefix.strip(), prefix, handler, ignore_case, priority)
+
+    def commands(self) -> List[str]:
+        """返回所有已注册的精确命令"""
+        return list(self._exact)
+
+    def priorities(self) -> List[int]:
+        """返回已注册命令用到的所有优先级，从高到低（数值从小到大）"""
+        found = {entry[2] for entry in self._exact.values()}
+        stack = [self._trie]
+        while stack:
+            node = stack.pop()
+            for key, value in node.items():
+                if key is None:
+                    found.add(value[4])
+                else:
+                    stack.append(value)
+        return sorted(found)
+
+    def normalize(self, message) -> Optional[str]:
+        """
+        将消息规范化为纯文本，不适合路由的消息返回None
+
+        只接受全部由文本段组成的消息，长度超过限制时在拼接之前就直接返回
+        """
+        if not message:
+            return None
+
+        texts = []
+        total = 0
+        for segment in message:
+            if segment.type != "text":
+                return None
+            text = segment.data.get("text", "")
+            total += len(text)
+            if total > self.max_length:
+                return None
+            texts.append(text)
+
+        text = "".join(texts).strip()
+        if not text:
+            return None
+
+        for start in self.command_start:
+            if text.startswith(start):
+                return text[len(start):].lstrip()
+        return text
+
+    def match_text(self, text: str) -> Optional[Route]:
+        """对规范化后的文本进行路由匹配"""
+        entry = self._exact.get(text)
+        if entry is not None:
+            return Route(entry[0], entry[1], priority=entry[2])
+
+        # 沿前缀树查找最长的前缀命令
+        node = self._trie
+        found = None
+        for ch in text:
+            node = node.get(ch.lower())
+            if node is None:
+                break
+            if None in node:
+                found = node[None]
+        if found is None:
+            return None
+
+        name, prefix, handler, ignore_case, priority = found
+        if not ignore_case and not text.startswith(prefix):
+            return None
+        return Route(name, handler, text[len(prefix):].strip(), is_prefix=True, priority=priority)
+
+    def match(self, message) -> Optional[Route]:
+        """对原始消息进行路由匹配"""
+        text = self.normalize(message)
+        if text is None:
+            return None
+        return self.match_text(text)
@@ -1,6 +1,9 @@
 import re
-from datetime import datetime
-from typing import Tuple, Optional
+from datetime import date, datetime, timedelta
+from typing import List, Tuple, Optional
+
+# 日期范围的分隔符，如 2025-01-01~2025-01-07、2025-01-01 至 2025-01-07
+RANGE_SEPARATORS = r'\s*(?:~|～|至|到)\s*'
 
 class DateParser:
     """
@@ -122,10 +125,10 @@ class DateParser:
             now = datetime.now()
             return (now.year, now.month, now.day)
         elif command in ["明天", "明日"]:
-            tomorrow = datetime.now().replace(day=datetime.now().day + 1)
+            tomorrow = datetime.now() + timedelta(days=1)
             return (tomorrow.year, tomorrow.month, tomorrow.day)
         elif command in ["昨天", "昨日"]:
-            yesterday = datetime.now().replace(day=datetime.now().day - 1)
+            yesterday = datetime.now() - timedelta(days=1)
             return (yesterday.year, yesterday.month, yesterday.day)
         
         # 尝试直接解析命令字符串
@@ -173,3 +176,79 @@ class DateParser:
                         continue
         
         return None
+
+    @staticmethod
+    def parse_date_range(command: str, max_days: int = 31,
+                         today: Optional[date] = None) -> Optional[List[Tuple[int, int, int]]]:
+        """
+        从命令字符串中解析日期范围
+
+        支持的格式：
+        - 2025-01-01~2025-01-07（也可用 ～、至、到 分隔，两端支持parse_date的所有格式）
+        - 本周/这周、上周、下周（周一到周日）
+        - 本月/这个月、上月/上个月、下月/下个月，以及指定月份 2025-06、2025年6月
+        - 指定年份 2025、2025年
+        - 未来N天、最近N天（均从今天开始）
+
+        Args:
+            command: 包含日期范围的命令字符串
+            max_days: 范围最多包含的天数
+            today: 计算相对日期时的"今天"，默认为本地日期
+
+        Returns:
+            按日期先后排列的(年, 月, 日)列表；不是日期范围时返回None
+
+        Raises:
+            ValueError: 范围的结束日期早于开始日期，或超过最大天数
+        """
+        command = command.strip()
+        today = today or datetime.now().date()
+
+        start = end = None
+        if command in ["本周", "这周"]:
+            start = today - timedelta(days=today.weekday())
+        elif command == "上周":
+            start = today - timedelta(days=today.weekday() + 7)
+        elif command == "下周":
+            start = today - timedelta(days=today.weekday() - 7)
+        if start is not None:
+            end = start + timedelta(days=6)
+        elif command in ["本月", "这个月", "上月", "上个月", "下月", "下个月"]:
+            start = today.replace(day=1)
+            if command.startswith("上"):
+                start = (start - timedelta(days=1)).replace(day=1)
+            elif command.startswith("下"):
+                start = (start + timedelta(days=32)).replace(day=1)
+            end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        else:
+            match = re.match(r'^(?:未来|最近)(\d{1,3})天$', command)
+            month_match = re.match(r'^(\d{4})(?:[\-\./]|年)(\d{1,2})月?$', command)
+            year_match = re.match(r'^(\d{4})年?$', command)
+            if match:
+                start = today
+                end = today + timedelta(days=max(1, int(match.group(1))) - 1)
+            elif month_match and DateParser.is_valid_date(int(month_match.group(1)), int(month_match.group(2)), 1):
+                start = date(int(month_match.group(1)), int(month_match.group(2)), 1)
+                end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+            elif year_match and int(year_match.group(1)) >= 1:
+                start = date(int(year_match.group(1)), 1, 1)
+                end = date(int(year_match.group(1)), 12, 31)
+            else:
+                parts = re.split(RANGE_SEPARATORS, command)
+                if len(parts) != 2:
+                    return None
+                first = DateParser.parse_date(parts[0])
+                last = DateParser.parse_date(parts[1])
+                if not first or not last:
+                    return None
+                start, end = date(*first), date(*last)
+
+        if end < start:
+            raise ValueError("结束日期不能早于开始日期")
+        days = (end - start).days + 1
+        if days > max_days:
+            raise ValueError(f"一次最多查询{max_days}天，当前范围为{days}天")
+        return [
+            (day.year, day.month, day.day)
+            for day in (start + timedelta(days=offset) for offset in range(days))
+        ]
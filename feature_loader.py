@@ -0,0 +1,77 @@
+"""功能模块懒加载 - 命令在插件加载时注册，功能模块及其重量级依赖在首次调用时才导入"""
+
+import importlib
+import time
+from typing import Callable, Dict, List, Optional
+
+from nonebot import logger
+
+
+class FeatureLoader:
+    """
+    功能模块加载器
+
+    记录每个模块的导入耗时，并为处理函数生成懒加载代理
+    """
+
+    def __init__(self, package: str):
+        self.package = package
+        # 模块名 -> 导入耗时（秒）
+        self.import_times: Dict[str, float] = {}
+        # 模块名 -> 是否在启动阶段导入
+        self.eager: Dict[str, bool] = {}
+        self.started = False
+
+    def import_module(self, name: str, eager: bool = False):
+        """导入功能模块并记录耗时"""
+        module_name = f"{self.package}.{name}"
+        if name in self.import_times:
+            return importlib.import_module(module_name)
+
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        elapsed = time.perf_counter() - start
+        self.import_times[name] = elapsed
+        self.eager[name] = eager
+
+        if self.started:
+            logger.info(f"[XiSoul] 首次调用时加载模块 {name}，耗时 {elapsed * 1000:.1f}ms")
+        return module
+
+    def lazy(self, module: str, attr: str, on_error: Optional[str] = None) -> Callable:
+        """
+        生成懒加载的异步处理函数代理
+
+        Args:
+            module: 功能模块名（相对于插件包）
+            attr: 模块中的处理函数名
+            on_error: 模块加载失败时回复给用户的提示，第一个参数须为bot、第二个为event
+        """
+        target = None
+
+        async def proxy(*args, **kwargs):
+            nonlocal target
+            if target is None:
+                try:
+                    target = getattr(self.import_module(module), attr)
+                except Exception as e:
+                    logger.error(f"[XiSoul] 加载功能模块 {module} 失败: {type(e).__name__}: {str(e)}")
+                    if on_error and len(args) >= 2:
+                        await args[0].send(args[1], on_error)
+                    return None
+            return await target(*args, **kwargs)
+
+        proxy.__name__ = attr
+        proxy.__qualname__ = f"{module}.{attr}"
+        return proxy
+
+    def report(self) -> List[str]:
+        """生成模块导入耗时报告"""
+        lines = []
+        total = 0.0
+        for name, elapsed in sorted(self.import_times.items(), key=lambda x: x[1], reverse=True):
+            stage = "启动" if self.eager.get(name) else "首次调用"
+            lines.append(f"  {name:<24} {elapsed * 1000:8.1f}ms  ({stage})")
+            total += elapsed
+        lines.append(f"  {'合计':<22} {total * 1000:8.1f}ms")
+        return lines
@@ -0,0 +1,108 @@
+"""异步文件读写 - 文件操作放到有界线程池中执行，避免大图片读写阻塞事件循环"""
+
+import asyncio
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from nonebot import get_driver, logger
+
+config = get_driver().config
+
+# 文件读写线程数
+XISOUL_FILE_IO_WORKERS = int(getattr(config, "xisoul_file_io_workers", 4))
+# 同时提交到线程池的最大操作数，超过时调用方等待，避免积压过多的大文件数据
+XISOUL_FILE_IO_MAX_PENDING = int(getattr(config, "xisoul_file_io_max_pending", 32))
+
+_executor: Optional[ThreadPoolExecutor] = None
+# 事件循环 -> 限制并发提交数量的信号量
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(1, XISOUL_FILE_IO_WORKERS), thread_name_prefix="xisoul-io")
+    return _executor
+
+
+def _get_semaphore(loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, XISOUL_FILE_IO_MAX_PENDING))
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+async def run_io(func: Callable[..., Any], *args) -> Any:
+    """在文件读写线程池中执行同步函数"""
+    loop = asyncio.get_running_loop()
+    async with _get_semaphore(loop):
+        return await loop.run_in_executor(_get_executor(), func, *args)
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_bytes(path: str, data: bytes):
+    # 先写入临时文件再替换，读取方不会读到写了一半的文件
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp{threading.get_ident()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _remove_file(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path) if os.path.isfile(path) else 0
+    except OSError:
+        return 0
+
+
+async def read_bytes(path: str) -> bytes:
+    """读取整个文件"""
+    return await run_io(_read_bytes, path)
+
+
+async def write_bytes(path: str, data: bytes):
+    """写入整个文件，所在目录不存在时自动创建"""
+    await run_io(_write_bytes, path, data)
+
+
+async def remove_file(path: str) -> bool:
+    """删除文件，文件不存在时返回False"""
+    return await run_io(_remove_file, path)
+
+
+async def get_file_size(path: str) -> int:
+    """获取文件大小，文件不存在时返回0"""
+    return await run_io(_file_size, path)
+
+
+def shutdown_file_io():
+    """关闭时等待未完成的文件操作并释放线程池"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+        logger.info("[文件IO] 线程池已关闭")
+    _semaphores.clear()
@@ -0,0 +1,164 @@
+"""HTML解析后端 - 为网页字段抽取提供统一的文档树操作，优先使用 lxml，未安装时使用 BeautifulSoup 的 html.parser"""
+
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    from bs4 import BeautifulSoup, CData, NavigableString
+except ImportError:
+    BeautifulSoup = None
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# walk() 产生的节点类型
+TEXT = "text"
+ELEMENT = "element"
+# 这些标签中的文字不属于正文，get_text()时不包含（与BeautifulSoup一致）
+STRING_CONTAINERS = frozenset(("rt", "rp", "style", "script", "template"))
+# 注释中的文字的容器标记，不属于任何元素的正文
+COMMENT = "#comment"
+
+
+def normalize_newlines(html: str) -> str:
+    """按HTML规范把\\r\\n和\\r换成\\n，lxml解析时会自动转换，html.parser不会"""
+    return html.replace("\r\n", "\n").replace("\r", "\n")
+
+
+class SoupTree:
+    """BeautifulSoup + html.parser，纯Python实现，作为参照和兜底"""
+
+    name = "html.parser"
+
+    def __init__(self, html: str):
+        self.soup = BeautifulSoup(html, "html.parser")
+
+    def walk(self) -> Iterator[Tuple[str, object, str, bool]]:
+        """
+        按文档顺序遍历所有节点
+
+        Yields:
+            (TEXT, 文字节点, 文字, 是否正文) 或 (ELEMENT, 元素, 标签名, False)；
+            注释、脚本中的文字也会产生，但不算正文
+        """
+        types = self.soup.interesting_string_types or (NavigableString, CData)
+        if isinstance(types, type):
+            types = (types,)
+        for node in self.soup.descendants:
+            if isinstance(node, NavigableString):
+                yield TEXT, node, node, type(node) in types
+            else:
+                yield ELEMENT, node, node.name, False
+
+    def parent(self, node):
+        return node.parent
+
+    def closest(self, node, names: Tuple[str, ...]):
+        """文字节点最近的指定标签祖先"""
+        return node.find_parent(names)
+
+    def text(self, element) -> str:
+        """元素中的正文文字"""
+        return element.get_text()
+
+
+class LxmlTree:
+    """
+    lxml（libxml2）解析，建树比 html.parser 快数十倍，树在C中保存，占用的Python对象也少得多
+
+    lxml没有独立的文字节点，文字节点用 (元素, 是否为tail) 表示：
+    元素的text位于元素内部，tail位于元素之后、属于父元素
+    """
+
+    name = "lxml"
+
+    def __init__(self, html: str):
+        # 使用 etree.HTML 而不是 lxml.html，省去每个元素的类查找；默认解析器每个线程一个，可在多个线程中同时解析
+        self.root = None
+        if html.strip():
+            try:
+                self.root = etree.HTML(html)
+            except ValueError:
+                # 带XML编码声明的字符串，lxml要求按字节解析
+                self.root = etree.HTML(html.encode("utf-8"), etree.HTMLParser(encoding="utf-8"))
+
+    @staticmethod
+    def _nodes(root, outer: Optional[str] = None) -> Iterator[Tuple[str, object, str, Optional[str]]]:
+        """
+        按文档顺序产生root中的元素和文字（root自身的tail除外）
+
+        Yields:
+            (ELEMENT, 元素, 标签名, None) 或 (TEXT, 文字节点, 文字, 最近的STRING_CONTAINERS标签)；
+            注释和处理指令中的文字的容器为 COMMENT
+        """
+        # 已开始、后面还可能有子元素的元素及其所在的容器，子树结束后产生其tail
+        stack: List[Tuple[object, Optional[str]]] = []
+        for element in root.iter():
+            if stack:
+                parent = element.getparent()
+                while stack[-1][0] is not parent:
+                    done, _ = stack.pop()
+                    if done.tail:
+                        yield TEXT, (done, True), done.tail, stack[-1][1]
+            container = stack[-1][1] if stack else outer
+            tag = element.tag
+            if not isinstance(tag, str):
+                if element.text:
+                    yield TEXT, (element, False), element.text, COMMENT
+                stack.append((element, container))
+                continue
+            if tag in STRING_CONTAINERS:
+                container = tag
+            stack.append((element, container))
+            yield ELEMENT, element, tag, None
+            if element.text:
+                yield TEXT, (element, False), element.text, container
+        while len(stack) > 1:
+            done, _ = stack.pop()
+            if done.tail:
+                yield TEXT, (done, True), done.tail, stack[-1][1]
+
+    def walk(self) -> Iterator[Tuple[str, object, str, bool]]:
+        if self.root is None:
+            return
+        for kind, node, value, container in self._nodes(self.root):
+            yield kind, node, value, kind == TEXT and container is None
+
+    def parent(self, node):
+        element, tail = node
+        if tail or not isinstance(element.tag, str):
+            return element.getparent()
+        return element
+
+    def closest(self, node, names: Tuple[str, ...]):
+        element = self.parent(node)
+        while element is not None and element.tag not in names:
+            element = element.getparent()
+        return element
+
+    def text(self, element) -> str:
+        # 元素本身是脚本等标签时取其中的文字，否则只取正文（与BeautifulSoup的Tag.get_text()一致）
+        wanted = element.tag if element.tag in STRING_CONTAINERS else None
+        outer = None
+        for ancestor in element.iterancestors():
+            if ancestor.tag in STRING_CONTAINERS:
+                outer = ancestor.tag
+                break
+        return "".join(
+            value for kind, _, value, container in self._nodes(element, outer)
+            if kind == TEXT and container == wanted
+        )
+
+
+# 后端名称 -> 实现，自动选择时按此顺序使用第一个可用的
+BACKENDS = {
+    LxmlTree.name: LxmlTree,
+    SoupTree.name: SoupTree,
+}
+
+
+def available_backends() -> List[str]:
+    """已安装依赖的后端，按优先顺序排列"""
+    installed = {LxmlTree.name: etree is not None, SoupTree.name: BeautifulSoup is not None}
+    return [name for name in BACKENDS if installed[name]]
@@ -0,0 +1,104 @@
+"""插件共享的HTTP客户端 - 复用连接池，生命周期跟随NoneBot驱动的启动和关闭"""
+
+import asyncio
+import importlib.util
+from typing import List, Optional
+
+import httpx
+from nonebot import get_driver, logger
+
+from .circuit_breaker import CircuitBreakerTransport, breakers
+from .quota import QuotaTransport, quota_ledger
+
+config = get_driver().config
+
+# 连接池配置
+XISOUL_HTTP_MAX_CONNECTIONS = int(getattr(config, "xisoul_http_max_connections", 100))
+XISOUL_HTTP_MAX_KEEPALIVE = int(getattr(config, "xisoul_http_max_keepalive", 20))
+XISOUL_HTTP_KEEPALIVE_EXPIRY = float(getattr(config, "xisoul_http_keepalive_expiry", 60))
+# 是否启用HTTP/2（需要安装 httpx[http2]）
+XISOUL_HTTP2 = getattr(config, "xisoul_http2", 0)
+# 启动时是否预先建立到已知上游的连接
+XISOUL_HTTP_WARMUP = getattr(config, "xisoul_http_warmup", 1)
+
+# 插件会访问的上游主机
+KNOWN_HOSTS = [
+    "https://api.shwgij.com",
+    "https://api.yviii.com",
+    "https://www.huangli123.net",
+]
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """检查是否安装了HTTP/2支持"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def _create_client() -> httpx.AsyncClient:
+    """按配置创建客户端"""
+    http2 = bool(XISOUL_HTTP2)
+    if http2 and not _http2_available():
+        logger.warning("[HTTP] 已配置启用HTTP/2，但未安装h2库（pip install httpx[http2]），使用HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=XISOUL_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=XISOUL_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=XISOUL_HTTP_KEEPALIVE_EXPIRY,
+    )
+    # 所有请求经过按主机划分的熔断器，上游持续故障时命令和定时任务共用同一份健康状态
+    transport = CircuitBreakerTransport(httpx.AsyncHTTPTransport(limits=limits, http2=http2), breakers)
+    # 最外层统计SHWGIJ接口额度，额度不足被拒绝的请求不计入熔断器
+    transport = QuotaTransport(transport, quota_ledger)
+    return httpx.AsyncClient(transport=transport, timeout=30)
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    获取共享的HTTP客户端
+
+    正常情况下客户端在启动时创建，如果在启动前或关闭后被调用则按需重新创建
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _create_client()
+    return _client
+
+
+async def warmup(hosts: Optional[List[str]] = None):
+    """预先与上游主机建立连接，避免首个命令承担TCP/TLS握手的耗时"""
+    client = get_client()
+
+    async def _connect(host: str):
+        try:
+            # 预热请求不计入熔断器
+            await client.head(host, timeout=5, extensions={"circuit_breaker": False})
+            logger.debug(f"[HTTP] 已预热连接: {host}")
+        except Exception as e:
+            logger.debug(f"[HTTP] 预热连接失败 {host}: {type(e).__name__}: {str(e)}")
+
+    await asyncio.gather(*(_connect(host) for host in (hosts or KNOWN_HOSTS)))
+
+
+async def init_http_client():
+    """启动时创建客户端并预热连接"""
+    get_client()
+    http2 = bool(XISOUL_HTTP2) and _http2_available()
+    logger.info(
+        f"[HTTP] 共享客户端已创建: 最大连接数 {XISOUL_HTTP_MAX_CONNECTIONS}，"
+        f"保持连接数 {XISOUL_HTTP_MAX_KEEPALIVE}，HTTP/2 {'启用' if http2 else '未启用'}"
+    )
+    if XISOUL_HTTP_WARMUP:
+        # 预热放到后台执行，不阻塞启动
+        asyncio.create_task(warmup())
+
+
+async def close_http_client():
+    """关闭时释放连接池"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        logger.info("[HTTP] 共享客户端已关闭")
+    _client = None
@@ -0,0 +1,284 @@
+"""
+黄历网页预抓取 - 定时抓取未来一段时间的黄历网页并保存到磁盘，查询近期日期时不再实时访问网站
+
+本模块在插件加载时导入，只负责抓取进度和定时任务；网页抓取和解析模块（及lxml/bs4）在第一次抓取时才导入
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from nonebot import get_driver, logger, require
+
+from .broadcaster import AdaptivePacer
+from .circuit_breaker import CircuitOpenError
+from .file_io import run_io
+from .lunar_engine import SHANGHAI_TZ
+
+require("nonebot_plugin_apscheduler")
+from apscheduler.triggers.cron import CronTrigger
+from nonebot_plugin_apscheduler import scheduler
+
+driver = get_driver()
+config = driver.config
+
+# 预抓取的天数（从今天开始）
+XISOUL_CRAWLER_HORIZON_DAYS = int(getattr(config, "xisoul_crawler_horizon_days", 60))
+# 同时进行的请求数
+XISOUL_CRAWLER_CONCURRENCY = int(getattr(config, "xisoul_crawler_concurrency", 2))
+# 相邻两次请求开始的最小间隔（秒），网站限流时自动加倍
+XISOUL_CRAWLER_INTERVAL = float(getattr(config, "xisoul_crawler_interval", 2.0))
+# 距上次向网站确认不足该小时数的日期跳过
+XISOUL_CRAWLER_REFRESH_HOURS = float(getattr(config, "xisoul_crawler_refresh_hours", 20))
+# 定时任务的cron表达式（北京时间）
+XISOUL_CRAWLER_CRON = getattr(config, "xisoul_crawler_cron", "30 3 * * *")
+
+# 与 huangli_store.PAGE_DIR 同一目录，这里不导入 huangli_store，以免加载插件时导入网页解析模块
+STATE_FILE = os.path.join(os.path.dirname(__file__), "cache", "huangli", "crawler_state.json")
+# 启动后等待多久再继续未完成的抓取，避开启动时的其他请求
+RESUME_DELAY = 60
+
+
+def get_today() -> str:
+    return datetime.now(SHANGHAI_TZ).strftime("%Y-%m-%d")
+
+
+def date_range(start: str, end: str) -> List[str]:
+    first = datetime.strptime(start, "%Y-%m-%d")
+    days = (datetime.strptime(end, "%Y-%m-%d") - first).days + 1
+    return [(first + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(max(0, days))]
+
+
+def load_scraper():
+    """导入网页抓取模块和网页存储，第一次抓取时调用"""
+    from .huangli_scraper import HuangLiScraper
+    from .huangli_store import page_store
+    return HuangLiScraper, page_store
+
+
+def page_summaries() -> List[str]:
+    """网页流式解析和网页存储的统计，网页抓取模块尚未导入时为空"""
+    scraper = sys.modules.get(f"{__package__}.huangli_scraper")
+    if scraper is None:
+        return []
+    return [scraper.page_stream.summary(), scraper.page_store.summary()]
+
+
+class HuangLiCrawler:
+    """
+    黄历网页预抓取器
+
+    每次抓取覆盖 [开始日期, 结束日期]，cursor 为最早的未完成日期，随抓取进度保存到状态文件；
+    抓取中断（重启、上游熔断）后从 cursor 继续。已保存的日期带 If-None-Match/If-Modified-Since 条件请求，
+    网站返回304时只更新确认时间
+    """
+
+    def __init__(self, path: str, horizon: int, concurrency: int, interval: float, refresh_hours: float):
+        self.path = path
+        self.horizon = horizon
+        self.concurrency = concurrency
+        self.interval = interval
+        self.refresh_seconds = refresh_hours * 3600
+        # {"start", "end", "cursor", "started_at", "finished_at", "stats", "failed"}
+        self.state: Dict[str, Any] = {}
+        self._loaded = False
+        self._running = False
+        self._abort: Optional[str] = None
+        self._save_task: Optional[asyncio.Future] = None
+        self._dirty = False
+        self._scraper = None
+        self._store = None
+
+    def load(self):
+        """加载抓取进度，启动时在文件读写线程池中调用"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"[黄历预抓取] 进度文件无效，忽略: {str(e)}")
+
+    @property
+    def unfinished(self) -> bool:
+        """上一次抓取是否未完成且还有未过期的日期"""
+        return bool(self.state) and not self.state.get("finished_at") and self.state.get("end", "") >= get_today()
+
+    async def run(self):
+        """执行一次抓取，有未完成的抓取时继续，否则从今天开始新的一轮"""
+        if self._running:
+            logger.info("[黄历预抓取] 上一次抓取仍在进行，跳过")
+            return
+        if self._scraper is None:
+            try:
+                self._scraper, self._store = load_scraper()
+            except Exception as e:
+                logger.warning(f"[黄历预抓取] 网页抓取模块加载失败，跳过抓取: {type(e).__name__}: {str(e)}")
+                return
+        self._running = True
+        self._abort = None
+        try:
+            await self._run()
+        finally:
+            self._running = False
+
+    async def _run(self):
+        today = get_today()
+        if self.unfinished:
+            start = max(self.state.get("cursor") or self.state["start"], today)
+            self.state["cursor"] = start
+            logger.info(f"[黄历预抓取] 继续未完成的抓取: {start} ~ {self.state['end']}")
+        else:
+            end = (datetime.strptime(today, "%Y-%m-%d") + timedelta(days=self.horizon - 1)).strftime("%Y-%m-%d")
+            self.state = {
+                "start": today, "end": end, "cursor": today, "started_at": time.time(), "finished_at": None,
+                "stats": {"fetched": 0, "not_modified": 0, "skipped": 0, "failed": 0}, "failed": [],
+            }
+            logger.info(f"[黄历预抓取] 开始抓取: {today} ~ {end}")
+        self.save()
+
+        dates = date_range(self.state["cursor"], self.state["end"])
+        done = set()
+        pacer = AdaptivePacer(self.concurrency, self.interval, min_interval=self.interval,
+                              max_interval=self.interval * 16)
+        # 信号量限制同时在途的日期，抓取中断时排队的日期直接结束，不再等待请求间隔
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+        async def crawl(date: str):
+            async with semaphore:
+                if self._abort:
+                    return
+                succeeded = await self._crawl_date(date, pacer)
+            if not succeeded:
+                return
+            done.add(date)
+            # cursor 指向最早的未完成（含失败）日期，之前的日期在中断后不再重复抓取
+            self.state["cursor"] = next((d for d in dates if d not in done), None)
+            self.save()
+
+        await asyncio.gather(*(crawl(date) for date in dates))
+
+        if self._abort:
+            logger.warning(f"[黄历预抓取] 抓取中断，下次从 {self.state['cursor']} 继续: {self._abort}")
+        else:
+            self.state["finished_at"] = time.time()
+            logger.info(f"[黄历预抓取] 抓取完成: {self.summary()}")
+            removed = await self._store.prune()
+            if removed:
+                logger.info(f"[黄历预抓取] 已清理 {removed} 个旧版本的数据文件")
+        self.save()
+
+    async def _crawl_date(self, date: str, pacer: AdaptivePacer) -> bool:
+        """抓取一个日期，返回是否成功（含跳过和未修改）"""
+        stats = self.state["stats"]
+        scraper, page_store = self._scraper, self._store
+        record = await page_store.load(date)
+        if record is not None and time.time() - record.get("checked_at", 0) < self.refresh_seconds:
+            stats["skipped"] += 1
+            return True
+
+        url = scraper.BASE_URL.format(date=date)
+        headers = page_store.conditional_headers(record)
+
+        try:
+            async with pacer:
+                response, data = await scraper.fetch_page(url, date, headers=headers, timeout=30)
+            if response.status_code == 304 and record is not None:
+                pacer.on_success()
+                record["checked_at"] = time.time()
+                await page_store.save(record)
+                stats["not_modified"] += 1
+                return True
+            if response.status_code in (429, 503):
+                pacer.on_throttle()
+            response.raise_for_status()
+            pacer.on_success()
+            await scraper.save_page(page_store.new_record(date, url, response, data))
+            stats["fetched"] += 1
+            return True
+        except CircuitOpenError as e:
+            # 网站暂时不可用，停止本轮抓取，保留进度等下次继续
+            self._abort = str(e)
+        except Exception as e:
+            logger.warning(f"[黄历预抓取] 抓取 {date} 失败: {type(e).__name__}: {str(e)}")
+            stats["failed"] += 1
+            self.state["failed"].append(date)
+        return False
+
+    def _dump(self) -> str:
+        return json.dumps(self.state, ensure_ascii=False)
+
+    def _write(self, content: str):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"[黄历预抓取] 保存进度失败: {str(e)}")
+
+    def save(self):
+        """在事件循环中调用时放到文件读写线程池中执行，多次变化合并为一次写入"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(self._dump())
+            return
+        self._dirty = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.ensure_future(self._save_async())
+
+    async def _save_async(self):
+        while self._dirty:
+            await asyncio.sleep(0)
+            self._dirty = False
+            await run_io(self._write, self._dump())
+
+    def summary(self) -> str:
+        if not self.state:
+            return "尚未抓取"
+        stats = self.state.get("stats", {})
+        if self._running:
+            progress = f"进行中，进度 {self.state.get('cursor')}"
+        elif self.state.get("finished_at"):
+            progress = f"已完成（{datetime.fromtimestamp(self.state['finished_at']).strftime('%m-%d %H:%M')}）"
+        else:
+            progress = f"未完成，下次从 {self.state.get('cursor')} 继续"
+        return (
+            f"{self.state.get('start')} ~ {self.state.get('end')} {progress}：下载 {stats.get('fetched', 0)}，"
+            f"未修改 {stats.get('not_modified', 0)}，跳过 {stats.get('skipped', 0)}，失败 {stats.get('failed', 0)}"
+        )
+
+
+crawler = HuangLiCrawler(
+    STATE_FILE, XISOUL_CRAWLER_HORIZON_DAYS, XISOUL_CRAWLER_CONCURRENCY,
+    XISOUL_CRAWLER_INTERVAL, XISOUL_CRAWLER_REFRESH_HOURS,
+)
+
+
+async def _resume_after_startup():
+    await asyncio.sleep(RESUME_DELAY)
+    await crawler.run()
+
+
+@driver.on_startup
+async def setup_crawler():
+    """加载抓取进度、注册定时任务，上次抓取未完成时稍后继续"""
+    await run_io(crawler.load)
+    try:
+        trigger = CronTrigger.from_crontab(XISOUL_CRAWLER_CRON, timezone="Asia/Shanghai")
+    except ValueError:
+        logger.error(f"[黄历预抓取] 无效的cron表达式: {XISOUL_CRAWLER_CRON}")
+        return
+    scheduler.add_job(crawler.run, trigger, id="huangli_crawler", replace_existing=True, misfire_grace_time=600)
+    logger.info(f"[黄历预抓取] 定时任务注册成功，表达式: {XISOUL_CRAWLER_CRON}，抓取 {XISOUL_CRAWLER_HORIZON_DAYS} 天")
+    if crawler.unfinished:
+        asyncio.create_task(_resume_after_startup())
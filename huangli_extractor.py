@@ -0,0 +1,413 @@
+"""黄历网页字段抽取 - 按声明式的抽取规则只遍历一次文档树，按关键词索引文本节点后再抽取各字段，文档树由 html_backend 中的解析后端提供"""
+
+import hashlib
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from nonebot import logger
+
+from .almanac_store import split_terms
+from .html_backend import (
+    BACKENDS, COMMENT, ELEMENT, STRING_CONTAINERS, LxmlTree, SoupTree, available_backends, etree, normalize_newlines,
+)
+
+# 取"最近的div/p祖先"时匹配的标签，卦象描述也按这些标签逐块读取
+BLOCK_TAGS = ("div", "p")
+# 自动选择快速后端时，前几个页面同时用html.parser解析，结果不一致则改用html.parser
+VERIFY_PAGES = 3
+
+
+class Rule:
+    """
+    单值字段：取文档中第一个包含keyword的文本节点作为锚点
+
+    Args:
+        group: 结果中的分组，如 "yue_ling"
+        key: 分组中的字段名
+        keyword: 锚点文本节点包含的关键词
+        scope: "parent" 取锚点父节点的文本，"block" 取锚点最近的div/p祖先的文本
+        pattern: 从文本中提取第一个分组，不匹配时不写入；为None时写入去掉remove后的文本
+        remove: pattern为None时从文本中去掉的内容
+    """
+
+    __slots__ = ("group", "key", "keyword", "scope", "pattern", "remove")
+
+    def __init__(self, group: str, key: str, keyword: str, scope: str = "parent",
+                 pattern: Optional[str] = None, remove: Optional[str] = None):
+        self.group = group
+        self.key = key
+        self.keyword = keyword
+        self.scope = scope
+        self.pattern = re.compile(pattern) if pattern else None
+        self.remove = remove if remove is not None else keyword
+
+    def apply(self, tree, node, result: Dict[str, Any]):
+        if self.scope == "block":
+            container = tree.closest(node, BLOCK_TAGS)
+        else:
+            container = tree.parent(node)
+        if container is None:
+            return
+        text = tree.text(container)
+        if self.pattern is None:
+            result[self.group][self.key] = text.replace(self.remove, "").strip()
+            return
+        match = self.pattern.search(text)
+        if match:
+            result[self.group][self.key] = match.group(1).strip()
+
+
+class BranchRule:
+    """
+    多处出现的字段：包含任一触发词的每个文本节点都取父节点文本，
+    按顺序找到第一个出现在文本中的分支关键词，用该分支的正则提取；后出现的节点覆盖先出现的
+    """
+
+    __slots__ = ("group", "triggers", "branches")
+
+    def __init__(self, group: str, triggers: Sequence[str], branches: Sequence[Tuple[str, str, str]]):
+        self.group = group
+        self.triggers = tuple(triggers)
+        # (分支关键词, 字段名, 正则)
+        self.branches = [(keyword, key, re.compile(pattern)) for keyword, key, pattern in branches]
+
+    def matches(self, text: str) -> bool:
+        return any(trigger in text for trigger in self.triggers)
+
+    def apply(self, tree, node, result: Dict[str, Any]):
+        parent = tree.parent(node)
+        if parent is None:
+            return
+        text = tree.text(parent)
+        for keyword, key, pattern in self.branches:
+            if keyword in text:
+                match = pattern.search(text)
+                if match:
+                    result[self.group][key] = match.group(1).strip()
+                break
+
+
+# 抽取规则，与原先逐项搜索文档树的解析结果一致
+# 星宿、月令、物候：原解析器的正则写成了 \\s*，要求冒号后有一个反斜杠，网站的网页中没有，已改为 \s*
+RULES: List[Rule] = [
+    Rule("basic_info", "star", "今日星宿", pattern=r"今日星宿：\s*([^的]+)"),
+    Rule("chong_he", "info", "今日冲合"),
+    Rule("ji_xiong", "nine_star", "今日河图洛书九星吉凶", scope="block"),
+    Rule("yue_ling", "month", "月令", pattern=r"月令：\s*([^\s]+)"),
+    Rule("yue_ling", "phenology", "物候", pattern=r"物候：\s*([^\s]+)"),
+    Rule("tian_shen", "twelve_gods", "今日十二神吉凶所主", scope="block"),
+    Rule("er_shi_ba_xiu", "info", "今日二十八星宿吉凶", scope="block"),
+]
+BRANCH_RULES: List[BranchRule] = [
+    BranchRule("wu_xing", ("年五行", "月五行", "日五行"), [
+        ("年五行", "year", r"年五行：([^\s]+)"),
+        ("月五行", "month", r"月五行：([^\s]+)"),
+        ("日五行", "day", r"日五行：([^\s]+)"),
+    ]),
+    BranchRule("san_sha", ("三煞",), [
+        ("本年三煞", "year", r"本年三煞：([^;]+)"),
+        ("本月三煞", "month", r"本月三煞：([^;]+)"),
+        ("今日三煞", "day", r"今日三煞：([^;]+)"),
+    ]),
+    BranchRule("qi_sha", ("七煞",), [
+        ("年七煞", "year", r"年七煞：([^\s]+)"),
+        ("月七煞", "month", r"月七煞：([^\s]+)"),
+        ("日七煞", "day", r"日七煞：([^\s]+)"),
+    ]),
+]
+# 卦象和地母经的锚点，抽取方式较特殊，单独处理
+GUA_XIANG = "今日卦象"
+DI_MU_JING = "地母经卜曰"
+DI_MU_JING_POEM = "地母经诗曰"
+# 卦象描述读到包含这些关键词的块为止
+GUA_XIANG_STOP = ("月令", "物候", "今日十二神", "二十八星宿")
+# 宜忌：以"宜"/"忌"开头的行
+YI_JI_PATTERNS = [
+    (key, re.compile(rf"(?:^|\n)\s*(?:今日)?{label}\s*[:：]?\s*\n?\s*([^\n]+)"))
+    for key, label in (("yi", "宜"), ("ji", "忌"))
+]
+
+FIRST_KEYWORDS = tuple(dict.fromkeys(
+    [rule.keyword for rule in RULES] + [GUA_XIANG, DI_MU_JING, DI_MU_JING_POEM]
+))
+# 抽取代码（而不是上面的规则）的逻辑变化、会影响解析结果时递增
+EXTRACTOR_REVISION = 1
+# 解析器版本：由抽取规则和EXTRACTOR_REVISION计算，规则变化后自动变化，保存的旧解析结果随之失效
+PARSER_VERSION = hashlib.sha1(repr((
+    EXTRACTOR_REVISION, BLOCK_TAGS,
+    [(rule.group, rule.key, rule.keyword, rule.scope, rule.pattern and rule.pattern.pattern, rule.remove) for rule in RULES],
+    [(rule.group, rule.triggers, [(keyword, key, pattern.pattern) for keyword, key, pattern in rule.branches])
+     for rule in BRANCH_RULES],
+    GUA_XIANG, DI_MU_JING, DI_MU_JING_POEM, GUA_XIANG_STOP, [(key, pattern.pattern) for key, pattern in YI_JI_PATTERNS],
+)).encode("utf-8")).hexdigest()[:8]
+
+# 流式读取时需要完整读到的关键词：各字段的锚点和多处字段的每个分支
+STREAM_ANCHORS = FIRST_KEYWORDS + tuple(keyword for rule in BRANCH_RULES for keyword, _, _ in rule.branches)
+# 所有关键词合成一个正则，大部分文本节点只需一次匹配就能排除
+ANY_KEYWORD = re.compile("|".join(
+    re.escape(keyword)
+    for keyword in FIRST_KEYWORDS + tuple(trigger for rule in BRANCH_RULES for trigger in rule.triggers)
+))
+
+
+def new_result(date: str) -> Dict[str, Any]:
+    return {
+        'date': date,
+        'basic_info': {},
+        'wu_xing': {},
+        'chong_he': {},
+        'san_sha': {},
+        'qi_sha': {},
+        'ji_xiong': {},
+        'gua_xiang': {},
+        'yue_ling': {},
+        'tian_shen': {},
+        'er_shi_ba_xiu': {},
+        'di_mu_jing': {},
+        'yi_ji': {},
+        'errors': []
+    }
+
+
+class PageIndex:
+    """一次遍历文档树得到的索引：各关键词的第一个文本节点、多处字段的所有节点、div/p块的顺序和页面文本"""
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.first: Dict[str, Any] = {}
+        self.every: Dict[str, List[Any]] = {rule.group: [] for rule in BRANCH_RULES}
+        self.blocks: List[Any] = []
+        self.block_index: Dict[int, int] = {}
+        texts = []
+
+        for kind, node, value, content in tree.walk():
+            if kind == ELEMENT:
+                if value in BLOCK_TAGS:
+                    self.block_index[id(node)] = len(self.blocks)
+                    self.blocks.append(node)
+                continue
+            if content:
+                texts.append(value)
+            if not ANY_KEYWORD.search(value):
+                continue
+            for keyword in FIRST_KEYWORDS:
+                if keyword not in self.first and keyword in value:
+                    self.first[keyword] = node
+            for rule in BRANCH_RULES:
+                if rule.matches(value):
+                    self.every[rule.group].append(node)
+        # 与soup.get_text('\n')相同
+        self.text = "\n".join(texts)
+
+    def next_block(self, block) -> Optional[Any]:
+        """文档顺序中block之后的下一个div/p（与BeautifulSoup的block.find_next(['div', 'p'])相同）"""
+        index = self.block_index[id(block)] + 1
+        return self.blocks[index] if index < len(self.blocks) else None
+
+
+def extract(tree, date: str) -> Dict[str, Any]:
+    """按抽取规则从文档树中提取黄历数据"""
+    result = new_result(date)
+    try:
+        index = PageIndex(tree)
+
+        for key, pattern in YI_JI_PATTERNS:
+            match = pattern.search(index.text)
+            if match:
+                result['yi_ji'][key] = split_terms(match.group(1))
+
+        for rule in RULES:
+            node = index.first.get(rule.keyword)
+            if node is not None:
+                rule.apply(tree, node, result)
+        for rule in BRANCH_RULES:
+            for node in index.every[rule.group]:
+                rule.apply(tree, node, result)
+
+        _extract_gua_xiang(index, result)
+        _extract_di_mu_jing(index, result)
+    except Exception as e:
+        logger.error(f"解析HTML内容时出错: {str(e)}")
+        result['errors'].append(str(e))
+    return result
+
+
+def _extract_gua_xiang(index: PageIndex, result: Dict[str, Any]):
+    """卦象：锚点所在块为卦象名称，之后的块直到时节、十二神、星宿部分为卦象描述"""
+    tree = index.tree
+    node = index.first.get(GUA_XIANG)
+    if node is None or tree.parent(node) is None:
+        return
+    block = tree.closest(node, BLOCK_TAGS)
+    if block is None:
+        return
+    result['gua_xiang']['info'] = tree.text(block).replace('今日卦象：', '').strip()
+
+    current = index.next_block(block)
+    if current is None:
+        return
+    description = []
+    while current is not None:
+        text = tree.text(current)
+        if any(keyword in text for keyword in GUA_XIANG_STOP):
+            break
+        description.append(text.strip())
+        current = index.next_block(current)
+    result['gua_xiang']['description'] = '\n'.join(description)
+
+
+def _extract_di_mu_jing(index: PageIndex, result: Dict[str, Any]):
+    """地母经：卜曰所在块为卜辞，诗曰所在节点的父节点为诗"""
+    tree = index.tree
+    node = index.first.get(DI_MU_JING)
+    if node is None:
+        return
+    block = tree.closest(node, BLOCK_TAGS)
+    if block is None:
+        return
+    result['di_mu_jing']['divination'] = tree.text(block).replace(DI_MU_JING, '').strip()
+    poem = index.first.get(DI_MU_JING_POEM)
+    if poem is not None and tree.parent(poem) is not None:
+        result['di_mu_jing']['poem'] = tree.text(tree.parent(poem)).replace(DI_MU_JING_POEM, '').strip()
+
+
+def parse_page(html: str, date: str, backend: str, verify: bool = False) -> Tuple[Dict[str, Any], bool]:
+    """
+    用指定后端解析网页并抽取字段，可在解析工作池（线程或进程）中执行
+
+    Args:
+        verify: 同时用html.parser解析核对
+
+    Returns:
+        (黄历数据, 是否一致)；核对不一致时返回html.parser的结果
+    """
+    html = normalize_newlines(html)
+    result = extract(BACKENDS[backend](html), date)
+    if verify:
+        expected = extract(SoupTree(html), date)
+        if result != expected:
+            return expected, False
+    return result, True
+
+
+class PageParser:
+    """
+    黄历网页解析器：按配置选择解析后端，记录核对结果
+
+    Args:
+        backend: 后端名称（lxml、html.parser），auto 表示使用已安装的最快后端；
+            自动选择的后端不是 html.parser 时，前 VERIFY_PAGES 个页面同时用 html.parser 解析核对，
+            结果不一致时记录警告并改用 html.parser
+    """
+
+    def __init__(self, backend: str = "auto"):
+        available = available_backends()
+        if not available:
+            raise ImportError("解析黄历网页需要安装 lxml 或 beautifulsoup4")
+        if backend != "auto" and backend not in available:
+            logger.warning(f"[黄历网页] 解析后端 {backend} 不可用，自动选择")
+            backend = "auto"
+        self.name = available[0] if backend == "auto" else backend
+        verify = backend == "auto" and self.name != SoupTree.name and SoupTree.name in available
+        self._unverified = VERIFY_PAGES if verify else 0
+
+    def plan(self) -> Tuple[str, bool]:
+        """本次解析使用的后端及是否需要核对"""
+        verify = self._unverified > 0
+        if verify:
+            self._unverified -= 1
+        return self.name, verify
+
+    def report(self, backend: str, consistent: bool, date: str):
+        """记录核对结果，不一致时改用html.parser"""
+        if consistent or backend != self.name or backend == SoupTree.name:
+            return
+        logger.warning(f"[黄历网页] {backend} 与 html.parser 的解析结果不一致（{date}），改用 html.parser")
+        self.name = SoupTree.name
+        self._unverified = 0
+
+    def parse(self, html: str, date: str) -> Dict[str, Any]:
+        """在当前线程中解析"""
+        backend, verify = self.plan()
+        result, consistent = parse_page(html, date, backend, verify)
+        self.report(backend, consistent, date)
+        return result
+
+
+def stream_supported() -> bool:
+    """流式读取需要lxml的增量解析"""
+    return etree is not None
+
+
+class SectionWatcher:
+    """
+    流式读取网页时用lxml增量解析，判断黄历各栏目是否都已完整读到
+
+    读到的条件：每个锚点关键词都已出现且所在的div/p块（没有时为父元素）都已结束，宜、忌两行也都已结束。
+    此时网页前缀的解析结果与整个网页相同，除非之后的内容里又出现了多处字段的关键词（以最后一处为准），
+    这种情况由调用方核对
+    """
+
+    def __init__(self):
+        self.parser = etree.HTMLPullParser(events=("start", "end", "comment"))
+        self.missing = set(STREAM_ANCHORS)
+        # 含锚点、尚未结束的块
+        self.open_blocks = set()
+        # 当前位置最近的STRING_CONTAINERS标签
+        self.containers: List[Optional[str]] = [None]
+        # 按文档顺序的正文文字，用于检查宜忌行
+        self.texts: List[str] = []
+        self.complete = False
+
+    def feed(self, chunk: str) -> bool:
+        """喂入一段网页内容，返回是否已读到所有栏目"""
+        if self.complete:
+            return True
+        self.parser.feed(chunk)
+        for event, element in self.parser.read_events():
+            # 每段文字在其后的标签出现时才完整：开始标签前是上一个兄弟节点的tail或父元素的text，
+            # 结束标签前是最后一个子节点的tail或元素自身的text
+            if event == "end":
+                last = element[-1] if len(element) else None
+                self._add(last.tail if last is not None else element.text, element, self.containers[-1])
+                self.containers.pop()
+                self.open_blocks.discard(element)
+                continue
+            parent = element.getparent()
+            if parent is not None:
+                previous = element.getprevious()
+                self._add(previous.tail if previous is not None else parent.text, parent, self.containers[-1])
+            if event == "comment":
+                self._add(element.text, parent, COMMENT)
+            else:
+                tag = element.tag
+                self.containers.append(tag if tag in STRING_CONTAINERS else self.containers[-1])
+        if not self.missing and not self.open_blocks:
+            self.complete = self._yi_ji_complete()
+        return self.complete
+
+    def _add(self, text: Optional[str], owner, container: Optional[str]):
+        if not text or owner is None:
+            return
+        if container is None:
+            self.texts.append(text)
+        # 每个锚点都包含ANY_KEYWORD中的关键词
+        if not self.missing or not ANY_KEYWORD.search(text):
+            return
+        found = [keyword for keyword in self.missing if keyword in text]
+        if not found:
+            return
+        self.missing.difference_update(found)
+        block = owner
+        while block is not None and block.tag not in BLOCK_TAGS:
+            block = block.getparent()
+        self.open_blocks.add(block if block is not None else owner)
+
+    def _yi_ji_complete(self) -> bool:
+        """宜、忌两行都已出现，且之后还有内容（行已结束）"""
+        text = "\n".join(self.texts)
+        for _, pattern in YI_JI_PATTERNS:
+            match = pattern.search(text)
+            if match is None or match.end() >= len(text):
+                return False
+        return True
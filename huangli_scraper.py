@@ -1,8 +1,66 @@
+import time
 import httpx
-import re
-from bs4 import BeautifulSoup
-from typing import Dict, Optional, List, Any
-from nonebot import logger
+from typing import Dict, Optional, List, Any, Tuple
+from nonebot import get_driver, logger
+
+from .single_flight import single_flight
+from .http_client import get_client
+from .batch_fetch import XISOUL_RANGE_CONCURRENCY, gather_bounded
+from .almanac_store import almanac_store
+from .file_io import run_io
+from .huangli_store import page_store
+from .huangli_extractor import VERIFY_PAGES, LxmlTree, PageParser, SectionWatcher, parse_page, stream_supported
+from .parse_pool import run_parse
+
+config = get_driver().config
+
+# 黄历网页解析后端：auto（默认，优先lxml）、lxml、html.parser
+XISOUL_HTML_PARSER = getattr(config, "xisoul_html_parser", "auto")
+
+# 流式读取黄历网页（需要lxml）：读到所有栏目后停止下载，1-启用，0-禁用
+XISOUL_HUANGLI_STREAM = int(getattr(config, "xisoul_huangli_stream", 1))
+
+page_parser = PageParser(XISOUL_HTML_PARSER)
+logger.info(f"[黄历网页] 解析后端: {page_parser.name}")
+
+
+class PageStream:
+    """
+    流式读取的开关和统计
+
+    前 VERIFY_PAGES 次提前读完栏目的请求仍读取整个网页，核对前缀与整个网页的解析结果，不一致时停用流式读取
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled and stream_supported()
+        self._unverified = VERIFY_PAGES
+        # 请求数、提前结束数、读取的字节数、确知节省的字节数（有Content-Length或核对时）
+        self.stats = {"fetches": 0, "early": 0, "read": 0, "saved": 0}
+
+    def plan(self) -> Tuple[bool, bool]:
+        """本次请求是否流式读取，以及是否核对"""
+        # 解析后端因不一致改用html.parser后，也不再流式读取
+        stream = self.enabled and page_parser.name == LxmlTree.name
+        verify = stream and self._unverified > 0
+        return stream, verify
+
+    def verified(self, consistent: bool, date: str):
+        self._unverified = max(0, self._unverified - 1)
+        if not consistent and self.enabled:
+            logger.warning(f"[黄历网页] 流式读取的解析结果与整个网页不一致（{date}），停用流式读取")
+            self.enabled = False
+
+    def summary(self) -> str:
+        if not self.enabled and not self.stats["fetches"]:
+            return "流式读取未启用"
+        stats = self.stats
+        return (
+            f"流式读取{'' if self.enabled else '（已停用）'}：请求 {stats['fetches']} 次，提前结束 {stats['early']} 次，"
+            f"读取 {stats['read'] / 1024:.0f}KB，至少节省 {stats['saved'] / 1024:.0f}KB"
+        )
+
+
+page_stream = PageStream(bool(XISOUL_HUANGLI_STREAM))
 
 class HuangLiScraper:
     """
@@ -15,7 +73,7 @@ class HuangLiScraper:
     @staticmethod
     async def fetch_huangli_data(date: str) -> Optional[Dict[str, Any]]:
         """
-        从网页获取指定日期的黄历数据
+        获取指定日期的黄历数据：优先使用预抓取（或之前抓取）保存的数据，没有或已过期时从网页获取，同一日期的并发请求合并为一次
         
         Args:
             date: 日期字符串，格式为 YYYY-MM-DD
@@ -23,20 +81,50 @@ class HuangLiScraper:
         Returns:
             包含黄历数据的字典，如果获取失败则返回None
         """
+        record = await page_store.load(date)
+        if record is not None and page_store.is_fresh(record):
+            return record["data"]
+        return await single_flight.do(f"huangli:{date}", HuangLiScraper._fetch_huangli_data, date, record)
+    
+    @staticmethod
+    async def fetch_many(dates: List[str], concurrency: int = XISOUL_RANGE_CONCURRENCY) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        获取多个日期的黄历数据，同时进行的请求不超过concurrency个
+        
+        Args:
+            dates: 日期字符串列表，格式为 YYYY-MM-DD
+            concurrency: 最大并发请求数
+            
+        Returns:
+            日期 -> 黄历数据字典，获取失败的日期为None
+        """
+        results = await gather_bounded(dates, HuangLiScraper.fetch_huangli_data, concurrency)
+        return {date: (None if isinstance(result, BaseException) else result) for date, result in results.items()}
+    
+    @staticmethod
+    async def _fetch_huangli_data(date: str, record: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        从网页获取并解析指定日期的黄历数据
+
+        有已过期的保存记录时带条件请求头，网站返回304时只更新确认时间；请求失败时仍返回已过期的数据
+        """
         # 构建完整URL
         url = HuangLiScraper.BASE_URL.format(date=date)
         logger.info(f"正在请求黄历数据: {url}")
+        stale = record["data"] if record is not None else None
         
         try:
-            # 发送HTTP请求
-            async with httpx.AsyncClient(timeout=30) as client:
-                response = await client.get(url)
-                response.raise_for_status()
-                
-                # 解析HTML内容
-                html_content = response.text
-                return HuangLiScraper.parse_html_content(html_content, date)
-                
+            # 发送HTTP请求并解析HTML内容
+            headers = page_store.conditional_headers(record)
+            response, huangli_data = await HuangLiScraper.fetch_page(url, date, headers=headers)
+            if response.status_code == 304 and record is not None:
+                record["checked_at"] = time.time()
+                await page_store.save(record)
+                return stale
+            response.raise_for_status()
+            await HuangLiScraper.save_page(page_store.new_record(date, url, response, huangli_data))
+            return huangli_data
+            
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP请求错误: {str(e)}")
         except httpx.RequestError as e:
@@ -44,12 +132,90 @@ class HuangLiScraper:
         except Exception as e:
             logger.error(f"解析黄历数据失败: {str(e)}")
         
-        return None
+        if stale is not None:
+            logger.warning(f"[黄历网页] {date} 重新获取失败，使用之前保存的数据")
+        return stale
+    
+    @staticmethod
+    async def fetch_page(url: str, date: str, headers: Optional[Dict[str, str]] = None,
+                         timeout: Optional[float] = None) -> Tuple[httpx.Response, Optional[Dict[str, Any]]]:
+        """
+        请求黄历网页并解析；启用流式读取时边下载边增量解析，读到所有栏目后停止下载，
+        网页中找不到全部栏目时读完整个网页再解析
+
+        Returns:
+            (响应, 黄历数据)；状态码不是2xx时不解析，黄历数据为None。流式读取提前结束时响应内容不完整，只能使用响应头
+        """
+        # 使用插件共享的HTTP客户端，复用连接
+        kwargs = {"headers": headers}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        stream, verify = page_stream.plan()
+        start = time.perf_counter()
+        async with get_client().stream("GET", url, **kwargs) as response:
+            if not response.is_success:
+                await response.aread()
+                return response, None
+            if not stream:
+                await response.aread()
+                return response, await HuangLiScraper.parse_page(response.text, date)
+
+            watcher = SectionWatcher()
+            chunks = []
+            prefix = None
+            async for chunk in response.aiter_text():
+                chunks.append(chunk)
+                if prefix is None and watcher.feed(chunk):
+                    prefix = ("".join(chunks), response.num_bytes_downloaded, time.perf_counter() - start)
+                    if not verify:
+                        break
+            total = response.headers.get("content-length")
+            elapsed = time.perf_counter() - start
+            read = response.num_bytes_downloaded
+
+        stats = page_stream.stats
+        stats["fetches"] += 1
+        if prefix is None:
+            # 没有读到全部栏目，按整个网页解析
+            stats["read"] += read
+            logger.info(f"[黄历网页] {date} 未找到全部栏目，已读取整个网页（{read} 字节）")
+            return response, await HuangLiScraper.parse_page("".join(chunks), date)
+
+        html_content, prefix_bytes, prefix_elapsed = prefix
+        huangli_data = await HuangLiScraper.parse_page(html_content, date)
+        stats["early"] += 1
+        stats["read"] += read
+        if verify:
+            # 核对时读完了整个网页，可以得到确切的节省量
+            stats["saved"] += read - prefix_bytes
+            full_data = await HuangLiScraper.parse_page("".join(chunks), date)
+            page_stream.verified(full_data == huangli_data, date)
+            logger.info(
+                f"[黄历网页] {date} 流式读取（核对）: 读到全部栏目时已读取 {prefix_bytes}/{read} 字节，"
+                f"用时 {prefix_elapsed * 1000:.0f}ms/{elapsed * 1000:.0f}ms"
+            )
+            return response, full_data
+        if total and total.isdigit():
+            stats["saved"] += max(0, int(total) - read)
+        logger.info(
+            f"[黄历网页] {date} 流式读取: 读取 {read}/{total or '未知'} 字节后停止下载，用时 {elapsed * 1000:.0f}ms"
+        )
+        return response, huangli_data
+    
+    @staticmethod
+    async def save_page(record: Dict[str, Any]):
+        """保存抓取结果，并将网页上的宜忌写入黄历索引，供择日查询"""
+        try:
+            await page_store.save(record)
+            if record["data"]['yi_ji']:
+                await run_io(almanac_store.record, record["date"], "scraper", record["data"]['yi_ji'])
+        except Exception as e:
+            logger.warning(f"保存黄历网页数据失败: {str(e)}")
     
     @staticmethod
     def parse_html_content(html_content: str, date: str) -> Dict[str, Any]:
         """
-        解析HTML内容，提取黄历数据
+        解析HTML内容，提取黄历数据（抽取规则见 huangli_extractor）
         
         Args:
             html_content: HTML内容字符串
@@ -58,163 +224,15 @@ class HuangLiScraper:
         Returns:
             解析后的黄历数据字典
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
-        result = {
-            'date': date,
-            'basic_info': {},
-            'wu_xing': {},
-            'chong_he': {},
-            'san_sha': {},
-            'qi_sha': {},
-            'ji_xiong': {},
-            'gua_xiang': {},
-            'yue_ling': {},
-            'tian_shen': {},
-            'er_shi_ba_xiu': {},
-            'di_mu_jing': {},
-            'errors': []
-        }
-        
-        try:
-            # 提取基础信息 - 星宿
-            xiu_element = soup.find(text=re.compile('今日星宿'))
-            if xiu_element and xiu_element.parent:
-                xiu_text = xiu_element.parent.get_text()
-                xiu_match = re.search(r'今日星宿：\\s*([^的]+)', xiu_text)
-                if xiu_match:
-                    result['basic_info']['star'] = xiu_match.group(1).strip()
-            
-            # 提取五行信息
-            wu_xing_elements = soup.find_all(text=re.compile('[年月日]五行'))
-            for element in wu_xing_elements:
-                if element.parent:
-                    wu_xing_text = element.parent.get_text()
-                    if '年五行' in wu_xing_text:
-                        match = re.search(r'年五行：([^\s]+)', wu_xing_text)
-                        if match:
-                            result['wu_xing']['year'] = match.group(1).strip()
-                    elif '月五行' in wu_xing_text:
-                        match = re.search(r'月五行：([^\s]+)', wu_xing_text)
-                        if match:
-                            result['wu_xing']['month'] = match.group(1).strip()
-                    elif '日五行' in wu_xing_text:
-                        match = re.search(r'日五行：([^\s]+)', wu_xing_text)
-                        if match:
-                            result['wu_xing']['day'] = match.group(1).strip()
-            
-            # 提取冲合信息
-            chong_he_element = soup.find(text=re.compile('今日冲合'))
-            if chong_he_element and chong_he_element.parent:
-                chong_he_text = chong_he_element.parent.get_text()
-                result['chong_he']['info'] = chong_he_text.replace('今日冲合', '').strip()
-            
-            # 提取三煞方信息
-            san_sha_elements = soup.find_all(text=re.compile('三煞'))
-            for element in san_sha_elements:
-                if element.parent:
-                    san_sha_text = element.parent.get_text()
-                    if '本年三煞' in san_sha_text:
-                        match = re.search(r'本年三煞：([^;]+)', san_sha_text)
-                        if match:
-                            result['san_sha']['year'] = match.group(1).strip()
-                    elif '本月三煞' in san_sha_text:
-                        match = re.search(r'本月三煞：([^;]+)', san_sha_text)
-                        if match:
-                            result['san_sha']['month'] = match.group(1).strip()
-                    elif '今日三煞' in san_sha_text:
-                        match = re.search(r'今日三煞：([^;]+)', san_sha_text)
-                        if match:
-                            result['san_sha']['day'] = match.group(1).strip()
-            
-            # 提取七煞方信息
-            qi_sha_elements = soup.find_all(text=re.compile('七煞'))
-            for element in qi_sha_elements:
-                if element.parent:
-                    qi_sha_text = element.parent.get_text()
-                    if '年七煞' in qi_sha_text:
-                        match = re.search(r'年七煞：([^\s]+)', qi_sha_text)
-                        if match:
-                            result['qi_sha']['year'] = match.group(1).strip()
-                    elif '月七煞' in qi_sha_text:
-                        match = re.search(r'月七煞：([^\s]+)', qi_sha_text)
-                        if match:
-                            result['qi_sha']['month'] = match.group(1).strip()
-                    elif '日七煞' in qi_sha_text:
-                        match = re.search(r'日七煞：([^\s]+)', qi_sha_text)
-                        if match:
-                            result['qi_sha']['day'] = match.group(1).strip()
-            
-            # 提取九星吉凶信息
-            jiu_xing_element = soup.find(text=re.compile('今日河图洛书九星吉凶'))
-            if jiu_xing_element:
-                jiu_xing_div = jiu_xing_element.find_parent(['div', 'p'])
-                if jiu_xing_div:
-                    result['ji_xiong']['nine_star'] = jiu_xing_div.get_text().replace('今日河图洛书九星吉凶', '').strip()
-            
-            # 提取卦象信息
-            gua_xiang_element = soup.find(text=re.compile('今日卦象'))
-            if gua_xiang_element and gua_xiang_element.parent:
-                gua_xiang_div = gua_xiang_element.find_parent(['div', 'p'])
-                if gua_xiang_div:
-                    result['gua_xiang']['info'] = gua_xiang_div.get_text().replace('今日卦象：', '').strip()
-                    
-                    # 查找卦象详细描述
-                    next_element = gua_xiang_div.find_next(['div', 'p'])
-                    if next_element:
-                        gua_desc = []
-                        current = next_element
-                        while current and not any(keyword in current.get_text() for keyword in ['月令', '物候', '今日十二神', '二十八星宿']):
-                            gua_desc.append(current.get_text().strip())
-                            current = current.find_next(['div', 'p'])
-                        result['gua_xiang']['description'] = '\n'.join(gua_desc)
-            
-            # 提取月令、物候等信息
-            yue_ling_element = soup.find(text=re.compile('月令'))
-            if yue_ling_element and yue_ling_element.parent:
-                yue_ling_text = yue_ling_element.parent.get_text()
-                match = re.search(r'月令：\\s*([^\s]+)', yue_ling_text)
-                if match:
-                    result['yue_ling']['month'] = match.group(1).strip()
-            
-            wu_hou_element = soup.find(text=re.compile('物候'))
-            if wu_hou_element and wu_hou_element.parent:
-                wu_hou_text = wu_hou_element.parent.get_text()
-                match = re.search(r'物候：\\s*([^\s]+)', wu_hou_text)
-                if match:
-                    result['yue_ling']['phenology'] = match.group(1).strip()
-            
-            # 提取十二神吉凶信息
-            er_shi_shen_element = soup.find(text=re.compile('今日十二神吉凶所主'))
-            if er_shi_shen_element and er_shi_shen_element.parent:
-                er_shi_shen_div = er_shi_shen_element.find_parent(['div', 'p'])
-                if er_shi_shen_div:
-                    result['tian_shen']['twelve_gods'] = er_shi_shen_div.get_text().replace('今日十二神吉凶所主', '').strip()
-            
-            # 提取二十八星宿吉凶信息
-            er_shi_ba_xiu_element = soup.find(text=re.compile('今日二十八星宿吉凶'))
-            if er_shi_ba_xiu_element and er_shi_ba_xiu_element.parent:
-                er_shi_ba_xiu_div = er_shi_ba_xiu_element.find_parent(['div', 'p'])
-                if er_shi_ba_xiu_div:
-                    result['er_shi_ba_xiu']['info'] = er_shi_ba_xiu_div.get_text().replace('今日二十八星宿吉凶', '').strip()
-            
-            # 提取地母经信息
-            di_mu_jing_element = soup.find(text=re.compile('地母经卜曰'))
-            if di_mu_jing_element:
-                # 提取卜曰内容
-                div_element = di_mu_jing_element.find_parent(['div', 'p'])
-                if div_element:
-                    result['di_mu_jing']['divination'] = div_element.get_text().replace('地母经卜曰', '').strip()
-                    
-                    # 提取诗曰内容
-                    shi_yue_element = soup.find(text=re.compile('地母经诗曰'))
-                    if shi_yue_element and shi_yue_element.parent:
-                        result['di_mu_jing']['poem'] = shi_yue_element.parent.get_text().replace('地母经诗曰', '').strip()
-            
-        except Exception as e:
-            logger.error(f"解析HTML内容时出错: {str(e)}")
-            result['errors'].append(str(e))
-        
-        return result
+        return page_parser.parse(html_content, date)
+    
+    @staticmethod
+    async def parse_page(html_content: str, date: str) -> Dict[str, Any]:
+        """在解析工作池中解析HTML内容，解析期间不阻塞事件循环，参数和返回值同 parse_html_content"""
+        backend, verify = page_parser.plan()
+        huangli_data, consistent = await run_parse(parse_page, html_content, date, backend, verify)
+        page_parser.report(backend, consistent, date)
+        return huangli_data
     
     @staticmethod
     def format_huangli_data(huangli_data: Dict[str, Any]) -> List[str]:
@@ -247,6 +265,12 @@ class HuangLiScraper:
             if huangli_data['wu_xing'].get('day'):
                 messages.append(f"日五行：{huangli_data['wu_xing']['day']}")
         
+        # 宜忌
+        if huangli_data.get('yi_ji', {}).get('yi'):
+            messages.append(f"✅ 宜：{' '.join(huangli_data['yi_ji']['yi'])}")
+        if huangli_data.get('yi_ji', {}).get('ji'):
+            messages.append(f"❌ 忌：{' '.join(huangli_data['yi_ji']['ji'])}")
+        
         # 冲合信息
         if huangli_data['chong_he'].get('info'):
             messages.append("\n⚖️ 冲合信息")
@@ -0,0 +1,156 @@
+"""黄历网页数据存储 - 抓取并解析后的黄历网页按日期保存为带版本号的JSON文件，内存中保留最近使用的记录；解析器变化后旧文件自动失效"""
+
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from nonebot import get_driver, logger
+
+from .file_io import read_bytes, run_io, write_bytes
+from .huangli_extractor import PARSER_VERSION
+from .lunar_engine import SHANGHAI_TZ
+
+config = get_driver().config
+
+# 今天及以后的日期距上次向网站确认超过该小时数后，查询时重新请求（带条件请求头，未修改时只更新确认时间）；已过去的日期不会过期
+XISOUL_HUANGLI_TTL_HOURS = float(getattr(config, "xisoul_huangli_ttl_hours", 24))
+# 内存中保留的最近使用的记录数
+XISOUL_HUANGLI_MEMORY_ITEMS = int(getattr(config, "xisoul_huangli_memory_items", 128))
+
+# 黄历网页数据目录，每个日期一个JSON文件
+PAGE_DIR = os.path.join(os.path.dirname(__file__), "cache", "huangli")
+# 磁盘格式版本：记录的结构变化时递增。文件名中带有格式版本和解析器版本，
+# 任一版本不同的文件视为不存在（重新抓取时也不带条件请求头），由 prune() 清理
+FORMAT_VERSION = 2
+# 数据文件名：日期.版本.json（旧格式为 日期.json）
+RECORD_FILE = re.compile(r"^\d{4}-\d{2}-\d{2}(\..+)?\.json$")
+
+
+def get_today() -> str:
+    return datetime.now(SHANGHAI_TZ).strftime("%Y-%m-%d")
+
+
+class PageStore:
+    """
+    黄历网页数据存储
+
+    每条记录: {"version", "parser", "date", "url", "etag", "last_modified", "fetched_at", "checked_at", "data"}
+    fetched_at 为最近一次下载网页的时间，checked_at 为最近一次向网站确认（含304未修改）的时间
+    """
+
+    def __init__(self, directory: str, version: int = FORMAT_VERSION, parser: str = PARSER_VERSION,
+                 ttl_hours: float = XISOUL_HUANGLI_TTL_HOURS, memory_items: int = XISOUL_HUANGLI_MEMORY_ITEMS):
+        self.directory = directory
+        self.version = version
+        self.parser = parser
+        self.ttl = ttl_hours * 3600
+        self.memory_items = memory_items
+        # 日期 -> 记录，按最近使用排列
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.stats = {"memory": 0, "disk": 0, "miss": 0}
+
+    @property
+    def suffix(self) -> str:
+        return f".v{self.version}-{self.parser}.json"
+
+    def path(self, date: str) -> str:
+        return os.path.join(self.directory, f"{date}{self.suffix}")
+
+    def _remember(self, record: Dict[str, Any]):
+        self._memory[record["date"]] = record
+        self._memory.move_to_end(record["date"])
+        while len(self._memory) > max(0, self.memory_items):
+            self._memory.popitem(last=False)
+
+    async def load(self, date: str) -> Optional[Dict[str, Any]]:
+        """读取日期对应的记录（先查内存），不存在、无效或版本不同时返回None"""
+        record = self._memory.get(date)
+        if record is not None:
+            self._memory.move_to_end(date)
+            self.stats["memory"] += 1
+            return record
+        try:
+            record = json.loads(await read_bytes(self.path(date)))
+        except FileNotFoundError:
+            self.stats["miss"] += 1
+            return None
+        except Exception as e:
+            logger.warning(f"[黄历网页] 数据文件无效，忽略 {date}: {str(e)}")
+            self.stats["miss"] += 1
+            return None
+        if record.get("version") != self.version or record.get("parser") != self.parser or record.get("date") != date:
+            self.stats["miss"] += 1
+            return None
+        self.stats["disk"] += 1
+        self._remember(record)
+        return record
+
+    async def save(self, record: Dict[str, Any]):
+        record["version"] = self.version
+        record["parser"] = self.parser
+        self._remember(record)
+        content = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        await write_bytes(self.path(record["date"]), content.encode("utf-8"))
+
+    def is_fresh(self, record: Dict[str, Any]) -> bool:
+        """已过去的日期的网页不再变化，始终有效；今天及以后的日期在确认后 ttl 内有效"""
+        if record["date"] < get_today():
+            return True
+        return time.time() - record.get("checked_at", 0) < self.ttl
+
+    @staticmethod
+    def conditional_headers(record: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """重新请求已保存的网页时使用的条件请求头"""
+        headers = {}
+        if record is not None:
+            if record.get("etag"):
+                headers["If-None-Match"] = record["etag"]
+            if record.get("last_modified"):
+                headers["If-Modified-Since"] = record["last_modified"]
+        return headers
+
+    @staticmethod
+    def new_record(date: str, url: str, response, data: Dict[str, Any]) -> Dict[str, Any]:
+        """根据网页响应和解析结果生成记录"""
+        now = time.time()
+        return {
+            "date": date,
+            "url": url,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "fetched_at": now,
+            "checked_at": now,
+            "data": data,
+        }
+
+    def _prune(self) -> int:
+        """删除其他格式或解析器版本的记录，在文件读写线程中执行"""
+        removed = 0
+        if not os.path.isdir(self.directory):
+            return removed
+        for filename in os.listdir(self.directory):
+            if RECORD_FILE.match(filename) and not filename.endswith(self.suffix):
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    async def prune(self) -> int:
+        """删除旧版本的记录，返回删除的文件数；当前版本的记录（包括已过去的日期）都保留"""
+        return await run_io(self._prune)
+
+    def summary(self) -> str:
+        stats = self.stats
+        return (
+            f"解析器版本 {self.parser}，内存中 {len(self._memory)} 条；"
+            f"读取命中内存 {stats['memory']} 次、磁盘 {stats['disk']} 次，未命中 {stats['miss']} 次"
+        )
+
+
+page_store = PageStore(PAGE_DIR)
@@ -1,6 +1,5 @@
-from nonebot import on_command, on_message, logger, require
+from nonebot import logger, require
 from nonebot.adapters.onebot.v11 import Message, MessageSegment, Bot, Event
-from nonebot.params import CommandArg
 from nonebot.typing import T_State
 from datetime import datetime
 import asyncio
@@ -12,41 +11,26 @@ require("nonebot_plugin_htmlrender")
 from nonebot_plugin_htmlrender import get_new_page
 
 from .date_parser import DateParser
+from .single_flight import single_flight
+from .circuit_breaker import breakers
+from .batch_fetch import XISOUL_RANGE_MAX_DAYS, XISOUL_RANGE_SCREENSHOT_CONCURRENCY, gather_bounded, send_forward_message
 
-# 初始化命令
-lunar_calendar_by_date = on_command("黄历", aliases={"老黄历", "黄历查询", "农历"}, priority=5)
-# 专门添加hl命令的处理器，确保能处理带参数的hl命令
-# 使用更通用的消息处理器，确保能处理带参数的hl命令
-hl_command = on_command("hl", priority=3, block=True)
-hl_message = on_message(rule=lambda event: str(event.message).strip().startswith("hl "), priority=3, block=True)
-logger.info("[黄历] 已注册hl命令处理器")
+# 命令定义
+# 黄历/hl命令在__init__.py中注册，直接发送的带参数"hl "消息由命令路由器分发到handle_hl_message
+# 本模块在首次调用时才被导入，避免启动时加载htmlrender(Playwright)
 
-@hl_command.handle()
-async def handle_hl_command(bot: Bot, event: Event, state: T_State, args: Message = CommandArg()):
-    """
-    处理hl命令，转发给handle_lunar_calendar处理
-    """
-    logger.info(f"[黄历] 收到hl命令，消息内容: {event.message}")
-    logger.info(f"[黄历] 命令参数: {args}")
-    await handle_lunar_calendar(bot, event, state, args)
-
-@hl_message.handle()
-async def handle_hl_message(bot: Bot, event: Event, state: T_State):
+async def handle_hl_message(bot: Bot, event: Event, args_str: str):
     """
     处理带参数的hl消息，如hl 2026-10-11
+
+    Args:
+        args_str: 命令路由器去掉 "hl " 前缀后的参数文本
     """
-    message = str(event.message).strip()
-    logger.info(f"[黄历] 收到带参数的hl消息: {message}")
-    # 提取命令参数
-    args_str = message[3:].strip()  # 移除 "hl " 前缀
-    # 创建消息对象
-    from nonebot.adapters.onebot.v11 import Message
-    args = Message(args_str)
+    logger.info(f"[黄历] 收到带参数的hl消息: hl {args_str}")
     # 调用处理函数
-    await handle_lunar_calendar(bot, event, state, args)
+    await handle_lunar_calendar(bot, event, {}, Message(args_str))
 
-@lunar_calendar_by_date.handle()
-async def handle_lunar_calendar(bot: Bot, event: Event, state: T_State, args: Message = CommandArg()):
+async def handle_lunar_calendar(bot: Bot, event: Event, state: T_State, args: Message):
     """
     处理黄历查询命令，直接返回网页截图
     
@@ -60,12 +44,20 @@ async def handle_lunar_calendar(bot: Bot, event: Event, state: T_State, args: Me
     arg_text = args.extract_plain_text().strip()
     
     try:
+        # 日期范围（如 2025-01-01~2025-01-07、本周）逐日截图，合并为一条转发消息
+        dates = DateParser.parse_date_range(arg_text, XISOUL_RANGE_MAX_DAYS)
+        if dates and len(dates) > 1:
+            date_strs = [DateParser.format_date(*date) for date in dates]
+            logger.info(f"查询日期范围: {date_strs[0]} ~ {date_strs[-1]} 的黄历信息")
+            await take_huangli_screenshots(bot, event, date_strs)
+            return
+        
         # 解析日期
         parsed_date = DateParser.parse_date_from_command(arg_text)
         
         # 检查日期解析是否成功
         if not parsed_date:
-            raise ValueError("无法识别的日期格式，请使用YYYY-MM-DD格式")
+            raise ValueError("无法识别的日期格式，请使用YYYY-MM-DD或YYYY-MM-DD~YYYY-MM-DD格式")
         
         # 格式化日期为YYYY-MM-DD
         date_str = DateParser.format_date(*parsed_date)
@@ -83,13 +75,60 @@ async def handle_lunar_calendar(bot: Bot, event: Event, state: T_State, args: Me
 
 async def take_huangli_screenshot(bot: Bot, event: Event, date_str: str):
     """
-    使用nonebot-plugin-htmlrender的异步截图函数，截取指定日期的黄历网页
+    截取指定日期的黄历网页并发送
     """
     try:
-        # 构建目标网页URL
-        url = f"https://www.huangli123.net/huangli/{date_str}.html"
-        logger.info(f"正在截图黄历网页: {url}")
+        # 同一日期的并发截图合并为一次
+        img_bytes = await single_flight.do(f"screenshot:{date_str}", capture_huangli_screenshot, date_str)
         
+        # 发送图片
+        await bot.send(event, MessageSegment.image(img_bytes))
+        logger.info("黄历图片已发送")
+            
+    except Exception as e:
+        logger.error(f"截图过程中出错: {str(e)}")
+        await bot.send(event, "❌ 截图失败，无法获取黄历图片")
+        # 详细错误记录到日志
+        logger.exception("获取黄历图片时发生异常:")
+
+async def take_huangli_screenshots(bot: Bot, event: Event, date_strs: list):
+    """
+    截取多个日期的黄历网页，合并为一条转发消息发送
+
+    同时打开的页面数受XISOUL_RANGE_SCREENSHOT_CONCURRENCY限制，单个日期失败不影响其他日期
+    """
+    results = await gather_bounded(
+        date_strs,
+        lambda date_str: single_flight.do(f"screenshot:{date_str}", capture_huangli_screenshot, date_str),
+        XISOUL_RANGE_SCREENSHOT_CONCURRENCY,
+    )
+    if all(isinstance(result, BaseException) for result in results.values()):
+        await bot.send(event, "❌ 截图失败，无法获取黄历图片")
+        return
+    
+    contents = []
+    for date_str in date_strs:
+        result = results[date_str]
+        if isinstance(result, BaseException):
+            contents.append(f"❌ {date_str} 截图失败")
+        else:
+            contents.append(MessageSegment.text(f"📅 {date_str}\n") + MessageSegment.image(result))
+    await send_forward_message(bot, event, contents, nickname="黄历")
+    logger.info(f"黄历图片已发送: {len(date_strs)} 个日期")
+
+async def capture_huangli_screenshot(date_str: str) -> bytes:
+    """
+    使用nonebot-plugin-htmlrender的异步截图函数，截取指定日期的黄历网页
+    
+    Returns:
+        截图的图片数据
+    """
+    # 构建目标网页URL
+    url = f"https://www.huangli123.net/huangli/{date_str}.html"
+    logger.info(f"正在截图黄历网页: {url}")
+    
+    # 网页截图不经过共享HTTP客户端，单独经过熔断器
+    async with breakers.guard(url):
         # 使用get_new_page()上下文管理器
         async with get_new_page() as page:
             # 设置页面大小
@@ -108,16 +147,7 @@ async def take_huangli_screenshot(bot: Bot, event: Event, date_str: str):
             img_bytes = await page.screenshot(full_page=True)
             
             logger.info(f"黄历网页截图成功: {date_str}")
-            
-            # 发送图片
-            await bot.send(event, MessageSegment.image(img_bytes))
-            logger.info("黄历图片已发送")
-            
-    except Exception as e:
-        logger.error(f"截图过程中出错: {str(e)}")
-        await bot.send(event, "❌ 截图失败，无法获取黄历图片")
-        # 详细错误记录到日志
-        logger.exception("获取黄历图片时发生异常:")
+            return img_bytes
 
 # 保留send_huangli_image函数，向后兼容
 async def send_huangli_image(bot, event, huangli_data: dict):
@@ -0,0 +1,430 @@
+"""本地黄历计算 - 不访问网络，按预先计算的节气表和朔日表推算农历日期、干支、节气等历法信息，字段与lunarpro接口一致"""
+
+import math
+from bisect import bisect_right
+from datetime import date as Date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+# 支持的公历年份范围
+MIN_YEAR = 1900
+MAX_YEAR = 2100
+
+# 农历以北京时间（东八区）划分日期
+BEIJING_OFFSET = 8 / 24
+SHANGHAI_TZ = timezone(timedelta(hours=8), "Asia/Shanghai")
+
+GAN = "甲乙丙丁戊己庚辛壬癸"
+ZHI = "子丑寅卯辰巳午未申酉戌亥"
+SHENG_XIAO = "鼠牛虎兔龙蛇马羊猴鸡狗猪"
+GAN_WU_XING = "木木火火土土金金水水"
+ZHI_WU_XING = "水土木木土火火土金金土水"
+NA_YIN = [
+    "海中金", "炉中火", "大林木", "路旁土", "剑锋金", "山头火", "涧下水", "城头土", "白蜡金", "杨柳木",
+    "泉中水", "屋上土", "霹雳火", "松柏木", "长流水", "砂中金", "山下火", "平地木", "壁上土", "金箔金",
+    "覆灯火", "天河水", "大驿土", "钗钏金", "桑柘木", "大溪水", "沙中土", "天上火", "石榴木", "大海水",
+]
+# 从小寒开始的二十四节气，偶数下标为节，奇数下标为中气
+JIE_QI = [
+    "小寒", "大寒", "立春", "雨水", "惊蛰", "春分", "清明", "谷雨", "立夏", "小满", "芒种", "夏至",
+    "小暑", "大暑", "立秋", "处暑", "白露", "秋分", "寒露", "霜降", "立冬", "小雪", "大雪", "冬至",
+]
+MONTH_NAMES = ["正", "二", "三", "四", "五", "六", "七", "八", "九", "十", "冬", "腊"]
+DAY_TENS = ["初", "十", "廿", "三"]
+DAY_UNITS = ["一", "二", "三", "四", "五", "六", "七", "八", "九", "十"]
+WEEK = "一二三四五六日"
+ZHI_XING = "建除满平定执破危成收开闭"
+# 二十八宿（从角宿开始），及其七曜和禽
+XIU = "角亢氐房心尾箕斗牛女虚危室壁奎娄胃昴毕觜参井鬼柳星张翼轸"
+XIU_ANIMALS = "蛟龙貉兔狐虎豹獬牛蝠鼠燕猪貐狼狗雉鸡乌猴猿犴羊獐马鹿蛇蚓"
+QI_ZHENG = "木金土日月火水"
+JIU_XING = ["一白水星", "二黑土星", "三碧木星", "四绿木星", "五黄土星", "六白金星", "七赤金星", "八白土星", "九紫火星"]
+CONSTELLATIONS = [
+    ((1, 20), "水瓶座"), ((2, 19), "双鱼座"), ((3, 21), "白羊座"), ((4, 20), "金牛座"),
+    ((5, 21), "双子座"), ((6, 22), "巨蟹座"), ((7, 23), "狮子座"), ((8, 23), "处女座"),
+    ((9, 23), "天秤座"), ((10, 24), "天蝎座"), ((11, 23), "射手座"), ((12, 22), "摩羯座"),
+]
+PENG_ZU_GAN = [
+    "甲不开仓财物耗散", "乙不栽植千株不长", "丙不修灶必见灾殃", "丁不剃头头必生疮", "戊不受田田主不祥",
+    "己不破券二比并亡", "庚不经络织机虚张", "辛不合酱主人不尝", "壬不汲水更难提防", "癸不词讼理弱敌强",
+]
+PENG_ZU_ZHI = [
+    "子不问卜自惹祸殃", "丑不冠带主不还乡", "寅不祭祀神鬼不尝", "卯不穿井水泉不香", "辰不哭泣必主重丧",
+    "巳不远行财物伏藏", "午不苫盖屋主更张", "未不服药毒气入肠", "申不安床鬼祟入房", "酉不会客醉坐颠狂",
+    "戌不吃犬作怪上床", "亥不嫁娶不利新郎",
+]
+# 按日干的喜神、财神方位
+XI_SHEN = ["东北", "西北", "西南", "正南", "东南", "东北", "西北", "西南", "正南", "东南"]
+CAI_SHEN = ["东北", "东北", "西南", "西南", "正北", "正北", "正东", "正东", "正南", "正南"]
+# 按日支三合局的煞方
+SHA = ["南", "东", "北", "西", "南", "东", "北", "西", "南", "东", "北", "西"]
+
+# 公历日期的儒略日数与date.toordinal()之差
+JDN_OFFSET = 1721425
+# 1949-10-01（儒略日数2433191）为甲子日
+JIA_ZI_JDN = 2433191
+# 1950-01-29为周日且为甲子日，七元禽星以一元甲子（周日）起虚宿，二十八宿按28天循环
+XU_XIU_JDN = 2433311
+
+
+class LunarDate(NamedTuple):
+    year: int
+    month: int
+    day: int
+    leap: bool
+
+    def month_name(self) -> str:
+        return f"{'闰' if self.leap else ''}{MONTH_NAMES[self.month - 1]}月"
+
+    def day_name(self) -> str:
+        if self.day == 10:
+            return "初十"
+        if self.day == 20:
+            return "二十"
+        if self.day == 30:
+            return "三十"
+        return DAY_TENS[self.day // 10] + DAY_UNITS[self.day % 10 - 1]
+
+    def __str__(self) -> str:
+        return self.month_name() + self.day_name()
+
+
+def _to_jdn(day: Date) -> int:
+    return day.toordinal() + JDN_OFFSET
+
+
+def _from_jdn(jdn: int) -> Date:
+    return Date.fromordinal(jdn - JDN_OFFSET)
+
+
+# 节气表和朔日表覆盖的公历年份（比支持的范围前后各多一年，用于推算相邻年份的冬至和农历月）
+TABLE_MIN_YEAR = MIN_YEAR - 1
+TABLE_MAX_YEAR = MAX_YEAR + 1
+# 朔日表第一项为第 NEW_MOON_K0 个朔（k=0为2000年1月6日的朔），即1897年11月24日
+NEW_MOON_K0 = -1263
+
+# 节气表：从TABLE_MIN_YEAR年起每年24位数字，依次为小寒至冬至所在日期（北京时间）的儒略日数与平均位置之差加2，
+# 平均位置见 _mean_solar_term。数据按寿星天文历的高精度算法生成（lunar_python），可用
+# benchmarks/check_lunar_engine.py --tables 重新生成并逐个核对
+_SOLAR_TERM_TABLE = (
+    "111110001011233344433332211100000012223344444422221000000112223434444332221000000121233334443333"
+    "111110001111233344433332211100001012223344444422221000000112223444444332221000000111233334443333"
+    "211110001111233344433333211100001012223344444422221000010112223444444332221000000111233434443333"
+    "211110001111233344433333211100001012223344444332211000010112223443444332220000000111233434443333"
+    "211100000111233344433333111100001012233344344332211000010012223443444432220000000111233434443332"
+    "211101000111233344433333111110001012233344344332211000000012323443444422220000000111233434444332"
+    "211000000111233344433333111110001012233344344332211100000012323443444422220000000112223434444332"
+    "211000000111233344443333111110001012233344433332211100000012223343444422221000000112223434444332"
+    "211000000121233334443333111110001111233344433332211100000012223344444422221000000112223434444332"
+    "221000000111233334443333211110001111233344433332211100001012223344444422221000000112223444444332"
+    "221000000111233334443333211110001111233344433333211100001012223344444422221000010112223444444332"
+    "221000000111233434443333211110000111234344433333211100001012223344344332211000010112223443444332"
+    "220000000111233434443333211101000111233344433333111100001012233344344332211000000012223443444432"
+    "220000000111233434443333211101000111233344433333111110001012233344344332211000000012323443444422"
+    "220000000111223434444332211100000111233344443333111110001012233344344332211100000012223343444422"
+    "220000000112223434444332211000000121233334443333111110001011233344433332211100000012223343444422"
+    "221000000112223434444332221000000121233334443333111110001111233344433332211100000012223344444422"
+    "221000000112223434444332221000000111233334443333211110001111233344433332211100001012223344444422"
+    "221000000112223444444332221000000111233434443333211110000111233344433333211100001012223344444422"
+    "221000010112223443444332221000000111233434443333211110000111233344433333211100001012223344344432"
+    "211000010012223443444332221000000111233434443333211111000111233344433333211100001012233344344332"
+    "211000000012223443444432220000000111223434444333211101000111233344433333111110001012233344344332"
+    "211000000012223443444422220000000112223434444332211100000111233334443333111110001011233344344332"
+    "211100000012223343444422221000000112223434444332211000000121233334443333111110001011233344433332"
+    "211100000012223343444422221000000112223434444332221000000111233334443333111110001111233344433332"
+    "211100000012223344444422221000000112223444444332221000000111233334443333211110001111233344433332"
+    "211100001012223344444422221000010112223444444332221000000111233434443333211110000111232344433333"
+    "211100001012223344444422221000010112223443444332221000000111233434443333211110000111233344433333"
+    "211100001012223344344432221000010012223443444432221000000111223434443333211111000111233344433333"
+    "211100001012233344344332211000000012323443444432220000000111223434444333211101000111233344433333"
+    "111110001011233344344332211100000012223343444432220000000112223434444332211100000111233334443333"
+    "111110001011233344344332211100000012223343444422221000000112223434444332211000000111233334443333"
+    "111110001011233344433332211100000012223344444422221000000112223434444332221000000111233334443333"
+    "111110001111233344433332211100001012223344444422221000000112223444444332221000000111233334443333"
+    "211110000111232344433332211100001012223344444422221000010112223444444332221000000111233434443333"
+    "211110000111232344433333211100001012223344444432221000010012223443444332221000000111233434443333"
+    "211110000111233344433333211100001012233344344432221000000012223443444432221000000111223434443333"
+    "211111000111233344433333211110001011233344344332211000000012223343444432220000000111223434444333"
+    "211100000111233334433333111110001011233344344332211100000012223343444432220000000112223434444333"
+    "211100000101233334443333111110001011233344444332211100000012223343444422221000000112223434444332"
+    "211100000111233334443333111110001111233344433332211100000012223344444422221000000112223434444332"
+    "221000000111233334443333111110001111233344433332211100001012223344444422221000000112223444444332"
+    "221000000111233334443333211110000111232344433333211100001012223344444422221000010012223443444332"
+    "221000000111233434443333211110000111233344433333211100001012223344344432221000010012223443444332"
+    "221000000111223434443333211111000111233344433333211100001012233344344432221000000012123443444432"
+    "221000000111223434443333211111000111233344433333211110001011233344344332221000000012223343444432"
+    "220000000111223434444333211100000111233334443333111110001011233344344332211100000012223343444432"
+    "220000000112223434444333211100000111233334443333111110001011233344444332211100000012223343444422"
+    "221000000112223434444332211100000111233334443333111110001111233344433332211100000012223344444422"
+    "221000000112223434444332221000000111233334443333211110001111232344433332211100001012223344444422"
+    "221000000112223444444332221000000111233434443333211110000111232344433333"
+)
+# 朔日表：从第NEW_MOON_K0个朔起每个朔所在日期（北京时间）的儒略日数与平均位置之差加1，平均位置见 _mean_new_moon
+_NEW_MOON_TABLE = (
+    "1111111111111111111111111111111010111121111101010112121210101011212121111001011212111101101111211111"
+    "1111211111111111111112111111101111112111110101011212121010101121212111100101121211110110112121111010"
+    "1121111111010111121211111011111121211111010111121212101010111121211110010112121111010011212111101011"
+    "2112111101011112121110101011112121110101011112121210101011112121111101011212111101001121211110101121"
+    "1211110101111212111010101121212101010111121212111010111111212111110111121211110110112121111010112112"
+    "1111010111122211101010112121210101011112121111101011111111111111011111111111111011112111101011211211"
+    "1101011112221110101011212121010101111212111110101111211111111111111111111111101111111110111121111111"
+    "0101111212111010101121212101010112121211111010112121111111111111111111111111111111111111112111111101"
+    "0111121211101010112121210101011212121111001011212111101111111211111111111111111111111111211111110101"
+    "1112121110101011212121010101111212111100101121211110111112121111010112121111101011112121111101011112"
+    "1212111010111121212111010111121211110010112121111010111212111101011212211110101111212111010101111212"
+    "1210101011112121111101011112121111101011212111101011121211110101121221111010111121211101010112121211"
+    "1010111111211111110111111211111110111121211110111111121111010112122111101011112121110101011212121110"
+    "1011112121111111011111111111111011111111111111111112111101011212211110101111222111010101121212111010"
+    "1111212111111101111111111111101111111111111111111111110101121211111010111121211101010112121211101011"
+    "2121211110110112121111111111111111111111112111111111011112121111101011112121110101011212121110001111"
+    "2121111011011212111101111111111110111111211111110111111212111110101111212111010101121212111010111121"
+    "2111101101121211110101112121111010112121111101011112121211101011111121210101011112121211101011112121"
+    "1110110112121111010112212111101011212111110101111212121010101111212111110101111212111110101111212111"
+    "1011011212111101011221211110101121221111010111121212101010112121211111011111121111111010111121111111"
+    "1101121211110101121121111010112122111101011112121210101011212121111101111212111111101111111111111111"
+    "1111111111011112111111101011212111110101111212121010101121212111110111121211111110111111111111111111"
+    "1111111111111211111110101121211111010111121212101010112121211110011112121111011011211111101111211111"
+    "1111111112121111111011112121111101011112121210101011212121111001111212110101101121211110111121111111"
+    "0101111212111110111111212111010101111212121010101121212111100111121211010110112121101010112112111101"
+    "01121212111010111121212101"
+)
+_SOLAR_TERMS = "".join(_SOLAR_TERM_TABLE)
+_NEW_MOONS = "".join(_NEW_MOON_TABLE)
+
+
+def _mean_solar_term(year: int, index: int) -> int:
+    """year年第index个节气（0为小寒）的平均位置（儒略日数）"""
+    return int(math.floor(2451545 + (year - 2000) * 365.2422 + 5 + index * 15.2184 + 0.5))
+
+
+def _mean_new_moon(k: int) -> int:
+    """第k个朔的平均位置（北京时间的儒略日数）"""
+    return int(math.floor(2451550.09766 + 29.530588861 * k + BEIJING_OFFSET + 0.5))
+
+
+def _new_moon_jdn(k: int) -> int:
+    """第k个朔所在日期的儒略日数"""
+    i = k - NEW_MOON_K0
+    if not 0 <= i < len(_NEW_MOONS):
+        raise ValueError(f"仅支持{MIN_YEAR}年至{MAX_YEAR}年的日期")
+    return _mean_new_moon(k) + int(_NEW_MOONS[i]) - 1
+
+
+@lru_cache(maxsize=None)
+def solar_terms(year: int) -> Tuple[int, ...]:
+    """year年二十四节气（从小寒开始）所在日期的儒略日数"""
+    if not TABLE_MIN_YEAR <= year <= TABLE_MAX_YEAR:
+        raise ValueError(f"仅支持{MIN_YEAR}年至{MAX_YEAR}年的日期")
+    offset = (year - TABLE_MIN_YEAR) * 24
+    return tuple(_mean_solar_term(year, index) + int(_SOLAR_TERMS[offset + index]) - 2 for index in range(24))
+
+
+@lru_cache(maxsize=None)
+def lunar_months(year: int) -> Tuple[Tuple[int, int, bool, int], ...]:
+    """
+    从year-1年冬至所在月（十一月）到year年冬至所在月之前的农历月
+
+    返回 (月首儒略日数, 月份, 是否闰月, 农历年) 的元组，最后附加year年冬至所在月的月首作为结束标记。
+    两个冬至月之间有13个月时，其中第一个不含中气的月为闰月。
+    """
+    start_solstice = solar_terms(year - 1)[23]
+    end_solstice = solar_terms(year)[23]
+
+    k = int(math.floor((start_solstice - 2451550) / 29.530588861))
+    while _new_moon_jdn(k) > start_solstice:
+        k -= 1
+    while _new_moon_jdn(k + 1) <= start_solstice:
+        k += 1
+    starts = [_new_moon_jdn(k)]
+    while True:
+        k += 1
+        start = _new_moon_jdn(k)
+        if start > end_solstice:
+            break
+        starts.append(start)
+
+    # 上一个冬至和本年的中气
+    zhong_qi = [start_solstice] + [jdn for index, jdn in enumerate(solar_terms(year)) if index % 2 == 1]
+    leap_index = None
+    if len(starts) - 1 == 13:
+        for i in range(1, 13):
+            if not any(starts[i] <= jdn < starts[i + 1] for jdn in zhong_qi):
+                leap_index = i
+                break
+
+    months = []
+    month = 10
+    lunar_year = year - 1
+    for i in range(len(starts) - 1):
+        leap = i == leap_index
+        if not leap:
+            month = month % 12 + 1
+            if month == 1:
+                lunar_year = year
+        months.append((starts[i], month, leap, lunar_year))
+    months.append((starts[-1], 11, False, year))
+    return tuple(months)
+
+
+def _check_range(day: Date):
+    if not MIN_YEAR <= day.year <= MAX_YEAR:
+        raise ValueError(f"仅支持{MIN_YEAR}年至{MAX_YEAR}年的日期")
+
+
+def solar_to_lunar(day: Date) -> LunarDate:
+    """公历日期转农历日期"""
+    _check_range(day)
+    jdn = _to_jdn(day)
+    year = day.year
+    months = lunar_months(year)
+    if jdn >= months[-1][0]:
+        year += 1
+        months = lunar_months(year)
+    starts = [month[0] for month in months]
+    i = bisect_right(starts, jdn) - 1
+    start, month, leap, lunar_year = months[i]
+    return LunarDate(lunar_year, month, jdn - start + 1, leap)
+
+
+def _jie_month(jdn: int, year: int) -> Tuple[int, int]:
+    """按节划分的月份：返回 (以立春为界的年份, 月支相对寅的偏移0-11)"""
+    terms = solar_terms(year)
+    for index in range(22, -1, -2):
+        if jdn >= terms[index]:
+            if index == 0:
+                # 小寒至立春为上一年的丑月
+                return year - 1, 11
+            return year, index // 2 - 1
+    # 小寒之前为上一年的子月
+    return year - 1, 10
+
+
+def _index(gan: int, zhi: int) -> int:
+    """天干、地支序号 -> 六十甲子序号"""
+    return (6 * gan - 5 * zhi) % 60
+
+
+def _gan_zhi(index: int) -> str:
+    return GAN[index % 10] + ZHI[index % 12]
+
+
+def _wu_xing(index: int) -> str:
+    return GAN_WU_XING[index % 10] + ZHI_WU_XING[index % 12]
+
+
+def _na_yin(index: int) -> str:
+    return NA_YIN[index // 2]
+
+
+def day_gan_zhi_index(day: Date) -> int:
+    return (_to_jdn(day) - JIA_ZI_JDN) % 60
+
+
+def _current_terms(jdn: int, year: int) -> Tuple[Tuple[str, int], Tuple[str, int]]:
+    """当前所在的节气及下一个节气：((名称, 儒略日数), (名称, 儒略日数))"""
+    terms = [(JIE_QI[22], solar_terms(year - 1)[22]), (JIE_QI[23], solar_terms(year - 1)[23])]
+    terms += list(zip(JIE_QI, solar_terms(year)))
+    terms.append((JIE_QI[0], solar_terms(year + 1)[0]))
+    for i in range(len(terms) - 1, -1, -1):
+        if jdn >= terms[i][1]:
+            return terms[i], terms[i + 1]
+    return terms[0], terms[1]
+
+
+def _jia_zi_near(jdn: int) -> int:
+    """距离jdn最近的甲子日"""
+    offset = (jdn - JIA_ZI_JDN) % 60
+    return jdn - offset if offset <= 30 else jdn + 60 - offset
+
+
+def _day_star(jdn: int, year: int) -> int:
+    """日家九星：冬至前后最近的甲子日起一白顺行，夏至前后最近的甲子日起九紫逆行"""
+    starts = [
+        (_jia_zi_near(solar_terms(year - 1)[23]), True),
+        (_jia_zi_near(solar_terms(year)[11]), False),
+        (_jia_zi_near(solar_terms(year)[23]), True),
+    ]
+    start, ascending = starts[0]
+    for candidate, candidate_ascending in starts:
+        if jdn >= candidate:
+            start, ascending = candidate, candidate_ascending
+    offset = (jdn - start) % 9
+    return offset + 1 if ascending else 9 - offset
+
+
+def _format_jdn(jdn: int) -> str:
+    return _from_jdn(jdn).strftime("%Y-%m-%d")
+
+
+def compute_almanac(moment: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    计算指定时刻（默认当前北京时间）的黄历历法信息
+
+    返回的字段名与lunarpro接口data中的字段一致，只包含能够由历法推算的字段，
+    寄语、宜忌等接口独有的内容不包含在内
+    """
+    if moment is None:
+        moment = datetime.now(SHANGHAI_TZ)
+    elif moment.tzinfo is not None:
+        moment = moment.astimezone(SHANGHAI_TZ)
+    day = moment.date()
+    lunar = solar_to_lunar(day)
+    jdn = _to_jdn(day)
+
+    year_index = (lunar.year - 4) % 60
+    jie_year, month_offset = _jie_month(jdn, day.year)
+    month_index = (14 + (jie_year - 1900) * 12 + month_offset) % 60
+    day_index = day_gan_zhi_index(day)
+    # 23点起为次日的子时
+    hour_zhi = (moment.hour + 1) // 2 % 12
+    hour_day_index = (day_index + 1) % 60 if moment.hour >= 23 else day_index
+    hour_index = _index((hour_day_index % 5 * 2 + hour_zhi) % 10, hour_zhi)
+
+    (term_name, term_jdn), (next_name, next_jdn) = _current_terms(jdn, day.year)
+    month_zhi = (month_offset + 2) % 12
+    day_zhi = day_index % 12
+    xiu = (XIU.index("虚") + jdn - XU_XIU_JDN) % 28
+
+    year_branch = (jie_year - 4) % 12
+    month_star_start = {0: 8, 6: 8, 3: 8, 9: 8, 4: 5, 10: 5, 1: 5, 7: 5}.get(year_branch, 2)
+
+    constellation = "摩羯座"
+    for (month, start_day), name in CONSTELLATIONS:
+        if (day.month, day.day) >= (month, start_day):
+            constellation = name
+
+    term_text = term_name if term_jdn == jdn else f"{term_name}（{_format_jdn(term_jdn)}）"
+    return {
+        "Solar": day.strftime("%Y-%m-%d"),
+        "Week": f"星期{WEEK[day.weekday()]}",
+        "Constellation": constellation,
+        "LunarYear": f"{_gan_zhi(year_index)}年",
+        "Lunar": str(lunar),
+        "ThisYear": f"{SHENG_XIAO[year_index % 12]}年",
+        "JulianDay": jdn,
+        "GanZhiYear": _gan_zhi(year_index),
+        "GanZhiMonth": _gan_zhi(month_index),
+        "GanZhiDay": _gan_zhi(day_index),
+        "GanZhiHour": _gan_zhi(hour_index),
+        "WuXingYear": _wu_xing(year_index),
+        "WuXingMonth": _wu_xing(month_index),
+        "WuXingDay": _wu_xing(day_index),
+        "WuXingHour": _wu_xing(hour_index),
+        "NaYinYear": _na_yin(year_index),
+        "NaYinMonth": _na_yin(month_index),
+        "NaYinDay": _na_yin(day_index),
+        "NaYinHour": _na_yin(hour_index),
+        "JieQi1": term_text,
+        "NextJieQi": f"{next_name}（{_format_jdn(next_jdn)}）",
+        "XiShen": XI_SHEN[day_index % 10],
+        "CaiShen": CAI_SHEN[day_index % 10],
+        "ChongDay": f"冲{SHENG_XIAO[(day_zhi + 6) % 12]}",
+        "ShaDay": f"煞{SHA[day_zhi]}",
+        "PengZuBaiJi": f"{PENG_ZU_GAN[day_index % 10]} {PENG_ZU_ZHI[day_zhi]}",
+        "QiZheng": QI_ZHENG[xiu % 7],
+        "Xiu": f"{XIU[xiu]}{QI_ZHENG[xiu % 7]}{XIU_ANIMALS[xiu]}",
+        "ZhiXing": ZHI_XING[(day_zhi - month_zhi) % 12],
+        "JiuXingYear": JIU_XING[(2017 - jie_year) % 9],
+        "JiuXingMonth": JIU_XING[(month_star_start - 1 - month_offset) % 9],
+        "JiuXingDay": JIU_XING[_day_star(jdn, day.year) - 1],
+    }
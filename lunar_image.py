@@ -2,7 +2,7 @@ import os
 import asyncio
 import io  # 导入io模块用于内存操作
 from datetime import datetime
-from nonebot import on_command, on_message, logger
+from nonebot import logger
 from nonebot.adapters.onebot.v11 import Bot, Event, MessageSegment
 from nonebot.plugin import PluginMetadata
 from nonebot import require
@@ -11,11 +11,9 @@ from nonebot import require
 require("nonebot_plugin_htmlrender")
 from nonebot_plugin_htmlrender import get_new_page
 
-# 定义图片黄历规则
-async def is_image_lunar_command(event: Event) -> bool:
-    message = str(event.message).strip()
-    # 只处理纯"hl"消息，带参数的消息由lunar_calendar_by_date.py处理
-    return message == "hl"
+from .single_flight import single_flight
+from .circuit_breaker import breakers
+from .file_io import read_bytes, write_bytes, remove_file, get_file_size, run_io
 
 __plugin_meta__ = PluginMetadata(
     name="黄历",
@@ -23,10 +21,12 @@ __plugin_meta__ = PluginMetadata(
     usage="hl 获取网页截图版",
 )
 
+# 当天黄历网页
+HUANGLI_URL = "https://www.huangli123.net/huangli/"
+
 # 命令定义
-# 移除on_command处理器，避免与lunar_calendar_by_date.py中的hl_command冲突
-# 只保留on_message处理器处理纯"hl"消息
-image_lunar_direct = on_message(rule=is_image_lunar_command, priority=15, block=True)
+# 纯"hl"消息由__init__.py中的命令路由器分发到handle_image_lunar
+# 带参数的消息由lunar_calendar_by_date.py处理
 
 def create_temp_directory(temp_dir=None):
     """创建临时文件目录，根据不同操作系统和环境选择最佳存储位置"""
@@ -84,8 +84,8 @@ async def handle_image_lunar(bot: Bot, event: Event):
     logger.info(f"收到图片黄历命令请求: {message}")
     
     try:
-        # 生成唯一的文件名（内部已处理目录创建）
-        image_path = generate_unique_filename()
+        # 生成唯一的文件名（内部已处理目录创建，在文件读写线程中执行）
+        image_path = await run_io(generate_unique_filename)
         
         # 使用nonebot-plugin-htmlrender进行网页截图
         await take_huangli_screenshot(image_path)
@@ -93,14 +93,14 @@ async def handle_image_lunar(bot: Bot, event: Event):
         logger.info(f"黄历截图已保存至: {image_path}")
         
         # 检查文件是否存在且大小大于0
-        if os.path.exists(image_path) and os.path.getsize(image_path) > 0:
-            logger.info(f"截图文件大小: {os.path.getsize(image_path)} bytes")
+        file_size = await get_file_size(image_path)
+        if file_size > 0:
+            logger.info(f"截图文件大小: {file_size} bytes")
             
             # 针对Docker环境优化：使用BytesIO从内存读取图片并发送，避免路径映射问题
             try:
                 # 从文件读取图片数据到内存
-                with open(image_path, 'rb') as f:
-                    image_bytes = f.read()
+                image_bytes = await read_bytes(image_path)
                 
                 # 使用bytes模式发送图片
                 await bot.send(event, MessageSegment.image(image_bytes))
@@ -122,36 +122,39 @@ async def handle_image_lunar(bot: Bot, event: Event):
         # 详细错误记录到日志
         logger.exception("获取黄历图片时发生异常:")
 
-@image_lunar_direct.handle()
-async def handle_image_lunar_direct(bot: Bot, event: Event):
-    """处理直接发送的图片黄历命令"""
-    # 这个处理器只处理纯"hl"消息，由is_image_lunar_command规则保证
-    await handle_image_lunar(bot, event)
-
 async def take_huangli_screenshot(image_path):
+    """截取当天的黄历网页并保存到image_path，同一天的并发截图合并为一次"""
+    today = datetime.now().strftime("%Y-%m-%d")
+    img_bytes = await single_flight.do(f"screenshot:today:{today}", capture_today_screenshot)
+    await write_bytes(image_path, img_bytes)
+
+async def capture_today_screenshot() -> bytes:
     """使用nonebot-plugin-htmlrender的异步截图函数"""
-    # 直接使用get_new_page()上下文管理器
-    async with get_new_page() as page:
-        try:
-            # 设置页面大小
-            await page.set_viewport_size({"width": 1200, "height": 1600})
-            
-            # 打开目标网页
-            await page.goto("https://www.huangli123.net/huangli/")
-            
-            # 等待页面加载完成
-            await page.wait_for_load_state("networkidle")
-            
-            # 可以添加一些额外的等待时间，确保动态内容加载完成
-            await asyncio.sleep(2)
-            
-            # 截取整个页面
-            await page.screenshot(path=image_path, full_page=True)
-            
-            logger.info("黄历网页截图成功")
-        except Exception as e:
-            logger.error(f"截图过程中出错: {str(e)}")
-            raise
+    # 网页截图不经过共享HTTP客户端，单独经过熔断器，与按日期抓取黄历共用huangli123的健康状态
+    async with breakers.guard(HUANGLI_URL):
+        # 直接使用get_new_page()上下文管理器
+        async with get_new_page() as page:
+            try:
+                # 设置页面大小
+                await page.set_viewport_size({"width": 1200, "height": 1600})
+                
+                # 打开目标网页
+                await page.goto(HUANGLI_URL)
+                
+                # 等待页面加载完成
+                await page.wait_for_load_state("networkidle")
+                
+                # 可以添加一些额外的等待时间，确保动态内容加载完成
+                await asyncio.sleep(2)
+                
+                # 截取整个页面
+                img_bytes = await page.screenshot(full_page=True)
+                
+                logger.info("黄历网页截图成功")
+                return img_bytes
+            except Exception as e:
+                logger.error(f"截图过程中出错: {str(e)}")
+                raise
 
 async def delete_temp_file(file_path, delay=60):
     """延迟删除临时文件"""
@@ -159,9 +162,8 @@ async def delete_temp_file(file_path, delay=60):
     await asyncio.sleep(delay)
     
     # 检查文件是否存在，存在则删除
-    if os.path.exists(file_path):
-        try:
-            os.remove(file_path)
+    try:
+        if await remove_file(file_path):
             logger.info(f"临时文件已删除: {file_path}")
-        except Exception as e:
-            logger.error(f"删除临时文件失败: {str(e)}")
\ No newline at end of file
+    except Exception as e:
+        logger.error(f"删除临时文件失败: {str(e)}")
\ No newline at end of file
@@ -1,15 +1,27 @@
 import httpx
+import hashlib
 import json
 import os
 import asyncio
 import time
 # 修复导入部分，移除重复的httpx导入
 # import httpx  # 这行应该被删除
-from nonebot import on_command, get_driver, logger, get_bot  # 新增get_bot导入
+from nonebot import on_command, get_driver, logger, get_bot, get_bots, require  # 新增get_bot导入
 from nonebot.adapters.onebot.v11 import Bot, MessageSegment
 from nonebot.plugin import PluginMetadata
-from nonebot_plugin_apscheduler import scheduler
 from datetime import datetime
+from typing import Optional
+
+from .single_flight import single_flight
+from .http_client import get_client
+from .broadcaster import MultiBotBroadcaster
+from .broadcast_journal import BroadcastJournal, SENT, FAILED
+from .cache_manifest import CacheManifest
+from .file_io import read_bytes, write_bytes, remove_file, run_io
+from .cache_policy import CachePolicy, FetchResult
+from .circuit_breaker import breakers, STATE_FILE as BREAKER_STATE_FILE
+from .quota import QuotaExceededError, scheduled_calls, STATE_FILE as QUOTA_STATE_FILE
+from .almanac_store import STORE_FILE as ALMANAC_STORE_FILE
 
 __plugin_meta__ = PluginMetadata(
     name="XiSoul 新闻图片",
@@ -69,6 +81,29 @@ SHWGIJ_IMAGE_QUALITY = getattr(config, "shwgij_image_quality", 6)
 SHWGIJ_CRON_EXPRESSION = getattr(config, "shwgij_cron_expression", "0 8 * * *")
 SHWGIJ_SEND_GROUPS = getattr(config, "shwgij_send_groups", "")
 SHWGIJ_CRON_ENABLE = getattr(config, "shwgij_cron_enable", 1)
+# 定时任务获取新闻图片失败时，最晚重试到几点（按熔断器的退避时间重试）
+SHWGIJ_RETRY_END_HOUR = int(getattr(config, "shwgij_retry_end_hour", 18))
+
+# 只有启用定时任务时才加载apscheduler
+if SHWGIJ_CRON_ENABLE:
+    require("nonebot_plugin_apscheduler")
+    from nonebot_plugin_apscheduler import scheduler
+
+# 预取配置：在定时任务前提前获取新闻图片并写入缓存
+SHWGIJ_PREFETCH_ENABLE = getattr(config, "shwgij_prefetch_enable", 1)
+# 提前多少分钟开始预取
+SHWGIJ_PREFETCH_MINUTES = int(getattr(config, "shwgij_prefetch_minutes", 10))
+# 预取失败时的轮询间隔（秒）
+SHWGIJ_PREFETCH_INTERVAL = int(getattr(config, "shwgij_prefetch_interval", 60))
+# 单次预取最长轮询时间（分钟）
+SHWGIJ_PREFETCH_MAX_MINUTES = int(getattr(config, "shwgij_prefetch_max_minutes", 120))
+
+# 群发配置：每个bot的最大并发数、初始/最小/最大发送间隔（秒）、单次发送超时（秒）
+SHWGIJ_BROADCAST_CONCURRENCY = int(getattr(config, "shwgij_broadcast_concurrency", 4))
+SHWGIJ_BROADCAST_INTERVAL = float(getattr(config, "shwgij_broadcast_interval", 1.0))
+SHWGIJ_BROADCAST_MIN_INTERVAL = float(getattr(config, "shwgij_broadcast_min_interval", 0.2))
+SHWGIJ_BROADCAST_MAX_INTERVAL = float(getattr(config, "shwgij_broadcast_max_interval", 10.0))
+SHWGIJ_BROADCAST_TIMEOUT = float(getattr(config, "shwgij_broadcast_timeout", 20))
 
 # 新增：日志级别控制配置
 SHWGIJ_LOG_LEVEL = getattr(config, "shwgij_log_level", "INFO")  # 可选：DEBUG, INFO, WARNING, ERROR
@@ -77,15 +112,60 @@ SHWGIJ_IMAGE_DELETE_DELAY = getattr(config, "shwgij_image_delete_delay", 120)
 # 新增：缓存文件保留天数配置
 SHWGIJ_CACHE_EXPIRE_DAYS = getattr(config, "shwgij_cache_expire_days", 7)
 
+# 解析JSON格式的配置项（环境变量中的JSON会被自动解析为dict，这里兼容字符串形式）
+def parse_json_config(value) -> dict:
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str) and value.strip():
+        try:
+            parsed = json.loads(value)
+            if isinstance(parsed, dict):
+                return parsed
+        except json.JSONDecodeError:
+            pass
+        logger.warning(f"无法解析JSON配置: {value}")
+    return {}
+
+# 新闻图片版式变体：{"变体名": {要覆盖的版式参数}}，例如 {"narrow": {"width": 600, "news_count": 15}}
+SHWGIJ_LAYOUTS = parse_json_config(getattr(config, "shwgij_layouts", {}))
+# 各群使用的版式变体：{"群号": "变体名"}，未配置的群使用默认版式
+SHWGIJ_GROUP_LAYOUTS = {str(k): v for k, v in parse_json_config(getattr(config, "shwgij_group_layouts", {})).items()}
+
 # 缓存上次发送时间，避免频繁调用API
 last_send_time = None
-# 缓存新闻图片，避免频繁调用API
+# 缓存新闻图片，避免频繁调用API（默认版式）
 cached_image_data = None
 cached_image_date = None
+# 内存中的新闻图片，缓存键（"日期:版式哈希"） -> 图片数据，包含所有版式变体
+cached_images = {}
+# 最近一次群发的报告
+last_broadcast_report = None
+# 新闻图片接口的缓存策略：旧图片先返回、后台刷新，接口失败后一段时间内不再请求
+news_policy = CachePolicy("newspic")
+# 新闻图片接口
+NEWS_API_URL = "https://api.shwgij.com/api/today/newspic"
 # 缓存文件目录
 CACHE_DIR = os.path.join(os.path.dirname(__file__), "cache")
 # 临时文件路径（用于多群发送）
 TEMP_IMAGE_FILE = os.path.join(CACHE_DIR, "temp_news_image.jpg")
+# 群发日志文件，记录每次群发各群的投递状态
+JOURNAL_FILE = os.path.join(CACHE_DIR, "broadcast_journal.db")
+broadcast_journal = BroadcastJournal(JOURNAL_FILE)
+# 群发过程中每隔该秒数把各群的投递结果批量写入群发日志（重启时最多重发这段时间内投递的群）
+JOURNAL_FLUSH_INTERVAL = 1.0
+# 缓存清单，索引缓存目录中的文件，查找和清理缓存时不再遍历目录
+cache_manifest = CacheManifest(
+    CACHE_DIR, skip=[JOURNAL_FILE, BREAKER_STATE_FILE, QUOTA_STATE_FILE, ALMANAC_STORE_FILE]
+)
+def ensure_cache_dir():
+    """创建缓存目录，在文件读写线程中调用"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+# 同一时间只允许一个群发流程读写日志，避免定时任务与重启补发重复发送；在事件循环中首次使用时创建
+_broadcast_lock: Optional[asyncio.Lock] = None
+# 正在执行的补发任务；执行期间又有bot连接时，任务结束前再检查一遍
+_resume_task: Optional[asyncio.Task] = None
+_resume_again = False
 # 图片删除延时（秒） - 使用配置值
 IMAGE_DELETE_DELAY = SHWGIJ_IMAGE_DELETE_DELAY
 
@@ -140,32 +220,27 @@ async def clear_news_cache(clear_files=False):
     # 清空内存缓存
     cached_image_data = None
     cached_image_date = None
+    cached_images.clear()
     logger.info("已清空新闻图片内存缓存")
     
     # 如果需要同时清空缓存文件
     if clear_files:
         try:
-            if not os.path.exists(CACHE_DIR):
-                logger.info("缓存目录不存在")
-                return
-            
-            # 遍历并删除所有新闻图片缓存文件
+            # 按清单删除所有新闻图片缓存文件（包括旧版按日期命名的文件）
             files_removed = 0
             total_size_freed = 0
             
-            for filename in os.listdir(CACHE_DIR):
-                # 只删除新闻图片缓存文件（根据文件名模式判断）
-                if filename.startswith("news_") or filename.startswith("news_image_") and filename.endswith(".jpg"):
-                    file_path = os.path.join(CACHE_DIR, filename)
-                    if os.path.isfile(file_path):
-                        try:
-                            file_size = os.path.getsize(file_path)
-                            os.remove(file_path)
-                            files_removed += 1
-                            total_size_freed += file_size
-                            log_debug(f"已删除缓存文件: {filename}, 大小: {file_size/1024:.2f}KB")
-                        except Exception as e:
-                            logger.warning(f"删除缓存文件 {filename} 失败: {str(e)}")
+            for filename in cache_manifest.files("blob") + cache_manifest.files("news"):
+                file_path = cache_manifest.path(filename)
+                try:
+                    file_size = cache_manifest.get(filename)["size"]
+                    if await remove_file(file_path):
+                        files_removed += 1
+                        total_size_freed += file_size
+                        log_debug(f"已删除缓存文件: {filename}, 大小: {file_size/1024:.2f}KB")
+                    cache_manifest.remove(filename)
+                except Exception as e:
+                    logger.warning(f"删除缓存文件 {filename} 失败: {str(e)}")
             
             if files_removed > 0:
                 logger.info(f"已删除 {files_removed} 个缓存文件，释放 {total_size_freed/1024:.2f}KB 空间")
@@ -174,46 +249,98 @@ async def clear_news_cache(clear_files=False):
         except Exception as e:
             logger.error(f"清理缓存文件时发生错误: {str(e)}")
 
-# 获取当天的缓存文件路径
-def get_today_cache_file():
-    """获取当天的缓存文件路径"""
-    today = datetime.now().strftime("%Y%m%d")
-    return os.path.join(CACHE_DIR, f"news_{today}.jpg")
+# 版式参数的哈希，作为缓存键的一部分
+def get_layout_hash(params):
+    """计算版式参数的哈希，任意参数变化都会得到不同的缓存键"""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
 
-# 查找最新的缓存文件
-def find_latest_cache_file():
-    """查找最新的缓存文件"""
-    if not os.path.exists(CACHE_DIR):
+# 新闻图片的缓存键
+def get_cache_key(params, date_str=None):
+    """缓存键由日期和版式参数哈希组成，例如 20240101:1a2b3c4d5e6f7a8b"""
+    date_str = date_str or datetime.now().strftime("%Y%m%d")
+    return f"{date_str}:{get_layout_hash(params)}"
+
+# 群聊使用的版式变体
+def get_group_layout(group_id):
+    """返回群聊配置的版式变体名，未配置时返回None（默认版式）"""
+    if group_id is None:
         return None
+    return SHWGIJ_GROUP_LAYOUTS.get(str(group_id))
+
+# 群聊列表中用到的版式变体
+def get_group_layouts(groups):
+    """返回这些群配置的所有版式变体名（不含默认版式）"""
+    return list(dict.fromkeys(
+        layout for layout in (get_group_layout(group_id) for group_id in groups) if layout is not None
+    ))
+
+# 准备每个群要发送的图片
+async def get_group_images(groups, default_image, cached_only=False):
+    """为配置了版式变体的群准备对应的图片，变体并行获取，获取失败时使用默认版式的图片
     
-    # 获取所有缓存文件
-    files = []
-    for filename in os.listdir(CACHE_DIR):
-        if filename.startswith("news_") and filename.endswith(".jpg"):
-            file_path = os.path.join(CACHE_DIR, filename)
-            if os.path.isfile(file_path):
-                files.append((file_path, os.path.getmtime(file_path)))
+    Args:
+        cached_only: 只从缓存中读取变体，不调用API（用于重启后补发）
     
-    # 按修改时间排序，取最新的文件
-    if files:
-        files.sort(key=lambda x: x[1], reverse=True)
-        return files[0][0]
+    Returns:
+        {群号: 图片数据}，只包含使用版式变体的群
+    """
+    layouts = get_group_layouts(groups)
+    if not layouts:
+        return {}
+    if cached_only:
+        results = await asyncio.gather(*(load_cached_news_image(layout) for layout in layouts))
+        images = {layout: data for layout, data in zip(layouts, results) if data}
+    else:
+        images = await get_news_images(layouts)
     
-    return None
+    group_images = {}
+    for group_id in groups:
+        layout = get_group_layout(group_id)
+        if layout is None:
+            continue
+        if layout in images:
+            group_images[group_id] = images[layout]
+        else:
+            logger.warning(f"群聊 {group_id} 的版式 {layout} 不可用，使用默认版式")
+    return group_images
+
+# 获取当天的缓存文件路径
+async def get_today_cache_file(layout=None):
+    """获取当天指定版式的缓存文件路径，没有缓存时返回None"""
+    return await cache_manifest.resolve(get_cache_key(get_layout_params(layout)))
+
+# 查找最新的缓存文件
+async def find_latest_cache_file(params=None):
+    """查找最新的缓存文件，优先使用相同版式的缓存，其次是其他版式和旧版按日期命名的缓存"""
+    keys = []
+    if params is not None:
+        keys.append(cache_manifest.latest_ref(f":{get_layout_hash(params)}"))
+    keys.append(cache_manifest.latest_ref())
+    for key in keys:
+        if key:
+            path = await cache_manifest.resolve(key)
+            if path:
+                return path
+    return await cache_manifest.latest("news")
 
 # 保存图片到缓存
-async def save_image_to_cache(image_data):
-    """保存图片到缓存"""
+async def save_image_to_cache(image_data, params=None):
+    """按内容哈希保存图片，并让当天该版式的缓存键指向它，内容相同的图片只保存一份"""
     try:
-        # 确保缓存目录存在
-        os.makedirs(CACHE_DIR, exist_ok=True)
+        params = params if params is not None else get_layout_params()
+        blob_name = f"blob_{hashlib.sha256(image_data).hexdigest()[:40]}.jpg"
+        blob_path = cache_manifest.path(blob_name)
         
-        # 保存当天的缓存文件
-        today_cache_file = get_today_cache_file()
-        with open(today_cache_file, "wb") as f:
-            f.write(image_data)
+        if cache_manifest.get(blob_name) and await run_io(os.path.isfile, blob_path):
+            log_debug(f"缓存中已有相同内容的图片: {blob_name}")
+        else:
+            # 目录不存在时自动创建
+            await write_bytes(blob_path, image_data)
+            cache_manifest.add(blob_name, len(image_data))
         
-        log_debug(f"已保存新闻图片到缓存: {today_cache_file}")
+        cache_key = get_cache_key(params)
+        cache_manifest.set_ref(cache_key, blob_name, cache_key.split(":")[0], params)
+        log_debug(f"已保存新闻图片到缓存: {cache_key} -> {blob_name}")
         
         # 清理过期缓存
         await cleanup_cache_files()
@@ -224,11 +351,8 @@ async def save_image_to_cache(image_data):
 async def save_temp_image(image_data):
     """保存临时图片文件"""
     try:
-        # 确保缓存目录存在
-        os.makedirs(CACHE_DIR, exist_ok=True)
-        
-        with open(TEMP_IMAGE_FILE, "wb") as f:
-            f.write(image_data)
+        await write_bytes(TEMP_IMAGE_FILE, image_data)
+        cache_manifest.add(os.path.basename(TEMP_IMAGE_FILE), len(image_data))
         
         log_debug(f"已保存临时图片: {TEMP_IMAGE_FILE}")
         return TEMP_IMAGE_FILE
@@ -240,35 +364,28 @@ async def save_temp_image(image_data):
 async def cleanup_cache_files():
     """清理过期的缓存文件"""
     try:
-        if not os.path.exists(CACHE_DIR):
-            return
-        
-        current_time = time.time()
         expire_seconds = SHWGIJ_CACHE_EXPIRE_DAYS * 24 * 60 * 60  # 转换为秒
         files_removed = 0
         total_size_freed = 0
         
-        # 遍历缓存目录中的所有文件
-        for filename in os.listdir(CACHE_DIR):
-            file_path = os.path.join(CACHE_DIR, filename)
-            # 跳过子目录
-            if not os.path.isfile(file_path):
-                continue
-            
-            # 获取文件的修改时间
-            file_modified_time = os.path.getmtime(file_path)
-            # 检查文件是否过期
-            if current_time - file_modified_time > expire_seconds:
-                try:
-                    # 记录文件大小
-                    file_size = os.path.getsize(file_path)
-                    # 删除文件
-                    os.remove(file_path)
+        cutoff = time.time() - expire_seconds
+        # 先移除过期的缓存键，再清理不再被引用的图片和其他过期文件
+        for cache_key in cache_manifest.expired_refs(cutoff):
+            cache_manifest.remove_ref(cache_key)
+        expired_files = [name for name in cache_manifest.expired(cutoff) if not name.startswith("blob_")]
+        for filename in cache_manifest.unreferenced("blob") + expired_files:
+            file_path = cache_manifest.path(filename)
+            try:
+                # 记录文件大小
+                file_size = cache_manifest.get(filename)["size"]
+                # 删除文件
+                if await remove_file(file_path):
                     files_removed += 1
                     total_size_freed += file_size
                     log_debug(f"已删除过期缓存文件: {filename}, 大小: {file_size/1024:.2f}KB")
-                except Exception as e:
-                    logger.warning(f"删除缓存文件 {filename} 失败: {str(e)}")
+                cache_manifest.remove(filename)
+            except Exception as e:
+                logger.warning(f"删除缓存文件 {filename} 失败: {str(e)}")
         
         if files_removed > 0:
             logger.info(f"缓存清理完成: 删除了 {files_removed} 个过期文件，释放空间 {total_size_freed/1024/1024:.2f}MB")
@@ -277,51 +394,14 @@ async def cleanup_cache_files():
     except Exception as e:
         logger.error(f"执行缓存清理任务失败: {str(e)}")
 
-# 获取新闻图片的核心函数
-async def get_news_image():
-    global cached_image_data, cached_image_date
-    current_date = datetime.now().date()
-    today_cache_file = get_today_cache_file()
-    
-    # 检查内存缓存
-    if cached_image_data and cached_image_date == current_date:
-        log_debug("使用内存缓存的新闻图片")
-        return cached_image_data
-    else:
-        # 缓存过期或不存在，重置内存缓存状态
-        cached_image_data = None
-        cached_image_date = None
-    
-    # 检查本地缓存文件
-    if os.path.exists(today_cache_file):
-        try:
-            # 获取文件的修改日期
-            file_modify_time = datetime.fromtimestamp(os.path.getmtime(today_cache_file)).date()
-            if file_modify_time == current_date:
-                # 如果是今天的缓存，读取文件
-                with open(today_cache_file, "rb") as f:
-                    cached_image_data = f.read()
-                    cached_image_date = current_date
-                    log_debug("从本地缓存文件加载新闻图片")
-                    return cached_image_data
-            else:
-                # 如果不是今天的缓存，删除文件
-                os.remove(today_cache_file)
-                logger.info(f"删除过期缓存文件: {today_cache_file}")
-        except Exception as e:
-            logger.warning(f"读取本地缓存失败: {str(e)}")
-    
-    # 获取API密钥
-    api_key = SHWGIJ_API_KEY
-    
-    if not api_key:
-        logger.error("新闻图片API密钥未配置")
-        return None
+# 新闻图片的版式参数（不含API密钥）
+def get_layout_params(layout=None):
+    """获取生成新闻图片使用的版式参数
     
-    # 调用API获取新闻图片
-    url = "https://api.shwgij.com/api/today/newspic"
+    Args:
+        layout: 版式变体名（SHWGIJ_LAYOUTS中的键），None表示默认版式
+    """
     params = {
-        "key": api_key,
         "width": SHWGIJ_WIDTH,
         "top_margin": SHWGIJ_TOP_MARGIN,
         "bottom_margin": SHWGIJ_BOTTOM_MARGIN,
@@ -358,129 +438,213 @@ async def get_news_image():
         "small_text_font_index": SHWGIJ_SMALL_TEXT_FONT_INDEX,
         "image_quality": SHWGIJ_IMAGE_QUALITY
     }
+    if layout is not None:
+        overrides = SHWGIJ_LAYOUTS.get(layout)
+        if overrides is None:
+            logger.warning(f"未配置的新闻图片版式: {layout}，使用默认版式")
+        else:
+            params.update(overrides)
+    return params
+
+# 获取新闻图片的核心函数
+async def get_news_image(layout=None):
+    """获取新闻图片，接口不可用时可能返回之前的图片，需要区分时使用get_news_image_result
+    
+    Args:
+        layout: 版式变体名，None表示默认版式
+    """
+    result = await get_news_image_result(layout)
+    return result.value
+
+async def get_news_image_result(layout=None, allow_stale=True) -> FetchResult:
+    """获取新闻图片及其元数据（是否为旧图片、来源、获取时间）
+    
+    当天的缓存直接返回；没有时请求接口，同一天同一版式的并发请求合并为一次。
+    
+    Args:
+        allow_stale: 是否允许返回之前的图片（接口失败或较慢时），定时群发只发送当天的图片
+    """
+    cached = await load_cached_news_image(layout)
+    if cached:
+        return FetchResult(cached, source="cache")
+    
+    layout_params = get_layout_params(layout)
+    cache_key = get_cache_key(layout_params)
+    return await news_policy.get(
+        cache_key,
+        lambda: fetch_news_image_from_api(layout),
+        (lambda: load_stale_news_image(layout_params)) if allow_stale else None,
+    )
+
+# 之前的新闻图片
+async def load_stale_news_image(layout_params):
+    """返回最近一次缓存的新闻图片（优先相同版式），作为接口不可用时的旧内容"""
+    latest_cache_file = await find_latest_cache_file(layout_params)
+    if not latest_cache_file:
+        return None
+    try:
+        image_data = await read_bytes(latest_cache_file)
+    except Exception as e:
+        logger.warning(f"读取缓存图片失败: {str(e)}")
+        return None
+    entry = cache_manifest.get(os.path.basename(latest_cache_file))
+    return FetchResult(image_data, stale=True, source="stale", fetched_at=entry["mtime"] if entry else None)
+
+# 并行获取多个版式变体
+async def get_news_images(layouts):
+    """并行获取多个版式当天的新闻图片，返回 {版式: 图片数据}，获取失败的版式不包含在结果中"""
+    layouts = list(dict.fromkeys(layouts))
+    results = await asyncio.gather(
+        *(get_news_image_result(layout, allow_stale=False) for layout in layouts), return_exceptions=True
+    )
+    images = {}
+    for layout, result in zip(layouts, results):
+        if isinstance(result, FetchResult) and result.value:
+            images[layout] = result.value
+        else:
+            error = result.error if isinstance(result, FetchResult) else result
+            logger.warning(f"获取版式 {layout or '默认'} 的新闻图片失败: {error}")
+    return images
+
+# 只从缓存中获取新闻图片
+async def load_cached_news_image(layout=None):
+    """从内存或磁盘缓存中获取当天指定版式的新闻图片，不调用API，没有缓存时返回None"""
+    cache_key = get_cache_key(get_layout_params(layout))
+    
+    # 检查内存缓存
+    if cache_key in cached_images:
+        log_debug(f"使用内存缓存的新闻图片: {cache_key}")
+        return cached_images[cache_key]
     
-    logger.info("正在获取新闻图片...")
+    # 检查本地缓存文件
+    cache_file = await cache_manifest.resolve(cache_key)
+    if cache_file:
+        try:
+            image_data = await read_bytes(cache_file)
+            remember_news_image(layout, cache_key, image_data)
+            log_debug(f"从本地缓存文件加载新闻图片: {cache_key}")
+            return image_data
+        except Exception as e:
+            logger.warning(f"读取本地缓存失败: {str(e)}")
+    return None
+
+# 记录获取到的当天新闻图片
+def remember_news_image(layout, cache_key, image_data):
+    global cached_image_data, cached_image_date
+    today = cache_key.split(":")[0]
+    # 只保留当天的图片
+    for key in [key for key in cached_images if not key.startswith(today)]:
+        del cached_images[key]
+    cached_images[cache_key] = image_data
+    if layout is None:
+        cached_image_data = image_data
+        cached_image_date = datetime.now().date()
+
+async def fetch_news_image_from_api(layout=None):
+    """从接口获取当天的新闻图片并写入缓存，失败时抛出异常或返回None（由缓存策略决定是否使用旧图片）"""
+    layout_params = get_layout_params(layout)
+    cache_key = get_cache_key(layout_params)
+    
+    # 获取API密钥
+    api_key = SHWGIJ_API_KEY
+    
+    if not api_key:
+        logger.error("新闻图片API密钥未配置")
+        raise RuntimeError("新闻图片API密钥未配置")
+    
+    # 调用API获取新闻图片
+    url = NEWS_API_URL
+    params = {"key": api_key, **layout_params}
+    
+    logger.info(f"正在获取新闻图片（版式: {layout or '默认'}）...")
     
     # 修复API调用部分的异常处理结构
     try:
         # 执行API请求
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params, timeout=15)  # 增加超时时间
-            response.raise_for_status()
-            
-            # 检查响应内容类型
-            content_type = response.headers.get('content-type', '')
-            
-            # 判断响应是JSON还是直接的图片
-            if 'image' in content_type:
-                # 响应是直接的图片数据
-                logger.info("获取新闻图片成功")
-                # 缓存图片数据
-                cached_image_data = response.content
-                cached_image_date = current_date
-                # 保存到本地文件
-                await save_image_to_cache(cached_image_data)
-                return cached_image_data
-            elif 'application/json' in content_type:
-                # 响应是JSON格式
-                try:
-                    data = response.json()
-                    # 检查响应状态
-                    if data.get('code') == 200:
-                        if isinstance(data.get('data'), dict):
-                            # data是字典，可能包含image字段
-                            image_url = data.get('data', {}).get('image', '')
-                            if image_url:
-                                # 从URL获取图片
-                                image_response = await client.get(image_url, timeout=15)
-                                image_response.raise_for_status()
-                                logger.info("获取新闻图片成功")
-                                # 缓存图片数据
-                                cached_image_data = image_response.content
-                                cached_image_date = current_date
-                                # 保存到本地文件
-                                await save_image_to_cache(cached_image_data)
-                                return cached_image_data
-                        else:
-                            # data不是字典，可能直接包含图片URL
-                            data_content = str(data.get('data', ''))
-                            if data_content.startswith('http'):
-                                # 从URL获取图片
-                                image_response = await client.get(data_content, timeout=15)
-                                image_response.raise_for_status()
-                                logger.info("获取新闻图片成功")
-                                # 缓存图片数据
-                                cached_image_data = image_response.content
-                                cached_image_date = current_date
-                                # 保存到本地文件
-                                await save_image_to_cache(cached_image_data)
-                                return cached_image_data
+        # 使用插件共享的HTTP客户端，复用连接
+        client = get_client()
+        response = await client.get(url, params=params, timeout=15)  # 增加超时时间
+        response.raise_for_status()
+        
+        # 检查响应内容类型
+        content_type = response.headers.get('content-type', '')
+        
+        # 判断响应是JSON还是直接的图片
+        if 'image' in content_type:
+            # 响应是直接的图片数据
+            logger.info("获取新闻图片成功")
+            # 缓存图片数据并保存到本地文件
+            image_data = response.content
+            remember_news_image(layout, cache_key, image_data)
+            await save_image_to_cache(image_data, layout_params)
+            return image_data
+        elif 'application/json' in content_type:
+            # 响应是JSON格式
+            try:
+                data = response.json()
+                # 检查响应状态
+                if data.get('code') == 200:
+                    if isinstance(data.get('data'), dict):
+                        # data是字典，可能包含image字段
+                        image_url = data.get('data', {}).get('image', '')
+                        if image_url:
+                            # 从URL获取图片
+                            image_response = await client.get(image_url, timeout=15)
+                            image_response.raise_for_status()
+                            logger.info("获取新闻图片成功")
+                            # 缓存图片数据并保存到本地文件
+                            image_data = image_response.content
+                            remember_news_image(layout, cache_key, image_data)
+                            await save_image_to_cache(image_data, layout_params)
+                            return image_data
                     else:
-                        # API返回错误时的缓存使用逻辑
-                        error_msg = data.get('msg', '未知错误')
-                        logger.error(f"API返回错误: {error_msg}")
-                        # 尝试使用最新的缓存，但只使用当天的缓存
-                        latest_cache_file = find_latest_cache_file()
-                        if latest_cache_file:
-                            try:
-                                # 检查缓存文件是否为当天的
-                                file_modify_time = datetime.fromtimestamp(os.path.getmtime(latest_cache_file)).date()
-                                if file_modify_time == current_date:
-                                    logger.info("尝试使用当天的缓存图片")
-                                    with open(latest_cache_file, "rb") as f:
-                                        return f.read()
-                                else:
-                                    logger.warning("没有当天的缓存图片，不使用过期缓存")
-                            except Exception as e:
-                                logger.warning(f"读取缓存图片失败: {str(e)}")
-                except json.JSONDecodeError:
-                    logger.warning("JSON解析失败")
-            else:
-                # 其他类型响应，尝试作为图片处理
-                logger.warning(f"未知内容类型: {content_type}")
-                # 如果有内容，尝试作为图片返回
-                if response.content:
-                    # 缓存图片数据
-                    cached_image_data = response.content
-                    cached_image_date = current_date
-                    # 保存到本地文件
-                    await save_image_to_cache(cached_image_data)
-                    return cached_image_data
+                        # data不是字典，可能直接包含图片URL
+                        data_content = str(data.get('data', ''))
+                        if data_content.startswith('http'):
+                            # 从URL获取图片
+                            image_response = await client.get(data_content, timeout=15)
+                            image_response.raise_for_status()
+                            logger.info("获取新闻图片成功")
+                            # 缓存图片数据并保存到本地文件
+                            image_data = image_response.content
+                            remember_news_image(layout, cache_key, image_data)
+                            await save_image_to_cache(image_data, layout_params)
+                            return image_data
+                else:
+                    # API返回错误，是否使用旧图片由缓存策略决定
+                    error_msg = data.get('msg', '未知错误')
+                    logger.error(f"API返回错误: {error_msg}")
+                    raise RuntimeError(f"API返回错误: {error_msg}")
+            except json.JSONDecodeError:
+                logger.warning("JSON解析失败")
+                raise RuntimeError("JSON解析失败")
+        else:
+            # 其他类型响应，尝试作为图片处理
+            logger.warning(f"未知内容类型: {content_type}")
+            # 如果有内容，尝试作为图片返回
+            if response.content:
+                # 缓存图片数据并保存到本地文件
+                image_data = response.content
+                remember_news_image(layout, cache_key, image_data)
+                await save_image_to_cache(image_data, layout_params)
+                return image_data
+    except QuotaExceededError as e:
+        # 接口额度不足，是否使用旧图片由缓存策略决定
+        logger.info(f"新闻图片接口额度不足: {str(e)}")
+        raise
     except httpx.HTTPStatusError as e:
         logger.error(f"HTTP请求错误: {str(e)}")
-        # 尝试使用最新的缓存
-        latest_cache_file = find_latest_cache_file()
-        if latest_cache_file:
-            try:
-                logger.info("HTTP错误，尝试使用缓存的图片")
-                with open(latest_cache_file, "rb") as f:
-                    return f.read()
-            except Exception as cache_e:
-                logger.warning(f"读取缓存图片失败: {str(cache_e)}")
+        raise
     except httpx.RequestError as e:
         logger.error(f"网络请求异常: {str(e)}")
-        # 尝试使用最新的缓存
-        latest_cache_file = find_latest_cache_file()
-        if latest_cache_file:
-            try:
-                logger.info("网络错误，尝试使用缓存的图片")
-                with open(latest_cache_file, "rb") as f:
-                    return f.read()
-            except Exception as cache_e:
-                logger.warning(f"读取缓存图片失败: {str(cache_e)}")
+        raise
+    except RuntimeError:
+        raise
     except Exception as e:
         logger.error(f"获取新闻图片失败: {str(e)}", exc_info=True)
-        
-        # API调用失败时，查找最新的缓存文件（不一定是今天的）
-        latest_cache_file = find_latest_cache_file()
-        if latest_cache_file:
-            try:
-                with open(latest_cache_file, "rb") as f:
-                    logger.info(f"使用最近的缓存图片: {latest_cache_file}")
-                    return f.read()
-            except Exception as cache_e:
-                logger.warning(f"读取最新缓存图片失败: {str(cache_e)}")
+        raise
     
+    # 接口返回了JSON但没有图片地址等情况
     return None
 
 # 延时删除图片文件
@@ -489,14 +653,19 @@ async def schedule_image_deletion(file_path):
     try:
         logger.info(f"将在{IMAGE_DELETE_DELAY}秒后删除临时图片: {file_path}")
         await asyncio.sleep(IMAGE_DELETE_DELAY)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        if await remove_file(file_path):
+            cache_manifest.remove(os.path.basename(file_path))
             logger.info(f"已删除临时图片: {file_path}")
     except Exception as e:
         logger.warning(f"删除临时图片失败: {str(e)}")
 
 # 发送新闻图片到多个群聊
 async def send_news_image_to_groups():
+    # 定时任务可以使用为其预留的接口额度
+    with scheduled_calls():
+        await _send_news_image_to_groups()
+
+async def _send_news_image_to_groups():
     logger.info("===== 新闻图片定时任务开始执行 =====")
     try:
         # 检查是否需要发送（仅在工作日发送）
@@ -510,41 +679,34 @@ async def send_news_image_to_groups():
         #     return
 
         # 确保缓存目录存在
-        os.makedirs(CACHE_DIR, exist_ok=True)
+        await run_io(ensure_cache_dir)
         logger.info(f"开始获取新闻图片")
 
-        # 定义最大重试次数（从8点到18点，每5分钟重试一次，最多约120次）
-        max_retries = 120
-        retry_count = 0
+        # 获取失败时按熔断器的退避时间重试，熔断期间不请求接口，最晚重试到SHWGIJ_RETRY_END_HOUR点
+        deadline = today.replace(hour=SHWGIJ_RETRY_END_HOUR, minute=0, second=0, microsecond=0)
+        attempt = 0
         image_data = None
         
-        # 重试获取图片直到成功或达到最大重试次数
-        while retry_count < max_retries:
-            # 获取新闻图片
-            image_data = await get_news_image()
+        while True:
+            attempt += 1
+            # 获取当天的新闻图片，定时群发不发送之前的旧图片
+            result = await get_news_image_result(allow_stale=False)
+            image_data = result.value
             
             if image_data:
-                # 成功获取到图片，退出循环
-                logger.info(f"获取新闻图片成功，共尝试{retry_count + 1}次")
+                logger.info(f"获取新闻图片成功，共尝试{attempt}次")
                 break
             
-            # 获取失败，等待5分钟后重试
-            retry_count += 1
-            logger.warning(f"获取新闻图片失败，将在5分钟后进行第{retry_count + 1}次重试")
-            
-            # 等待5分钟
-            await asyncio.sleep(300)  # 300秒 = 5分钟
-            
-            # 检查是否超过当天重试时间（例如18:00）
-            current_hour = datetime.now().hour
-            if current_hour >= 18:
-                logger.warning(f"已超过18:00，今日不再重试获取新闻图片")
+            delay = get_news_retry_delay()
+            if datetime.now().timestamp() + delay >= deadline.timestamp():
+                logger.error(
+                    f"获取新闻图片失败（{result.error}），{SHWGIJ_RETRY_END_HOUR}:00前不再重试，"
+                    f"今日未能获取到新闻图片，取消发送（共尝试{attempt}次）"
+                )
                 return
-        
-        # 检查是否获取到图片
-        if not image_data:
-            logger.error(f"达到最大重试次数({max_retries})，今日未能获取到新闻图片，取消发送")
-            return
+            
+            logger.warning(f"获取新闻图片失败（{result.error}），将在{delay:.0f}秒后进行第{attempt + 1}次尝试")
+            await asyncio.sleep(delay)
 
         # 解析配置中的群聊ID
         groups = parse_group_ids(SHWGIJ_SEND_GROUPS)
@@ -553,7 +715,11 @@ async def send_news_image_to_groups():
             return
 
         logger.info(f"准备发送新闻图片到 {len(groups)} 个群聊")
-        success_count = await send_image_to_groups_with_retry(image_data, groups)
+        image_path = await save_broadcast_image(image_data)
+        group_images = await get_group_images(groups, image_data)
+        success_count = await broadcast_news_image(
+            image_data, groups, get_broadcast_run_id(), image_path, group_images=group_images
+        )
         logger.info(f"新闻图片发送完成，成功发送到 {success_count} 个群聊")
     except Exception as e:
         logger.error(f"发送新闻图片时发生错误: {str(e)}")
@@ -562,65 +728,206 @@ async def send_news_image_to_groups():
         await clear_news_cache()
         logger.info("===== 新闻图片定时任务执行结束 =====")
 
-# 发送图片到多个群聊，并添加重试机制
-async def send_image_to_groups_with_retry(image_data, groups, max_retries=3):
-    """发送图片到多个群聊，并添加重试机制"""
+# 定时任务的重试间隔
+def get_news_retry_delay():
+    """下一次尝试前等待的秒数：熔断器的退避时间，且不早于该版式负缓存失效的时间"""
+    breaker = breakers.for_url(NEWS_API_URL)
+    cache_key = get_cache_key(get_layout_params())
+    return max(breaker.next_delay(), news_policy.negative.remaining(cache_key), 1.0)
+
+# 当天群发的日志ID
+def get_broadcast_run_id():
+    """获取当天新闻群发在群发日志中的ID"""
+    return f"news:{datetime.now().strftime('%Y%m%d')}"
+
+# 保存群发使用的图片，供重启后补发
+async def save_broadcast_image(image_data):
+    """返回群发图片在磁盘上的路径，优先复用当天的缓存文件"""
+    today_cache_file = await get_today_cache_file()
+    if today_cache_file:
+        return today_cache_file
+    
+    # 图片来自旧缓存等情况，单独保存一份，避免覆盖当天的缓存文件
     try:
-        # 获取bot实例
-        bot = get_bot()
+        image_path = os.path.join(CACHE_DIR, f"broadcast_{datetime.now().strftime('%Y%m%d')}.jpg")
+        await write_bytes(image_path, image_data)
+        cache_manifest.add(os.path.basename(image_path), len(image_data))
+        return image_path
+    except Exception as e:
+        logger.warning(f"保存群发图片失败，重启后将无法补发: {str(e)}")
+        return None
+
+def get_broadcast_lock() -> asyncio.Lock:
+    """在运行中的事件循环里创建群发锁（Python 3.8/3.9的asyncio.Lock会绑定创建时的事件循环）"""
+    global _broadcast_lock
+    if _broadcast_lock is None:
+        _broadcast_lock = asyncio.Lock()
+    return _broadcast_lock
+
+# 按群发日志发送新闻图片
+async def broadcast_news_image(image_data, groups, run_id, image_path, group_images=None):
+    """按群发日志发送新闻图片，已投递过的群不会重复发送
+    
+    Args:
+        group_images: {群号: 图片数据}，使用版式变体的群，其余群发送image_data
+    
+    Returns:
+        本次成功发送的群数
+    """
+    async with get_broadcast_lock():
+        await run_io(broadcast_journal.start_run, run_id, image_path, groups)
+        configured = set(groups)
+        pending = [gid for gid in await run_io(broadcast_journal.pending_groups, run_id) if gid in configured]
         
-        logger.info(f"准备发送新闻图片到 {len(groups)} 个群聊")
-        success_count = 0
+        if not pending:
+            logger.info(f"群发 {run_id} 的所有群聊均已投递，无需发送")
+            await run_io(broadcast_journal.finish_run, run_id)
+            return 0
         
-        # 发送图片到每个群聊，添加重试机制
-        for group_id in groups:
-            retries = 0
-            sent = False
+        if len(pending) < len(configured):
+            logger.info(f"群发日志显示已有 {len(configured) - len(pending)} 个群聊投递完成，只发送剩余 {len(pending)} 个群聊")
+        
+        success_count = await send_image_to_groups_with_retry(
+            image_data, pending, run_id=run_id, group_images=group_images
+        )
+        
+        # 所有群都有了最终结果才结束本次群发；未能发送的群（例如bot未连接）留待补发
+        remaining = [gid for gid in await run_io(broadcast_journal.pending_groups, run_id) if gid in configured]
+        if remaining:
+            logger.warning(f"群发 {run_id} 还有 {len(remaining)} 个群聊未投递，将在bot重新连接后补发")
+        else:
+            await run_io(broadcast_journal.finish_run, run_id)
+            logger.info(f"群发 {run_id} 已结束: {await run_io(broadcast_journal.counts, run_id)}")
+        return success_count
+
+# 补发未完成的群发（重启前中断的，或发送时没有bot连接而未投递的）
+@driver.on_bot_connect
+async def resume_unfinished_broadcasts():
+    """每次有bot连接后检查群发日志，使用缓存的图片补发当天未完成的群发，不会再次调用API"""
+    global _resume_task, _resume_again
+    if not SHWGIJ_CRON_ENABLE:
+        return
+    if _resume_task is not None and not _resume_task.done():
+        _resume_again = True
+        return
+    # 放到后台执行，不阻塞bot连接
+    _resume_task = asyncio.create_task(_resume_until_settled())
+
+async def _resume_until_settled():
+    global _resume_again
+    _resume_again = True
+    while _resume_again:
+        _resume_again = False
+        await _resume_unfinished_broadcasts()
+
+async def _resume_unfinished_broadcasts():
+    try:
+        await run_io(broadcast_journal.prune)
+        today_run_id = get_broadcast_run_id()
+        
+        for run_id, image_path in await run_io(broadcast_journal.unfinished_runs):
+            if run_id != today_run_id:
+                # 过期的新闻不再补发
+                logger.info(f"群发 {run_id} 已过期，不再补发")
+                await run_io(broadcast_journal.finish_run, run_id)
+                continue
+            
+            if not image_path or not await run_io(os.path.exists, image_path):
+                logger.warning(f"群发 {run_id} 的图片文件不存在，无法补发")
+                continue
             
-            # 确保group_id是整数类型，直接跳过类型检查外的处理
+            image_data = await read_bytes(image_path)
+            
+            groups = parse_group_ids(SHWGIJ_SEND_GROUPS)
+            logger.info(f"发现未完成的群发 {run_id}，开始补发")
+            group_images = await get_group_images(groups, image_data, cached_only=True)
+            success_count = await broadcast_news_image(image_data, groups, run_id, image_path, group_images=group_images)
+            logger.info(f"群发 {run_id} 补发完成，成功发送到 {success_count} 个群聊")
+    except Exception as e:
+        logger.error(f"补发未完成的群发时出错: {str(e)}")
+
+# 发送图片到多个群聊，并添加重试机制
+async def get_group_membership(bots):
+    """并行获取每个bot所在的群，获取失败的bot记为None（只作为无人认领的群的候补）"""
+    async def fetch(bot_id, bot):
+        try:
+            group_list = await bot.get_group_list()
+            return bot_id, {int(group["group_id"]) for group in group_list}
+        except Exception as e:
+            logger.warning(f"获取bot {bot_id} 的群列表失败: {str(e)}")
+            return bot_id, None
+    
+    results = await asyncio.gather(*(fetch(bot_id, bot) for bot_id, bot in bots.items()))
+    return dict(results)
+
+async def send_image_to_groups_with_retry(image_data, groups, max_retries=3, run_id=None, group_images=None):
+    """发送图片到多个群聊，按群成员关系分配给所有已连接的bot并行发送，
+    每个bot有界并发并根据限流情况自适应调整发送节奏，失败的群转交给同群的其他bot
+    
+    Args:
+        run_id: 群发日志ID，提供时每个群的发送结果都会写入群发日志
+        group_images: {群号: 图片数据}，使用版式变体的群，其余群发送image_data
+    """
+    global last_broadcast_report
+    group_images = group_images or {}
+    try:
+        # 获取所有已连接的OneBot V11 bot实例
+        bots = {bot_id: bot for bot_id, bot in get_bots().items() if isinstance(bot, Bot)}
+        if not bots:
+            logger.error("没有已连接的bot，无法发送新闻图片")
+            return 0
+        
+        # 确保group_id是整数类型
+        target_groups = []
+        for group_id in groups:
             try:
-                # 无论输入是什么，都尝试转换为整数
-                target_group_id = int(group_id)
+                target_groups.append(int(group_id))
             except (ValueError, TypeError):
                 logger.warning(f"无效的群聊ID: {group_id}")
-                continue
-            
-            while retries < max_retries and not sent:
-                try:
-                    logger.info(f"尝试发送新闻图片到群聊 {target_group_id} (第{retries+1}次尝试)")
-                    
-                    # 使用内存数据发送
-                    await asyncio.wait_for(
-                        bot.send_group_msg(
-                            group_id=target_group_id,  # 使用转换后的整数
-                            message=MessageSegment.image(image_data)
-                        ),
-                        timeout=20  # 增加超时时间到20秒
-                    )
-                    
-                    logger.info(f"已成功发送新闻图片到群聊: {target_group_id}")
-                    success_count += 1
-                    sent = True
-                    # 发送成功后，短暂延迟避免请求过于密集
-                    await asyncio.sleep(1)
-                except Exception as e:
-                    retries += 1
-                    error_msg = str(e)
-                    logger.warning(f"发送新闻图片到群聊 {target_group_id} 失败 (尝试 {retries}/{max_retries}): {error_msg}")
-                    
-                    # 检查是否是超时错误或retcode=1200
-                    is_timeout_error = 'timeout' in error_msg.lower() or '1200' in error_msg
-                    if is_timeout_error and retries < max_retries:
-                        logger.info(f"等待3秒后重试发送到群聊 {target_group_id}")
-                        await asyncio.sleep(3)  # 等待3秒后重试
-                    else:
-                        # 其他错误不重试
-                        break
         
-        if success_count == 0:
-            logger.error(f"新闻图片定时发送失败，所有 {len(groups)} 个群聊都发送失败")
+        membership = await get_group_membership(bots)
+        logger.info(f"准备通过 {len(bots)} 个bot发送新闻图片到 {len(target_groups)} 个群聊")
         
-        return success_count
+        async def send_to_group(bot, group_id):
+            # 使用内存数据发送，配置了版式变体的群发送对应的图片
+            image = group_images.get(group_id, image_data)
+            await bot.send_group_msg(group_id=group_id, message=MessageSegment.image(image))
+        
+        def record_result(group_id, error_msg):
+            # 只写入内存缓冲，由 flush_journal 定期在文件读写线程中批量写入
+            broadcast_journal.queue_mark(run_id, group_id, SENT if error_msg is None else FAILED, error_msg)
+        
+        async def flush_journal():
+            while True:
+                await asyncio.sleep(JOURNAL_FLUSH_INTERVAL)
+                await run_io(broadcast_journal.flush)
+        
+        broadcaster = MultiBotBroadcaster(
+            bots,
+            send_to_group,
+            on_result=record_result if run_id else None,
+            concurrency=SHWGIJ_BROADCAST_CONCURRENCY,
+            interval=SHWGIJ_BROADCAST_INTERVAL,
+            min_interval=SHWGIJ_BROADCAST_MIN_INTERVAL,
+            max_interval=SHWGIJ_BROADCAST_MAX_INTERVAL,
+            timeout=SHWGIJ_BROADCAST_TIMEOUT,
+            max_retries=max_retries,
+        )
+        flusher = asyncio.ensure_future(flush_journal()) if run_id else None
+        try:
+            report = await broadcaster.run(target_groups, membership)
+        finally:
+            if flusher is not None:
+                flusher.cancel()
+                await run_io(broadcast_journal.flush)
+        last_broadcast_report = report
+        
+        for group_id, error_msg in report.failed.items():
+            logger.warning(f"发送新闻图片到群聊 {group_id} 最终失败: {error_msg}")
+        if report.success_count == 0:
+            logger.error(f"新闻图片定时发送失败，所有 {len(target_groups)} 个群聊都发送失败")
+        
+        return report.success_count
     except Exception as e:
         logger.error(f"解析或发送群聊ID失败: {str(e)}")
         return 0
@@ -639,7 +946,67 @@ def parse_cron_expression(expr):
         }
     return {}
 
+# 计算提前指定分钟数的cron参数
+def shift_cron_params(cron_params, minutes):
+    """将cron参数提前指定分钟数，只支持分钟和小时为单个数字的表达式
+    
+    Returns:
+        提前后的cron参数，无法计算时返回None
+    """
+    minute, hour = cron_params.get("minute", ""), cron_params.get("hour", "")
+    if not (minute.isdigit() and hour.isdigit()):
+        return None
+    
+    total = int(hour) * 60 + int(minute) - minutes
+    if total < 0:
+        # 跨到前一天时，只有每天执行的表达式才能直接平移
+        if any(cron_params.get(field, "*") != "*" for field in ("day", "month", "day_of_week")):
+            return None
+        total += 24 * 60
+    
+    shifted = dict(cron_params)
+    shifted["hour"] = str(total // 60)
+    shifted["minute"] = str(total % 60)
+    return shifted
+
+# 预取今天的新闻图片
+async def prefetch_news_image():
+    """在定时发送前预取新闻图片，填充内存和磁盘缓存，API尚未就绪时轮询直到获取成功"""
+    # 预取属于定时任务，可以使用为其预留的接口额度
+    with scheduled_calls():
+        return await _prefetch_news_image()
+
+async def _prefetch_news_image():
+    logger.info("===== 新闻图片预取任务开始执行 =====")
+    deadline = time.monotonic() + SHWGIJ_PREFETCH_MAX_MINUTES * 60
+    attempt = 0
+    
+    while True:
+        attempt += 1
+        # 只有获取到今天的图片才算成功，之前的旧图片不算
+        result = await get_news_image_result(allow_stale=False)
+        if result.value:
+            logger.info(f"新闻图片预取成功，共尝试{attempt}次")
+            # 默认版式就绪后并行预取各群配置的版式变体
+            layouts = get_group_layouts(parse_group_ids(SHWGIJ_SEND_GROUPS))
+            if layouts:
+                variants = await get_news_images(layouts)
+                logger.info(f"新闻图片版式变体预取完成: {len(variants)}/{len(layouts)}")
+            return True
+        
+        if time.monotonic() + SHWGIJ_PREFETCH_INTERVAL > deadline:
+            logger.warning(f"新闻图片预取超时，共尝试{attempt}次，定时任务将自行获取")
+            return False
+        
+        log_debug(f"今日新闻图片尚不可用，{SHWGIJ_PREFETCH_INTERVAL}秒后重试预取")
+        await asyncio.sleep(SHWGIJ_PREFETCH_INTERVAL)
+
 # 注册定时任务
+@driver.on_startup
+async def load_cache_manifest():
+    """启动时在文件读写线程中加载缓存清单，必要时扫描目录重建"""
+    await run_io(cache_manifest.load)
+
 @driver.on_startup
 async def setup_scheduler():
     """启动定时任务"""
@@ -663,6 +1030,26 @@ async def setup_scheduler():
                 **cron_params  # 展开具体的时间参数
             )
             logger.info("新闻图片定时任务注册成功")
+            
+            # 添加预取任务，提前把图片放进缓存
+            if SHWGIJ_PREFETCH_ENABLE:
+                prefetch_params = shift_cron_params(cron_params, SHWGIJ_PREFETCH_MINUTES)
+                if prefetch_params:
+                    scheduler.add_job(
+                        prefetch_news_image,
+                        "cron",
+                        id="news_image_prefetch",
+                        replace_existing=True,
+                        misfire_grace_time=60,
+                        timezone="Asia/Shanghai",
+                        **prefetch_params
+                    )
+                    logger.info(
+                        f"新闻图片预取任务注册成功，提前{SHWGIJ_PREFETCH_MINUTES}分钟: "
+                        f"{prefetch_params['minute']} {prefetch_params['hour']}"
+                    )
+                else:
+                    logger.warning(f"无法根据cron表达式计算预取时间，未注册预取任务: {SHWGIJ_CRON_EXPRESSION}")
         except Exception as e:
             logger.error(f"注册新闻图片定时任务失败: {str(e)}")
     else:
@@ -671,7 +1058,7 @@ async def test_news_image_sending():
     """测试新闻图片发送的辅助函数"""
     try:
         # 确保缓存目录存在
-        os.makedirs(CACHE_DIR, exist_ok=True)
+        await run_io(ensure_cache_dir)
         logger.info(f"开始获取新闻图片")
 
         # 获取新闻图片
@@ -713,7 +1100,7 @@ async def handle_test_cron(bot: Bot):
     
     try:
         # 确保缓存目录存在
-        os.makedirs(CACHE_DIR, exist_ok=True)
+        await run_io(ensure_cache_dir)
         logger.info(f"开始获取新闻图片")
 
         # 获取新闻图片
@@ -1,20 +1,29 @@
+import asyncio
 import httpx
 import json
-from datetime import datetime
-from nonebot import on_command, on_message, get_driver, logger
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from nonebot import get_driver, logger
 from nonebot.adapters.onebot.v11 import Bot, Event
 from nonebot.plugin import PluginMetadata
-from nonebot.rule import Rule, CommandRule
 
-# 定义文本黄历规则
-async def is_text_lunar_command(event: Event) -> bool:
-    message = str(event.message).strip()
-    return message == "文字黄历" or message == "文本黄历"
+from .cache_policy import CachePolicy, FetchResult
+from .http_client import get_client
+from .quota import QuotaExceededError
+from .file_io import read_bytes, write_bytes, run_io
+from .lunar_engine import JIE_QI, MAX_YEAR, MIN_YEAR, ZHI_XING, compute_almanac
+from .almanac_store import almanac_store
+from .single_flight import single_flight
+from .date_parser import DateParser
+from .batch_fetch import XISOUL_RANGE_CONCURRENCY, XISOUL_RANGE_MAX_DAYS, gather_bounded, send_forward_message
 
 __plugin_meta__ = PluginMetadata(
     name="文本黄历",
-    description="获取当天的农历黄历文本信息，包含详细的传统命理和民俗数据",
-    usage="文字黄历 或 文本黄历 获取文本版",
+    description="获取当天或指定日期的农历黄历文本信息，包含详细的传统命理和民俗数据",
+    usage="文字黄历 或 文本黄历 获取文本版，文字黄历 2025-01-01~2025-01-07 或 文字黄历 本周 按日期范围查询，"
+          "择日 嫁娶 2025-06 查找宜嫁娶的日期",
 )
 
 # 从环境变量获取配置
@@ -22,18 +31,39 @@ config = get_driver().config
 # 修改为使用网站名称命名的API密钥
 get_lunar_key = getattr(config, "shwgij_api_key", "")
 
+# 文本黄历数据来源：api（请求接口）、offline（本地计算，不访问网络）、
+# hybrid（本地计算，并合并当天已缓存的接口数据，如寄语、宜忌等接口独有的内容；没有缓存时在后台获取）
+SHWGIJ_LUNAR_SOURCE = str(getattr(config, "shwgij_lunar_source", "api")).lower()
+
+# 黄历按北京时间（Asia/Shanghai，无夏令时）的日期划分，每个日期的数据所有用户共用，
+# 当天及以后的日期在该日期结束时失效，已过去的日期在查询当天结束时失效
+SHANGHAI_TZ = timezone(timedelta(hours=8), "Asia/Shanghai")
+# 黄历数据的磁盘缓存目录，每个日期一个JSON文件，重启后仍可使用
+LUNAR_CACHE_DIR = os.path.join(os.path.dirname(__file__), "cache", "lunarpro")
+
+# 日期 -> {"date", "payload"（接口返回的原始数据）, "message"（渲染好的消息行）, "fetched_at", "expires_at"}
+lunar_cache: Dict[str, Dict[str, Any]] = {}
+lunar_policy = CachePolicy("lunarpro")
+
 # 命令定义
-# 保留原有的命令以便兼容
-lunar_calendar = on_command("文字黄历", priority=10, block=True)
-# 添加新的不需要/的命令
-lunar_calendar_direct = on_message(rule=is_text_lunar_command, priority=10, block=True)
+# 文字黄历/文本黄历（含/前缀）由__init__.py中的命令路由器分发到handle_lunar_calendar，
+# 带日期参数的"文字黄历 "消息分发到handle_lunar_calendar_args，"择日 "消息分发到handle_choose_date
+
+LUNARPRO_URL = "https://api.shwgij.com/api/lunars/lunarpro"
+
+# 择日一次最多查询的天数（只查本地索引，可以比按日期范围查询大）
+XISOUL_CHOOSE_DATE_MAX_DAYS = int(getattr(config, "xisoul_choose_date_max_days", 366))
 
 def get_current_date():
-    """获取当前日期的格式化字符串"""
-    return datetime.now().strftime("%Y-%m-%d")
+    """获取当前日期（北京时间）的格式化字符串"""
+    return datetime.now(SHANGHAI_TZ).strftime("%Y-%m-%d")
+
+def get_date_expiry(date: str) -> float:
+    """日期对应的缓存失效时间：该日期次日的北京时间零点，已过去的日期为今天结束时"""
+    day = datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=SHANGHAI_TZ)
+    today = datetime.strptime(get_current_date(), "%Y-%m-%d").replace(tzinfo=SHANGHAI_TZ)
+    return (max(day, today) + timedelta(days=1)).timestamp()
 
-@lunar_calendar.handle()
-@lunar_calendar_direct.handle()
 async def handle_lunar_calendar(bot: Bot, event: Event):
     """处理文本黄历命令"""
     logger.info("收到文本黄历命令请求")
@@ -42,68 +72,326 @@ async def handle_lunar_calendar(bot: Bot, event: Event):
     today = get_current_date()
     logger.info(f"请求日期: {today}")
     
-    # 调用API获取黄历数据
-    url = f"https://api.shwgij.com/api/lunars/lunarpro"
-    params = {
-        "key": get_lunar_key,
-        "date": today
-    }
-    
-    logger.info(f"请求URL: {url}")
-    logger.info(f"请求参数: {params}")
-    
     # 构造消息
-    message = []
     try:
-        # 执行API请求并处理响应
-        message = await fetch_and_parse_lunar_data(url, params)
+        message = await get_lunar_message(today)
     except Exception as e:
         logger.error(f"获取黄历信息失败: {str(e)}")
-        message.append(f"❌ 获取黄历信息失败: {str(e)}")
+        message = [f"❌ 获取黄历信息失败: {str(e)}"]
     
     # 使用bot.send发送消息
     await bot.send(event, "\n".join(message))
 
+async def handle_lunar_calendar_args(bot: Bot, event: Event, arg_text: str):
+    """
+    处理带日期参数的文本黄历命令
+
+    支持单个日期（文字黄历 2025-01-01、文字黄历 明天）和日期范围（文字黄历 2025-01-01~2025-01-07、文字黄历 本周），
+    多个日期时已缓存的直接使用，其余并发获取（受XISOUL_RANGE_CONCURRENCY限制），结果合并为一条转发消息
+    """
+    logger.info(f"收到带参数的文本黄历命令: {arg_text}")
+    try:
+        today = datetime.strptime(get_current_date(), "%Y-%m-%d").date()
+        dates = DateParser.parse_date_range(arg_text, XISOUL_RANGE_MAX_DAYS, today=today)
+        if dates is None:
+            parsed_date = DateParser.parse_date_from_command(arg_text)
+            if not parsed_date:
+                raise ValueError("无法识别的日期格式，请使用YYYY-MM-DD或YYYY-MM-DD~YYYY-MM-DD格式")
+            dates = [parsed_date]
+    except ValueError as e:
+        await bot.send(event, f"❌ {str(e)}")
+        return
+
+    dates = [DateParser.format_date(*date) for date in dates]
+    if len(dates) == 1:
+        try:
+            message = await get_lunar_message(dates[0])
+        except Exception as e:
+            logger.error(f"获取黄历信息失败: {str(e)}")
+            message = [f"❌ 获取黄历信息失败: {str(e)}"]
+        await bot.send(event, "\n".join(message))
+        return
+
+    # 接口模式下先查缓存，本地计算不需要
+    cached = _get_cached_message if SHWGIJ_LUNAR_SOURCE not in ("offline", "hybrid") else None
+    results = await gather_bounded(
+        dates, lambda date: get_lunar_message(date, background=False), XISOUL_RANGE_CONCURRENCY, cached=cached
+    )
+    contents = []
+    for date in dates:
+        result = results[date]
+        if isinstance(result, BaseException):
+            contents.append(f"❌ 获取{date}黄历信息失败: {str(result)}")
+        else:
+            contents.append("\n".join(result))
+    await send_forward_message(bot, event, contents, nickname="文本黄历")
+
+async def get_lunar_message(date: str, background: bool = True) -> List[str]:
+    """
+    获取指定日期的黄历消息行，按SHWGIJ_LUNAR_SOURCE选择本地计算或请求接口
+
+    Args:
+        date: 日期字符串，格式为YYYY-MM-DD
+        background: hybrid模式下没有接口缓存时是否在后台获取
+    """
+    params = {
+        "key": get_lunar_key,
+        "date": date
+    }
+    if SHWGIJ_LUNAR_SOURCE in ("offline", "hybrid"):
+        # 本地计算，不等待网络
+        return await get_local_lunar_message(LUNARPRO_URL, params, background=background)
+    # 已缓存时直接返回，否则请求接口
+    result = await get_lunar_data_result(LUNARPRO_URL, params)
+    if result.value is not None:
+        return list(result.value)
+    return [f"❌ 获取{date}黄历信息失败: {result.error}"]
+
+async def _get_cached_message(date: str) -> Optional[List[str]]:
+    entry = await load_lunar_cache(date)
+    return list(entry["message"]) if entry is not None else None
+
 async def fetch_and_parse_lunar_data(url: str, params: dict) -> list:
-    """获取并解析黄历API数据"""
-    message = []
+    """获取并解析黄历API数据，失败时返回错误提示"""
+    result = await get_lunar_data_result(url, params)
+    if result.value is None:
+        return [f"❌ {result.error}"]
+    # 返回副本，避免调用方修改共享的结果
+    return list(result.value)
+
+async def get_lunar_data_result(url: str, params: dict) -> FetchResult:
+    """
+    获取黄历数据
+
+    先查内存缓存，再查磁盘缓存，都没有时请求接口（同一日期的并发请求合并为一次），
+    上游近期失败过时在负缓存有效期内不再请求
+    """
+    date = params["date"]
+    entry = await load_lunar_cache(date)
+    if entry is not None:
+        return FetchResult(entry["message"], source="cache", fetched_at=entry["fetched_at"])
+
+    async def refresh():
+        payload = await _fetch_lunar_payload(url, params)
+        message = render_lunar_message(payload, date)
+        await save_lunar_cache(date, payload, message)
+        return message
+
+    return await lunar_policy.get(date, refresh)
+
+async def get_local_lunar_message(url: str, params: dict, background: bool = True) -> List[str]:
+    """本地计算黄历，hybrid模式下合并该日期已缓存的接口数据"""
+    date = params["date"]
+    if date == get_current_date():
+        lunar_data = compute_almanac()
+    else:
+        # 其他日期按当天正午计算（时干支为午时）
+        lunar_data = compute_almanac(datetime.strptime(date, "%Y-%m-%d").replace(hour=12, tzinfo=SHANGHAI_TZ))
+    if SHWGIJ_LUNAR_SOURCE == "hybrid":
+        entry = await load_lunar_cache(date)
+        if entry is not None:
+            payload = entry["payload"]
+            # 历法字段以本地计算为准（时干支等随当前时间变化），其余字段使用接口数据
+            return render_lunar_message({**payload, "data": {**payload.get("data", {}), **lunar_data}}, date)
+        if background:
+            # 接口数据在后台获取（受额度、熔断和负缓存限制），之后的请求再合并
+            asyncio.create_task(get_lunar_data_result(url, params))
+    return render_lunar_message({"data": lunar_data}, date)
+
+def _classify_term(term: str):
+    """
+    择日词条 -> (索引类别, 词条, 显示名)
+
+    忌X查忌，冲X/煞X查冲煞，节气名查交节日，建除十二值星（可带"日"）查值星，其余查宜
+    """
+    if term.startswith("忌") and len(term) > 1:
+        return "ji", term[1:], f"忌{term[1:]}"
+    if term.startswith("宜") and len(term) > 1:
+        return "yi", term[1:], f"宜{term[1:]}"
+    if len(term) == 2 and term[0] in "冲煞":
+        return ("chong" if term[0] == "冲" else "sha"), term[1], term
+    if term in JIE_QI:
+        return "jieqi", term, term
+    if term.rstrip("日") in ZHI_XING and len(term.rstrip("日")) == 1:
+        return "zhixing", term.rstrip("日"), f"{term.rstrip('日')}日"
+    return "yi", term, f"宜{term}"
+
+async def handle_choose_date(bot: Bot, event: Event, arg_text: str):
+    """
+    处理择日命令，如 择日 嫁娶 2025-06、择日 忌动土 下月、择日 冲猴 本月、择日 冬至 2025
+
+    只查本地黄历索引：历法字段缺失时本地计算补充；宜忌来自接口，缺少的日期在后台获取，稍后再查可得到完整结果
+    """
+    parts = arg_text.split(None, 1)
+    if not parts:
+        await bot.send(event, "❌ 请输入要查询的事项，如：择日 嫁娶 2025-06")
+        return
+    kind, term, title = _classify_term(parts[0])
+    today = datetime.strptime(get_current_date(), "%Y-%m-%d").date()
+    period = parts[1] if len(parts) > 1 else "未来30天"
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            # 解析JSON响应
-            data = response.json()
-            logger.info(f"JSON解析成功，数据结构: {list(data.keys())}")
-            
-            # 检查响应状态
-            if data.get('code') == 200:
-                # 提取并翻译主要信息
-                lunar_data = data.get('data', {})
-                message.append(f"📅 农历黄历信息 ({params['date']})")
-                message.append("=" * 30)
-                
-                # 调用各个辅助函数处理不同类别的信息
-                message.extend(process_basic_info(lunar_data))
-                message.extend(process_ganzhi_info(lunar_data))
-                message.extend(process_fortune_info(lunar_data))
-                message.extend(process_seasonal_info(lunar_data))
-                message.extend(process_direction_info(lunar_data))
-                message.extend(process_luck_info(lunar_data))
-                message.extend(process_folk_info(lunar_data))
-                message.extend(process_nine_star_info(lunar_data))
-                message.extend(process_extra_info(lunar_data, data))
-            else:
-                message.append(f"❌ API返回错误: {data.get('msg', '未知错误')}")
+        dates = DateParser.parse_date_range(period, XISOUL_CHOOSE_DATE_MAX_DAYS, today=today)
+        if dates is None:
+            raise ValueError("无法识别的日期范围，请使用 2025-06、2025-06-01~2025-06-30、本月、下月或未来N天")
+        # 本地历法只能计算该范围内的日期
+        if dates[0][0] < MIN_YEAR or dates[-1][0] > MAX_YEAR:
+            raise ValueError(f"仅支持查询{MIN_YEAR}年至{MAX_YEAR}年的日期")
+    except ValueError as e:
+        await bot.send(event, f"❌ {str(e)}")
+        return
+
+    days = [DateParser.format_date(*date) for date in dates]
+    started = time.perf_counter()
+    await run_io(almanac_store.ensure_engine_fields, days)
+    rows = await run_io(almanac_store.search, kind, term, days[0], days[-1])
+    missing = await run_io(almanac_store.missing, days, "yi_ji_source") if kind in ("yi", "ji") else []
+    logger.info(f"择日 {title} {days[0]}~{days[-1]}: {len(rows)} 天，耗时 {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    message = [f"📅 择日：{title}（{days[0]} ~ {days[-1]}）"]
+    if rows:
+        message.append(f"共 {len(rows)} 天：")
+        for row in rows:
+            message.append(" ".join(filter(None, [
+                row["date"], row["week"], row["lunar"], f"{row['gan_zhi']}日", row["chong"], row["sha"],
+                f"{row['zhi_xing']}日" if row["zhi_xing"] else None,
+            ])))
+    else:
+        message.append("没有找到符合条件的日期")
+    if missing:
+        if SHWGIJ_LUNAR_SOURCE == "offline":
+            message.append(f"ℹ️ 其中 {len(missing)} 天没有宜忌数据（本地计算不包含宜忌）")
+        else:
+            message.append(f"ℹ️ 其中 {len(missing)} 天还没有宜忌数据，已在后台获取，稍后再查可得到完整结果")
+            # 每次最多获取XISOUL_RANGE_MAX_DAYS天，受并发、额度、熔断和负缓存限制
+            fill = missing[:XISOUL_RANGE_MAX_DAYS]
+            asyncio.create_task(single_flight.do(f"almanac_fill:{fill[0]}~{fill[-1]}", _fill_almanac, fill))
+    await bot.send(event, "\n".join(message))
+
+async def _fill_almanac(dates: List[str]):
+    """获取缺少宜忌数据的日期，已有黄历缓存的直接写入索引"""
+    async def index_date(date: str):
+        entry = await load_lunar_cache(date)
+        if entry is not None:
+            await run_io(almanac_store.record_payload, date, entry["payload"])
+            return
+        await get_lunar_data_result(LUNARPRO_URL, {"key": get_lunar_key, "date": date})
+
+    await gather_bounded(dates, index_date, XISOUL_RANGE_CONCURRENCY)
+
+def _get_cache_path(date: str) -> str:
+    return os.path.join(LUNAR_CACHE_DIR, f"{date}.json")
+
+def _remember(entry: Dict[str, Any]):
+    """写入内存缓存，只保留未失效的日期"""
+    now = time.time()
+    for date in [date for date, cached in lunar_cache.items() if cached["expires_at"] <= now]:
+        del lunar_cache[date]
+    lunar_cache[entry["date"]] = entry
+
+async def load_lunar_cache(date: str) -> Optional[Dict[str, Any]]:
+    """返回未失效的缓存条目，内存中没有时读取磁盘缓存"""
+    entry = lunar_cache.get(date)
+    if entry is None:
+        try:
+            entry = json.loads(await read_bytes(_get_cache_path(date)))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"黄历磁盘缓存无效，忽略: {str(e)}")
+            return None
+        if entry.get("date") != date or not isinstance(entry.get("message"), list):
+            return None
+        # 已过去的日期在写入当天结束时失效，旧文件没有记录失效时间时按日期计算
+        entry["expires_at"] = entry.get("expires_at") or get_date_expiry(date)
+        _remember(entry)
+        logger.debug(f"从磁盘缓存加载黄历数据: {date}")
+    if time.time() >= entry["expires_at"]:
+        lunar_cache.pop(date, None)
+        return None
+    return entry
+
+async def save_lunar_cache(date: str, payload: dict, message: List[str]):
+    """写入内存和磁盘缓存，并清理已失效的磁盘缓存"""
+    entry = {
+        "date": date, "payload": payload, "message": message,
+        "fetched_at": time.time(), "expires_at": get_date_expiry(date),
+    }
+    _remember(entry)
+    try:
+        await write_bytes(_get_cache_path(date), json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+        await run_io(_prune_cache_dir, get_current_date())
+    except Exception as e:
+        logger.warning(f"保存黄历磁盘缓存失败: {str(e)}")
+    try:
+        # 宜忌写入黄历索引，供择日查询
+        await run_io(almanac_store.record_payload, date, payload)
+    except Exception as e:
+        logger.warning(f"写入黄历索引失败: {str(e)}")
+
+def _prune_cache_dir(today: str):
+    """
+    删除已失效的磁盘缓存，在文件读写线程中执行
+
+    当天及以后的日期还未失效；已过去的日期只保留今天写入的
+    """
+    start_of_today = datetime.strptime(today, "%Y-%m-%d").replace(tzinfo=SHANGHAI_TZ).timestamp()
+    for filename in os.listdir(LUNAR_CACHE_DIR):
+        if not filename.endswith(".json") or filename[:-5] >= today:
+            continue
+        path = os.path.join(LUNAR_CACHE_DIR, filename)
+        try:
+            if os.path.getmtime(path) < start_of_today:
+                os.remove(path)
+        except OSError:
+            pass
+
+async def _fetch_lunar_payload(url: str, params: dict) -> dict:
+    """请求黄历API并返回原始数据，失败时抛出RuntimeError，异常信息即为给用户的提示"""
+    try:
+        # 使用插件共享的HTTP客户端，复用连接
+        client = get_client()
+        response = await client.get(url, params=params, timeout=10)
+        response.raise_for_status()
+        
+        # 解析JSON响应
+        data = response.json()
+        logger.info(f"JSON解析成功，数据结构: {list(data.keys())}")
+    except QuotaExceededError as e:
+        # 接口额度不足，只能使用缓存数据；保留原异常，缓存策略据此不记入负缓存
+        raise RuntimeError(str(e)) from e
     except httpx.HTTPStatusError as e:
         logger.error(f"HTTP请求错误: {str(e)}")
-        message.append(f"❌ HTTP请求错误: {str(e)}")
+        raise RuntimeError(f"HTTP请求错误: {str(e)}")
     except httpx.RequestError as e:
         logger.error(f"网络请求异常: {str(e)}")
-        message.append(f"❌ 网络请求异常: {str(e)}")
+        raise RuntimeError(f"网络请求异常: {str(e)}")
     except json.JSONDecodeError as e:
         logger.error(f"JSON解析错误: {str(e)}")
-        message.append(f"❌ JSON解析错误: {str(e)}")
+        raise RuntimeError(f"JSON解析错误: {str(e)}")
+    
+    # 检查响应状态
+    if data.get('code') != 200:
+        raise RuntimeError(f"API返回错误: {data.get('msg', '未知错误')}")
+    return data
+
+def render_lunar_message(data: dict, date: str) -> List[str]:
+    """将黄历API数据渲染为消息行"""
+    message = []
+    # 提取并翻译主要信息
+    lunar_data = data.get('data', {})
+    message.append(f"📅 农历黄历信息 ({date})")
+    message.append("=" * 30)
+    
+    # 调用各个辅助函数处理不同类别的信息
+    message.extend(process_basic_info(lunar_data))
+    message.extend(process_ganzhi_info(lunar_data))
+    message.extend(process_fortune_info(lunar_data))
+    message.extend(process_seasonal_info(lunar_data))
+    message.extend(process_direction_info(lunar_data))
+    message.extend(process_luck_info(lunar_data))
+    message.extend(process_folk_info(lunar_data))
+    message.extend(process_nine_star_info(lunar_data))
+    message.extend(process_extra_info(lunar_data, data))
     
     return message
 
@@ -295,6 +583,8 @@ def process_folk_info(lunar_data: dict) -> list:
         folk_info.append(f"🌌 七政: {lunar_data['QiZheng']}")
     if 'SiShou' in lunar_data:
         folk_info.append(f"🐉 四兽: {lunar_data['SiShou']}")
+    if 'Xiu' in lunar_data:
+        folk_info.append(f"⭐ 二十八宿: {lunar_data['Xiu']}")
     if 'XiuLuck' in lunar_data:
         folk_info.append(f"⭐ 星宿运势: {lunar_data['XiuLuck']}")
     if 'XiuSong' in lunar_data:
@@ -125,33 +125,14 @@ async def handle_show_current_model(bot, event):
     }.get(current_model, current_model)
     await bot.send(event, f"当前使用的模型: {model_name} ({current_model})")
 
-async def handle_ollama_chat(bot, event):
-    """处理聊天消息"""
-    # 获取用户发送的消息
-    message = str(event.message)
-    message_text = message.strip()
-    
-    # 定义所有需要排除的命令关键词列表
-    COMMAND_KEYWORDS = [
-        "sjbs", "sjhs", "sjmt", "sjecy", "sjsk",  # 随机图片命令
-        "切换千问", "切换gpt", "切换deepseek",    # 模型切换命令
-        "当前模型", "模型列表", "ollama帮助",      # 模型信息命令
-        "清理历史", "重置模型",                    # 对话管理命令
-        "帮助", "测试黄历"                          # 其他命令
-    ]
-    
-    # 检查消息是否为任何已注册的命令，如果是则不处理，让命令处理器处理
-    if message_text in COMMAND_KEYWORDS:
-        logger.info(f"消息'{message_text}'被识别为命令，跳过处理，交给命令处理器")
-        return
-    
-    # 检查消息是否以"ai+空格"开头
-    if not is_ai_prefix(message_text):
-        logger.info(f"消息'{message_text}'不以'ai '开头，跳过处理")
-        return
-    
-    # 提取实际问题（移除"ai "前缀，注意包含空格）
-    question = message_text[3:].strip()
+async def handle_ollama_chat(bot, event, question: str):
+    """
+    处理聊天消息
+
+    Args:
+        question: 命令路由去掉命令前缀和"ai "前缀后的问题文本
+    """
+    question = question.strip()
     # 如果移除前缀后消息为空，不处理
     if not question:
         return
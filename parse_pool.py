@@ -0,0 +1,143 @@
+"""网页解析工作池 - CPU密集的网页解析放到有界的线程池或进程池中执行，解析时不阻塞事件循环"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from nonebot import get_driver, logger
+
+config = get_driver().config
+
+# 工作池类型：thread（默认，lxml建树时释放GIL）或 process（多核并行，仅支持fork的系统，其他系统改用thread）
+# 进程池在插件加载时、其他线程启动之前创建并fork出全部子进程，之后不再fork；子进程异常退出后改用线程池
+XISOUL_PARSE_MODE = getattr(config, "xisoul_parse_mode", "thread")
+# 工作线程/进程数
+XISOUL_PARSE_WORKERS = int(getattr(config, "xisoul_parse_workers", min(4, os.cpu_count() or 1)))
+# 同时提交到工作池的最大解析数，超过时调用方等待，避免积压过多的网页内容
+XISOUL_PARSE_MAX_PENDING = int(getattr(config, "xisoul_parse_max_pending", 16))
+
+_executor: Optional[Executor] = None
+_mode: Optional[str] = None
+# 事件循环 -> 限制并发提交数量的信号量
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+# 统计：提交数、完成数、失败数、等待空位的次数、完成的解析的总耗时（秒，含在工作池中排队）、同时提交数的峰值
+_stats: Dict[str, Any] = {"submitted": 0, "completed": 0, "failed": 0, "waited": 0, "busy_seconds": 0.0, "peak": 0}
+_pending = 0
+
+
+def _use_thread_pool() -> Executor:
+    global _executor, _mode
+    workers = max(1, XISOUL_PARSE_WORKERS)
+    _mode = "thread"
+    _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="xisoul-parse")
+    logger.info(f"[网页解析] 工作池已创建: thread x {workers}")
+    return _executor
+
+
+def start_parse_pool():
+    """
+    进程池模式下立即创建进程池并fork出全部子进程，需要在插件加载时、其他线程启动之前调用
+
+    已有其他线程时fork可能复制到被其他线程持有的锁，子进程会死锁，因此改用线程池；线程池模式下在首次解析时创建
+    """
+    global _executor, _mode
+    if _executor is not None or XISOUL_PARSE_MODE != "process":
+        return
+    if "fork" not in multiprocessing.get_all_start_methods():
+        # 插件模块无法在spawn启动的子进程中单独导入，只能fork
+        logger.warning("[网页解析] 当前系统不支持fork，改用线程池")
+        _use_thread_pool()
+        return
+    if threading.active_count() > 1:
+        logger.warning(f"[网页解析] 已有 {threading.active_count()} 个线程在运行，fork子进程可能死锁，改用线程池")
+        _use_thread_pool()
+        return
+    workers = max(1, XISOUL_PARSE_WORKERS)
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+    # 首次提交任务时fork出全部子进程，然后才启动进程池的管理线程
+    executor.submit(int).result()
+    _executor = executor
+    _mode = "process"
+    logger.info(f"[网页解析] 工作池已创建: process x {workers}")
+
+
+def _get_executor() -> Executor:
+    if _executor is None:
+        if XISOUL_PARSE_MODE == "process":
+            logger.warning("[网页解析] 进程池未在插件加载时创建，改用线程池")
+        return _use_thread_pool()
+    return _executor
+
+
+def _get_semaphore(loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, XISOUL_PARSE_MAX_PENDING))
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+async def run_parse(func: Callable[..., Any], *args) -> Any:
+    """
+    在解析工作池中执行同步函数；进程池模式下func和参数、返回值都需要能被pickle
+
+    工作池中已有 XISOUL_PARSE_MAX_PENDING 个任务时等待空位
+    """
+    global _executor, _pending
+    loop = asyncio.get_running_loop()
+    semaphore = _get_semaphore(loop)
+    if semaphore.locked():
+        _stats["waited"] += 1
+    async with semaphore:
+        _stats["submitted"] += 1
+        _pending += 1
+        _stats["peak"] = max(_stats["peak"], _pending)
+        start = time.perf_counter()
+        executor = _get_executor()
+        try:
+            result = await loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            _stats["failed"] += 1
+            # 子进程异常退出：关闭进程池，之后的解析改用线程池（不再fork）；
+            # 同时提交到该进程池的其他解析也会失败，只由第一个发现的调用方替换
+            if _executor is executor:
+                logger.warning("[网页解析] 解析进程异常退出，关闭进程池并改用线程池")
+                executor.shutdown(wait=False)
+                _use_thread_pool()
+            raise
+        except Exception:
+            _stats["failed"] += 1
+            raise
+        finally:
+            _pending -= 1
+        _stats["completed"] += 1
+        _stats["busy_seconds"] += time.perf_counter() - start
+        return result
+
+
+def parse_pool_summary() -> Optional[str]:
+    """工作池使用情况，尚未使用时返回None"""
+    if _mode is None:
+        return None
+    completed = _stats["completed"]
+    average = _stats["busy_seconds"] / completed * 1000 if completed else 0
+    return (
+        f"{_mode} x {max(1, XISOUL_PARSE_WORKERS)}：完成 {completed} 次，失败 {_stats['failed']} 次，"
+        f"平均 {average:.1f}ms，同时解析峰值 {_stats['peak']}，等待空位 {_stats['waited']} 次"
+    )
+
+
+def shutdown_parse_pool():
+    """关闭时等待未完成的解析并释放工作池"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+        logger.info("[网页解析] 工作池已关闭")
+    _semaphores.clear()
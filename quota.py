@@ -0,0 +1,237 @@
+"""接口额度 - 按API密钥和接口统计每日调用次数并持久化，额度不足时为定时任务预留调用次数，命令改为只使用缓存"""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+import httpx
+from nonebot import get_driver, logger
+
+from .circuit_breaker import CircuitOpenError
+from .file_io import run_io
+
+config = get_driver().config
+
+
+def _parse_budgets(value) -> Dict[str, int]:
+    if isinstance(value, str) and value.strip():
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            logger.warning(f"[接口额度] 无法解析各接口的每日额度: {value}")
+            return {}
+    if not isinstance(value, dict):
+        return {}
+    return {str(endpoint): int(budget) for endpoint, budget in value.items()}
+
+
+# SHWGIJ接口每个密钥的每日调用额度，0表示不限制
+SHWGIJ_DAILY_QUOTA = int(getattr(config, "shwgij_daily_quota", 0))
+# 各接口单独的每日额度：{"接口名": 次数}，接口名为URL路径的最后一段，例如 {"lunarpro": 100}
+SHWGIJ_ENDPOINT_QUOTAS = _parse_budgets(getattr(config, "shwgij_endpoint_quotas", {}))
+# 为定时任务预留的调用次数，剩余额度不超过该值时命令只使用缓存
+SHWGIJ_SCHEDULED_RESERVE = int(getattr(config, "shwgij_scheduled_reserve", 10))
+
+QUOTA_HOST = "api.shwgij.com"
+STATE_FILE = os.path.join(os.path.dirname(__file__), "cache", "api_quota.json")
+
+# 当前调用是否来自定时任务
+_scheduled: contextvars.ContextVar = contextvars.ContextVar("xisoul_quota_scheduled", default=False)
+
+
+@contextmanager
+def scheduled_calls():
+    """在定时任务中使用，其中发起的请求可以使用预留额度（包括由此创建的后台任务）"""
+    token = _scheduled.set(True)
+    try:
+        yield
+    finally:
+        _scheduled.reset(token)
+
+
+def in_scheduled_calls() -> bool:
+    """当前调用是否来自定时任务（在 scheduled_calls() 中）"""
+    return _scheduled.get()
+
+
+class QuotaExceededError(httpx.RequestError):
+    """接口额度不足，请求未发出"""
+
+
+def key_fingerprint(api_key: str) -> str:
+    """密钥的指纹，额度文件和状态信息中不保存密钥本身"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8]
+
+
+def get_today() -> str:
+    return datetime.now().strftime("%Y%m%d")
+
+
+class QuotaLedger:
+    """
+    每日调用记录
+
+    usage 记录当天每个密钥（指纹）在各接口上的调用次数，日期变化后清零。
+    请求发出前先占用一次额度，请求被熔断器拦截（没有真正发出）时退还。
+    """
+
+    def __init__(self, path: str, daily_quota: int = 0, endpoint_quotas: Optional[Dict[str, int]] = None,
+                 reserve: int = 0):
+        self.path = path
+        self.daily_quota = daily_quota
+        self.endpoint_quotas = endpoint_quotas or {}
+        self.reserve = reserve
+        self.date = get_today()
+        self.usage: Dict[str, Dict[str, int]] = {}
+        self.rejected = 0
+        self._loaded = False
+        self._save_task: Optional[asyncio.Future] = None
+        self._dirty = False
+
+    def load(self):
+        """加载当天的调用记录，启动时在文件读写线程池中调用"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"[接口额度] 调用记录无效，从零开始统计: {str(e)}")
+            return
+        if data.get("date") == get_today():
+            self.usage = data.get("usage", {})
+
+    def _roll(self):
+        """日期变化后清零"""
+        today = get_today()
+        if today != self.date:
+            self.date = today
+            self.usage = {}
+            self.rejected = 0
+
+    def used(self, fingerprint: str, endpoint: Optional[str] = None) -> int:
+        self._roll()
+        usage = self.usage.get(fingerprint, {})
+        if endpoint is None:
+            return sum(usage.values())
+        return usage.get(endpoint, 0)
+
+    def remaining(self, fingerprint: str) -> Optional[int]:
+        """当天剩余的总额度，不限制时为None"""
+        if not self.daily_quota:
+            return None
+        return max(0, self.daily_quota - self.used(fingerprint))
+
+    def acquire(self, api_key: str, endpoint: str, scheduled: bool = False):
+        """占用一次额度，额度不足时抛出QuotaExceededError"""
+        self._roll()
+        fingerprint = key_fingerprint(api_key)
+        total = self.used(fingerprint)
+        reserve = 0 if scheduled else self.reserve
+        if self.daily_quota and total + reserve >= self.daily_quota:
+            self.rejected += 1
+            if scheduled:
+                raise QuotaExceededError(f"今日接口额度已用完（{total}/{self.daily_quota}）")
+            raise QuotaExceededError(
+                f"今日接口额度即将用完（{total}/{self.daily_quota}），剩余额度留给定时任务，暂时只使用缓存数据"
+            )
+        budget = self.endpoint_quotas.get(endpoint)
+        used = self.used(fingerprint, endpoint)
+        if budget and used >= budget:
+            self.rejected += 1
+            raise QuotaExceededError(f"今日{endpoint}接口额度已用完（{used}/{budget}），暂时只使用缓存数据")
+
+        usage = self.usage.setdefault(fingerprint, {})
+        usage[endpoint] = used + 1
+        self.save()
+        if self.daily_quota and not scheduled and self.daily_quota - total - 1 == self.reserve:
+            logger.warning(f"[接口额度] 今日剩余额度 {self.daily_quota - total - 1} 次，之后命令只使用缓存")
+
+    def refund(self, api_key: str, endpoint: str):
+        """请求没有真正发出时退还额度"""
+        usage = self.usage.get(key_fingerprint(api_key), {})
+        if usage.get(endpoint, 0) > 0:
+            usage[endpoint] -= 1
+            self.save()
+
+    def _dump(self) -> str:
+        return json.dumps({"date": self.date, "usage": self.usage}, ensure_ascii=False)
+
+    def _write(self, content: str):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"[接口额度] 保存调用记录失败: {str(e)}")
+
+    def save(self):
+        """在事件循环中调用时放到文件读写线程池中执行，多次变化合并为一次写入"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(self._dump())
+            return
+        self._dirty = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.ensure_future(self._save_async())
+
+    async def _save_async(self):
+        while self._dirty:
+            await asyncio.sleep(0)
+            self._dirty = False
+            await run_io(self._write, self._dump())
+
+    def summary(self):
+        self._roll()
+        lines = []
+        for fingerprint, usage in self.usage.items():
+            total = sum(usage.values())
+            limit = f"/{self.daily_quota}" if self.daily_quota else ""
+            detail = "，".join(f"{endpoint} {count}" for endpoint, count in sorted(usage.items()))
+            lines.append(f"密钥 {fingerprint}: 今日 {total}{limit} 次（{detail}）")
+        if self.daily_quota:
+            lines.append(f"为定时任务预留 {self.reserve} 次，今日拒绝 {self.rejected} 次")
+        return lines
+
+
+class QuotaTransport(httpx.AsyncBaseTransport):
+    """共享HTTP客户端的传输层：统计带key参数的SHWGIJ请求，额度不足时不发出请求"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, ledger: QuotaLedger, host: str = QUOTA_HOST):
+        self.transport = transport
+        self.ledger = ledger
+        self.host = host
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        api_key = request.url.params.get("key") if request.url.host == self.host else None
+        if not api_key:
+            return await self.transport.handle_async_request(request)
+
+        endpoint = request.url.path.rstrip("/").rsplit("/", 1)[-1]
+        try:
+            self.ledger.acquire(api_key, endpoint, scheduled=_scheduled.get())
+        except QuotaExceededError as e:
+            logger.info(f"[接口额度] 拒绝请求 {endpoint}: {str(e)}")
+            raise QuotaExceededError(str(e), request=request)
+        try:
+            return await self.transport.handle_async_request(request)
+        except CircuitOpenError:
+            self.ledger.refund(api_key, endpoint)
+            raise
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+quota_ledger = QuotaLedger(STATE_FILE, SHWGIJ_DAILY_QUOTA, SHWGIJ_ENDPOINT_QUOTAS, SHWGIJ_SCHEDULED_RESERVE)
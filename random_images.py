@@ -8,6 +8,9 @@ from datetime import datetime
 from nonebot import logger
 from nonebot.adapters.onebot.v11 import Bot, Event, MessageSegment
 
+from .http_client import get_client
+from .file_io import read_bytes, write_bytes, remove_file, get_file_size, run_io
+
 # 图片API基础URL
 BASE_URL = "https://api.yviii.com/img/"
 
@@ -23,6 +26,10 @@ IMAGE_TYPES = {
 # 创建临时目录
 async def create_temp_directory():
     """创建临时文件目录，根据不同操作系统和环境选择最佳存储位置"""
+    return await run_io(_create_temp_directory)
+
+def _create_temp_directory():
+    """在文件读写线程中检查并创建临时目录"""
     try:
         import tempfile
         base_temp_dir = tempfile.gettempdir()
@@ -68,30 +75,30 @@ async def download_image(image_type, save_path):
         api_param = IMAGE_TYPES[image_type]["api_param"]
         url = f"{BASE_URL}{api_param}"
         
-        async with httpx.AsyncClient(timeout=30) as client:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                "Accept": "image/webp,image/apng,image/*,*/*;q=0.8",
-                "Accept-Encoding": "gzip, deflate, br",
-                "Connection": "keep-alive"
-            }
-            
-            response = await client.get(url, headers=headers, follow_redirects=True)
+        # 使用插件共享的HTTP客户端，复用连接
+        client = get_client()
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+            "Accept": "image/webp,image/apng,image/*,*/*;q=0.8",
+            "Accept-Encoding": "gzip, deflate, br",
+            "Connection": "keep-alive"
+        }
+        
+        response = await client.get(url, headers=headers, follow_redirects=True)
+        
+        if response.status_code == 200:
+            content_type = response.headers.get("content-type", "")
             
-            if response.status_code == 200:
-                content_type = response.headers.get("content-type", "")
+            if any(ctype in content_type.lower() for ctype in ["image", "jpeg", "png", "gif", "webp"]):
+                await write_bytes(save_path, response.content)
                 
-                if any(ctype in content_type.lower() for ctype in ["image", "jpeg", "png", "gif", "webp"]):
-                    with open(save_path, "wb") as f:
-                        f.write(response.content)
-                    
-                    return True
-                else:
-                    logger.error(f"响应不是有效的图片类型: {content_type}")
-                    return False
+                return True
             else:
-                logger.error(f"下载失败，状态码: {response.status_code}")
+                logger.error(f"响应不是有效的图片类型: {content_type}")
                 return False
+        else:
+            logger.error(f"下载失败，状态码: {response.status_code}")
+            return False
     except Exception as e:
         logger.error(f"下载图片时发生异常: {type(e).__name__}: {str(e)}")
         return False
@@ -100,12 +107,11 @@ async def download_image(image_type, save_path):
 async def delete_temp_file(file_path, delay=60):
     """延迟删除临时文件"""
     await asyncio.sleep(delay)
-    if os.path.exists(file_path):
-        try:
-            os.remove(file_path)
+    try:
+        if await remove_file(file_path):
             logger.info(f"临时文件已删除: {file_path}")
-        except Exception as e:
-            logger.error(f"删除临时文件失败: {str(e)}")
+    except Exception as e:
+        logger.error(f"删除临时文件失败: {str(e)}")
 
 # 处理图片请求
 async def handle_image_request(bot: Bot, event: Event, image_type: str):
@@ -121,20 +127,17 @@ async def handle_image_request(bot: Bot, event: Event, image_type: str):
         save_path = await generate_unique_filename(image_type)
         
         if await download_image(image_type, save_path):
-            if os.path.exists(save_path):
-                file_size = os.path.getsize(save_path)
-                
-                if file_size > 0:
-                    try:
-                        with open(save_path, 'rb') as f:
-                            image_bytes = f.read()
-                        await bot.send(event, MessageSegment.image(image_bytes))
-                        logger.info(f"{desc}图片已成功发送")
-                    except Exception as e:
-                        logger.error(f"发送图片失败: {str(e)}")
-                        await bot.send(event, f"❌ {desc}图片发送失败，请稍后重试")
-                    finally:
-                        asyncio.create_task(delete_temp_file(save_path, delay=60))
+            file_size = await get_file_size(save_path)
+            if file_size > 0:
+                try:
+                    image_bytes = await read_bytes(save_path)
+                    await bot.send(event, MessageSegment.image(image_bytes))
+                    logger.info(f"{desc}图片已成功发送")
+                except Exception as e:
+                    logger.error(f"发送图片失败: {str(e)}")
+                    await bot.send(event, f"❌ {desc}图片发送失败，请稍后重试")
+                finally:
+                    asyncio.create_task(delete_temp_file(save_path, delay=60))
             else:
                 logger.error(f"图片文件不存在: {save_path}")
                 await bot.send(event, f"❌ {desc}下载失败，文件不存在")
@@ -0,0 +1,64 @@
+"""请求合并（single-flight）核心功能 - 相同key的并发调用共享同一次上游请求"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from nonebot import logger
+
+
+class SingleFlight:
+    """
+    按key合并并发调用
+
+    同一个key在执行期间的后续调用不会再次发起请求，而是等待正在进行的那一次并共享其结果（或异常）。
+    执行放在独立的Task中，单个调用方被取消不会影响其他等待者。
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # 命名空间（key中第一个":"之前的部分） -> 统计数据
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, key: str, field: str):
+        namespace = key.split(":", 1)[0]
+        stats = self._stats.setdefault(namespace, {"calls": 0, "executions": 0, "coalesced": 0})
+        stats[field] += 1
+
+    async def do(self, key: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        执行或加入key对应的调用
+
+        Args:
+            key: 合并键，通常为 "接口名:参数/日期"
+            func: 实际执行请求的协程函数
+        """
+        self._count(key, "calls")
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._count(key, "coalesced")
+            logger.debug(f"[SingleFlight] 合并请求: {key}")
+        else:
+            self._count(key, "executions")
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # 标记异常已被读取，避免所有调用方都被取消时出现"exception was never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        """当前正在执行的请求数"""
+        return len(self._in_flight)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """各命名空间的调用次数、实际执行次数和被合并次数"""
+        return {name: dict(values) for name, values in self._stats.items()}
+
+
+# 插件共享的请求合并实例
+single_flight = SingleFlight()